@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+""" Database load of updating several objects by one request.
+
+Counts queries and time of update task for N objects with M changed fields:
+legacy item-by-item update (one UPDATE per field of each object), default
+update (one UPDATE per object) and bulk update (bulk=True).
+
+Usage: python benchmarks/bench_bulk_update.py [objects]
+"""
+from __future__ import print_function
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'celery_rpc.runtests.settings')
+
+import django
+django.setup()
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from celery_rpc import tasks
+from celery_rpc.base import GenericListSerializerClass
+from celery_rpc.tests.models import SimpleModel
+
+MODEL_SYMBOL = 'celery_rpc.tests.models:SimpleModel'
+
+
+def legacy_update(self, instance, validated_data):
+    """ List serializer update as it was before bulk update
+    """
+    for obj, values in zip(instance, validated_data):
+        for k, v in values.items():
+            setattr(obj, k, v)
+            obj.save()
+    return instance
+
+
+def run(title, count, **kwargs):
+    objs = SimpleModel.objects.bulk_create(
+        [SimpleModel(char=str(i)) for i in range(count)])
+    data = [{'id': o.pk, 'char': 'x%s' % o.pk,
+             'datetime': '2020-01-01T00:00:00'} for o in objs]
+    with CaptureQueriesContext(connection) as queries:
+        start = time.time()
+        tasks.update.delay(MODEL_SYMBOL, data, **kwargs).get()
+        duration = time.time() - start
+    print('{:<10} {:6d} queries {:8.1f} ms'.format(
+        title, len(queries), duration * 1000))
+    SimpleModel.objects.all().delete()
+
+
+def main(count=1000):
+    call_command('migrate', run_syncdb=True, verbosity=0)
+    update = GenericListSerializerClass.update
+    GenericListSerializerClass.update = legacy_update
+    try:
+        run('legacy', count)
+    finally:
+        GenericListSerializerClass.update = update
+    run('default', count)
+    run('bulk', count, bulk=True)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
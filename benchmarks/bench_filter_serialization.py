@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+""" Server CPU time of serializing filter results.
+
+Compares model serializer over model instances and serialization of rows
+fetched with QuerySet.values() (`values_serialization` config).
+
+Usage: python benchmarks/bench_filter_serialization.py [rows]
+"""
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'celery_rpc.runtests.settings')
+
+import django
+django.setup()
+
+from django.core.management import call_command
+
+from celery_rpc import tasks
+from celery_rpc.tests.models import SimpleModel
+
+MODEL_SYMBOL = 'celery_rpc.tests.models:SimpleModel'
+
+
+def main(count=1000):
+    call_command('migrate', run_syncdb=True, verbosity=0)
+    SimpleModel.objects.bulk_create(
+        [SimpleModel(char=str(i)) for i in range(count)])
+    conf = tasks.rpc.conf
+
+    def run():
+        return tasks.filter.delay(MODEL_SYMBOL, limit=count).get()
+
+    for title, enabled in [('model serializer', False), ('values', True)]:
+        conf.values_serialization = enabled
+        best = min(timeit.repeat(run, number=10, repeat=5)) / 10
+        print('{:<24} {:8.2f} ms/request'.format(title, best * 1000))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
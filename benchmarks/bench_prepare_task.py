@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+""" Client CPU overhead of preparing request signatures.
+
+Compares per-request signature building with precomputed templates
+(`Client.prepare_task`) and legacy building from scratch.
+
+Usage: python benchmarks/bench_prepare_task.py [iterations]
+"""
+from __future__ import print_function
+
+import os
+import socket
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+try:
+    from django.conf import settings
+    if not settings.configured:
+        settings.configure()
+except ImportError:
+    pass
+
+from celery.utils import nodename
+
+from celery_rpc import utils
+from celery_rpc.client import Client
+
+
+def legacy_prepare_task(client, task_name, args, kwargs, high_priority=False,
+                        **options):
+    """ Signature building as it was before templates
+    """
+    task = client._task_stubs[task_name]
+    options.setdefault("headers", {})
+    options["headers"]["referer"] = nodename(
+        client._app.conf.get("rpc_client_name"), socket.gethostname())
+    if high_priority:
+        conf = task.app.conf
+        options['routing_key'] = conf['task_high_priority_routing_key']
+    return task.subtask(args=args, kwargs=kwargs, **options)
+
+
+def main(number=20000):
+    client = Client()
+    args = ('app.models:Model',)
+    kwargs = {'filters': {'pk': 1}}
+    name = utils.FILTER_TASK_NAME
+    cases = [
+        ('legacy', lambda: legacy_prepare_task(client, name, args, kwargs)),
+        ('legacy high priority',
+         lambda: legacy_prepare_task(client, name, args, kwargs,
+                                     high_priority=True)),
+        ('template', lambda: client.prepare_task(name, args, kwargs)),
+        ('template high priority',
+         lambda: client.prepare_task(name, args, kwargs, high_priority=True)),
+    ]
+    for title, func in cases:
+        best = min(timeit.repeat(func, number=number, repeat=5))
+        print('{:<24} {:8.2f} us/request'.format(title, best / number * 1e6))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+""" Server CPU overhead of serializer class creation.
+
+Compares serializing of one object with serializer class generated per
+request (as it was before caching) and with cached class
+(`ModelTask._create_serializer_class`).
+
+Usage: python benchmarks/bench_serializer_class.py [iterations]
+"""
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'celery_rpc.runtests.settings')
+
+import django
+django.setup()
+
+from rest_framework import serializers
+
+from celery_rpc import tasks
+from celery_rpc.tests.models import SimpleModel
+
+
+def main(number=5000):
+    task = tasks.filter
+    task.push_request(model=SimpleModel, kwargs={'fields': ['id', 'char']})
+    instance = SimpleModel(pk=1, char='a')
+
+    def generated():
+        serializer_class = task._build_serializer_class(
+            SimpleModel, serializers.ModelSerializer,
+            ('id', 'char'), 'id')
+        return serializer_class(instance=instance).data
+
+    def cached():
+        return task.serializer_class(instance=instance).data
+
+    for title, func in [('generated', generated), ('cached', cached)]:
+        best = min(timeit.repeat(func, number=number, repeat=5))
+        print('{:<24} {:8.2f} us/request'.format(title, best / number * 1e6))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,379 @@
+""" asyncio interface for celery-rpc client (Python 3.5+ only).
+"""
+from __future__ import absolute_import
+
+import asyncio
+import functools
+import time
+import weakref
+
+from .client import Client, _async_to_nowait
+from .config import get_result_timeout
+
+
+class AsyncRowIterator(object):
+    """ Asynchronous iterator over rows of pages.
+
+    Async generators require Python 3.6, so paged results are iterated by
+    explicit `__anext__`.
+    """
+
+    def __init__(self, next_page, close=None):
+        """
+        :param next_page: coroutine function returning list of rows of next
+            page or None if there are no more pages
+        :param close: optional coroutine function releasing pages which
+            are not iterated yet, called by `aclose()` and on errors
+        """
+        self._next_page = next_page
+        self._close = close
+        self._closed = False
+        self._rows = iter(())
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        for row in self._rows:
+            return row
+        while not self._closed:
+            try:
+                rows = await self._next_page()
+            except Exception:
+                await self.aclose()
+                raise
+            if rows is None:
+                self._closed, self._close = True, None
+                break
+            self._rows = iter(rows)
+            for row in self._rows:
+                return row
+        raise StopAsyncIteration
+
+    async def aclose(self):
+        """ Stop iteration and release pages which are not iterated yet.
+        """
+        close, self._close = self._close, None
+        self._closed = True
+        self._rows = iter(())
+        if close is not None:
+            await close()
+
+
+def _running_loop():
+    """ Return loop running current coroutine.
+    """
+    # asyncio.get_running_loop() appeared in Python 3.7
+    get_running_loop = getattr(asyncio, 'get_running_loop', None)
+    if get_running_loop is not None:
+        return get_running_loop()
+    return asyncio.get_event_loop()
+
+
+class ResultPoller(object):
+    """ Polls readiness of all results awaited within event loop.
+
+    Readiness of all pending results is checked by one job in executor per
+    tick, so backend round-trips do not block event loop and concurrent
+    waiters share polling. Delay between ticks grows exponentially while
+    nothing gets ready and is reset by new waiters.
+    """
+
+    def __init__(self, loop, check, poll_interval, max_poll_interval):
+        """
+        :param loop: event loop
+        :param check: function returning list of ready results of passed
+            ones (called in executor)
+        :param poll_interval: initial delay between ticks (seconds)
+        :param max_poll_interval: max delay between ticks (seconds)
+        """
+        self.loop = loop
+        self.check = check
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self._waiters = []
+        self._delay = poll_interval
+        self._wakeup = None
+        self._task = None
+
+    def wait(self, async_result):
+        """ Return future resolved when result is ready.
+        """
+        future = self.loop.create_future()
+        # cancelled waiters are dropped at once
+        future.add_done_callback(self._wake)
+        self._waiters.append((async_result, future))
+        self._delay = self.poll_interval
+        self._wake()
+        if self._task is None or self._task.done():
+            self._task = self.loop.create_task(self._run())
+        return future
+
+    def _wake(self, *args):
+        if self._wakeup is not None and not self._wakeup.done():
+            self._wakeup.set_result(None)
+
+    async def _run(self):
+        while True:
+            self._waiters = [(r, f) for r, f in self._waiters
+                             if not f.done()]
+            if not self._waiters:
+                return
+            pending = []
+            for r, _ in self._waiters:
+                if not any(r is p for p in pending):
+                    pending.append(r)
+            try:
+                ready = await self.loop.run_in_executor(None, self.check,
+                                                        pending)
+            except Exception as e:
+                for _, future in self._waiters:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            waiting = []
+            for r, future in self._waiters:
+                if any(r is i for i in ready):
+                    if not future.done():
+                        future.set_result(None)
+                else:
+                    waiting.append((r, future))
+            self._waiters = waiting
+            if not waiting:
+                continue
+            self._wakeup = self.loop.create_future()
+            delay = self._delay
+            self._delay = min(delay * 2, self.max_poll_interval)
+            try:
+                await asyncio.wait([self._wakeup], timeout=delay)
+            finally:
+                self._wakeup = None
+
+
+class AsyncClient(Client):
+    """ Sending requests to server and awaiting results within asyncio loop.
+
+    All request methods (`filter`, `count`, `exists`, `aggregate`, `update`,
+    `getset`, `update_or_create`, `create`, `delete`, `call`) and `Pipe.run`
+    return awaitables. Results are
+    collected by polling of result backend with exponential backoff, so
+    waiting for a result does not occupy a thread. All results awaited in
+    a loop are polled together by one job in default executor per tick.
+
+    Message publishing and collecting of ready results are performed in
+    default executor too, so event loop thread does no broker or backend
+    I/O.
+
+    Client-side filter cache, requests coalescing and batching of writes are
+    not supported.
+    """
+
+    supports_batching = False
+
+    def __init__(self, app_config=None, shared=None):
+        super(AsyncClient, self).__init__(app_config, shared)
+        self.filter_cache = None
+        self._single_flight = None
+        self._pollers = weakref.WeakKeyDictionary()
+
+    def _get_poller(self, loop):
+        poller = self._pollers.get(loop)
+        if poller is None:
+            poller = self._pollers[loop] = ResultPoller(
+                loop, self._ready_results, self.poll_interval,
+                self.max_poll_interval)
+        return poller
+
+    @staticmethod
+    def _ready_results(async_results):
+        """ Return ready results of passed ones.
+        """
+        return [r for r in async_results if r.ready()]
+
+    async def get_result(self, async_result, timeout=None, **options):
+        """ Await results of delayed result object
+
+        :param async_result: Celery AsyncResult object
+        :param timeout: timeout of waiting for results
+        :return: results or exception if something goes wrong
+        :raise RestFrameworkError: error in the middle of Django REST
+            Framework at server (only is serializer is pickle or yaml)
+        :raise Client.ResponseError: something goes wrong
+        :raise Client.TimeoutError: timeout exceeded
+
+        """
+        timeout = timeout or get_result_timeout
+        loop = _running_loop()
+        try:
+            await asyncio.wait_for(
+                self._get_poller(loop).wait(async_result), timeout)
+        except asyncio.TimeoutError:
+            raise self.TimeoutError(
+                'Timeout exceeded while waiting for results')
+        # Result is ready, so collecting does not wait for it
+        return await loop.run_in_executor(
+            None, functools.partial(self._collect_result, async_result,
+                                    timeout, **options))
+
+    async def call_many(self, function, calls, chunk_size=None, timeout=None,
+                        retries=1, high_priority=False, **options):
+        """ Call function on server several times with different parameters
+
+        See Client.call_many().
+        """
+        signatures = self._prepare_call_many(function, calls, chunk_size,
+                                             high_priority, **options)
+        async_results = [await self.send_request(s, True, timeout, retries)
+                         for s in signatures]
+        chunks = await self.gather(async_results, timeout)
+        return self._unpack_call_many(chunks)
+
+    def iter_filter(self, model, kwargs=None, page_size=None, timeout=None,
+                    retries=1, high_priority=False, **options):
+        """ Asynchronously iterate over all filtered objects page by page
+
+        See Client.iter_filter().
+
+        :return: asynchronous iterator over filtered objects
+        """
+        kwargs = self._prepare_iter_filter(kwargs, page_size)
+        request = dict(nowait=True, high_priority=high_priority,
+                       retries=retries, **options)
+        page, started = None, False
+
+        async def next_page():
+            nonlocal page, started
+            if not started:
+                started = True
+                page = await self.filter(model, dict(kwargs, cursor=''),
+                                         **request)
+            if page is None:
+                return None
+            result = await self.get_result(page, timeout)
+            page = None
+            if result['cursor'] is not None:
+                # prefetch next page while caller handles current one
+                page = await self.filter(
+                    model, dict(kwargs, cursor=result['cursor']), **request)
+            return result['results']
+
+        return AsyncRowIterator(next_page)
+
+    def stream_filter(self, model, kwargs=None, chunk_size=None,
+                      timeout=None, retries=1, high_priority=False,
+                      **options):
+        """ Asynchronously iterate over all filtered objects delivered by
+        chunks
+
+        See Client.stream_filter(). Request is sent when iteration starts.
+        Abandoned iteration should be finished with `aclose()` of iterator
+        to drop remaining chunks.
+
+        :return: asynchronous iterator over filtered objects
+        """
+        kwargs = self._prepare_stream_filter(kwargs, chunk_size)
+        request = dict(nowait=True, timeout=timeout,
+                       high_priority=high_priority, retries=retries,
+                       **options)
+        result, index, more = None, 0, True
+
+        async def next_chunk():
+            nonlocal result, index, more
+            if result is None:
+                result = await self.filter(model, kwargs, **request)
+            if not more:
+                return None
+            chunk = await self._wait_chunk(result, index, timeout)
+            index += 1
+            more = chunk['more']
+            return chunk['rows']
+
+        async def close():
+            nonlocal more
+            if result is not None and more:
+                more = False
+                await _running_loop().run_in_executor(
+                    None, self._drop_chunks, result, index)
+
+        return AsyncRowIterator(next_chunk, close)
+
+    async def _wait_chunk(self, result, index, timeout=None):
+        """ Await chunk of result polling backend in executor.
+        """
+        loop = _running_loop()
+        deadline = loop.time() + (timeout or get_result_timeout)
+        delay = self.poll_interval
+        while True:
+            chunk = await loop.run_in_executor(None, self._poll_chunk,
+                                               result, index)
+            if chunk is not None:
+                return chunk
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise self.TimeoutError(
+                    'Timeout exceeded while waiting for results')
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, self.max_poll_interval)
+
+    async def gather(self, async_results, timeout=None, **options):
+        """ Await results of several delayed result objects concurrently
+
+        :param async_results: list of Celery AsyncResult objects
+        :param timeout: timeout of waiting for each result
+        :return: list of results in the same order as `async_results`
+        :raise: see get_result()
+
+        """
+        return await asyncio.gather(*[
+            self.get_result(r, timeout, **options) for r in async_results])
+
+    def as_completed(self, async_results, timeout=None, **options):
+        """ Iterate over awaitables in order of results completion
+
+        :param async_results: list of Celery AsyncResult objects
+        :param timeout: timeout of waiting for each result
+        :return: iterator of awaitables returning (AsyncResult, result) pairs
+        :raise: see get_result()
+
+        """
+        async def wait(r):
+            return r, await self.get_result(r, timeout, **options)
+
+        return asyncio.as_completed([wait(r) for r in async_results])
+
+    async def send_request(self, signature, nowait=False, timeout=None,
+                           retries=1, **kwargs):
+        """ Sending request to a server
+
+        :param signature: Celery signature instance
+        :param nowait: enables delayed collecting of result
+        :param timeout: timeout of waiting for results
+        :param retries: number of tries to send request
+        :param kwargs: compatibility parameters for async keyword argument
+        :return: results or AsyncResult if nowait is True or
+            exception if something goes wrong
+        :raise RestFrameworkError: error in the middle of Django REST
+            Framework at server (if nowait=False).
+        :raise Client.ResponseError: something goes wrong (if nowait=False)
+
+        """
+        timeout = timeout or get_result_timeout
+        deadline = time.time() + timeout
+        nowait = _async_to_nowait(nowait, **kwargs)
+        attempt = 0
+        while True:
+            # noinspection PyBroadException
+            try:
+                r = await _running_loop().run_in_executor(
+                    None, self._apply, signature, timeout, deadline)
+                if nowait:
+                    return r
+                else:
+                    return await self.get_result(r, timeout)
+            except Exception:
+                attempt += 1
+                delay = self._retry_delay(attempt, retries, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                timeout = deadline - time.time()
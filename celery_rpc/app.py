@@ -1,6 +1,9 @@
 from __future__ import absolute_import
 import os
 
+from celery.concurrency import get_implementation
+from celery.concurrency.prefork import TaskPool
+from celery.signals import worker_init, worker_process_init, worker_ready
 from django.conf import settings
 
 from .utils import create_celery_app
@@ -11,3 +14,30 @@ rpc = create_celery_app()
 rpc.autodiscover_tasks(['celery_rpc'])
 rpc.autodiscover_tasks(lambda: settings.INSTALLED_APPS,
                        related_name="celery_rpc")
+
+
+def warm_up(**kwargs):
+    """ Prepare worker process before consuming requests.
+    """
+    from .warmup import warm_up
+    warm_up(rpc)
+
+
+@worker_init.connect
+def install_warm_up(sender=None, **kwargs):
+    """ Connect warm-up to start of child processes for prefork pool or to
+    readiness of worker for pools executing tasks in worker process (solo,
+    threads, eventlet, gevent).
+
+    Warm-up is connected here and not at import, so it runs after handlers
+    of Celery Django fixup (connected on worker_init too), which close
+    database connections of started process.
+    """
+    signal = worker_process_init if _is_prefork(sender.pool_cls) else \
+        worker_ready
+    signal.connect(warm_up, dispatch_uid='celery_rpc.warm_up')
+
+
+def _is_prefork(pool_cls):
+    pool_cls = get_implementation(pool_cls)
+    return isinstance(pool_cls, type) and issubclass(pool_cls, TaskPool)
@@ -1,17 +1,27 @@
 import inspect
+import time
 import six
 from logging import getLogger
 
 import django
-from celery import Task
-from django.db.models import Model
-from django.db import transaction
+from celery import Task, states
+from django.db.models import (Avg, Count, DO_NOTHING, Max, Min, Model, Q,
+                              QuerySet, Sum)
+from django.conf import settings
+from django.db import connections, router, transaction
 from rest_framework import serializers
 from rest_framework import VERSION
 
 from . import config
-from .utils import symbol_by_name, unproxy
-from .exceptions import RestFrameworkError, RemoteException
+from .cache import LRUCache
+from .cursor import (decode_cursor, encode_cursor, keyset_order,
+                     keyset_ordering, keyset_q, nullable_fields)
+from .resources import ResourceMap
+from .result_cache import ResultCache
+from .utils import (can_store_chunks, chunk_id, chunks_cancel_id,
+                    symbol_by_name, unproxy)
+from .exceptions import (RestFrameworkError, RemoteException,
+                         DeadlineExceeded, ModelTaskError)
 
 logger = getLogger(__name__)
 
@@ -20,6 +30,9 @@ DRF_VERSION = tuple(map(int, VERSION.split('.')))
 DRF3 = DRF_VERSION >= (3, 0, 0)
 DRF34 = DRF_VERSION >= (3, 4, 0)
 
+# Django 2.2+
+HAS_BULK_UPDATE = hasattr(QuerySet, 'bulk_update')
+
 
 class remote_error(object):
     """ Transforms all raised exceptions to a RemoteException wrapper,
@@ -45,6 +58,9 @@ class remote_error(object):
 
 
 if DRF3:
+    from .planner import plan_columns, plan_related
+    from .values import ValuesSerializer
+
     class GenericListSerializerClass(serializers.ListSerializer):
 
         def update(self, instance, validated_data):
@@ -52,7 +68,7 @@ if DRF3:
 
             * instances are deleted if new data is empty
             * if lengths of instances and new date are equal,
-              performs item-by-item update
+              performs item-by-item update of instances matched by identity
             * performs bulk creation is no instances passed
 
             :returns new values
@@ -62,31 +78,353 @@ if DRF3:
                     obj.delete()
                 return self.create(validated_data)
             if len(instance) == len(validated_data):
-                for obj, values in zip(instance, validated_data):
+                objs = self._match_instances(instance)
+                for obj, values in zip(objs, validated_data):
                     for k, v in values.items():
                         setattr(obj, k, v)
-                        obj.save()
+                    obj.save()
             elif len(instance) == 0:
                 return self.create(validated_data)
             else:
                 raise RuntimeError("instance and data len differs, "
                                    "don't know what to do")
-            return instance
+            return objs
+
+        def bulk_update(self, instance, validated_data, batch_size=None):
+            """ Updates instances with a few UPDATE queries of changed fields.
+
+            Falls back to item-by-item update for models with multi-table
+            inheritance or custom save(), for serializers with custom
+            create() or update(), for many-to-many values and for
+            Django < 2.2.
+
+            :returns updated instances in order of data
+            """
+            model = self.child.Meta.model
+            if (not validated_data or len(instance) != len(validated_data) or
+                    not HAS_BULK_UPDATE or
+                    not self.can_bulk_save(validated_data)):
+                return self.update(instance, validated_data)
+            objs = self._match_instances(instance)
+            fields = set()
+            for obj, values in zip(objs, validated_data):
+                for k, v in values.items():
+                    setattr(obj, k, v)
+                fields.update(values)
+            fields.discard(model._meta.pk.name)
+            if fields:
+                self.get_queryset().bulk_update(objs, sorted(fields),
+                                                batch_size=batch_size)
+            return objs
+
+        def bulk_upsert(self, validated_data, batch_size=None):
+            """ Updates existing instances and creates missing ones with a
+            few bulk queries.
+
+            Uses native upsert (INSERT ... ON CONFLICT) if Django and database
+            support it and identity field is in data, otherwise fetches
+            existing instances by identity and performs bulk update of them
+            and bulk create of others. Falls back to item-by-item saving for
+            models with multi-table inheritance or custom save(), for
+            serializers with custom create() or update() and for
+            Django < 2.2.
+
+            :returns instances in order of data
+            """
+            model = self.child.Meta.model
+            identity_field = self.child.identity_field
+            field = model._meta.get_field(identity_field)
+            identities = [field.to_python(self.child.get_identity(item))
+                          for item in self.initial_data]
+            qs = self.get_queryset()
+            using = qs.db
+
+            with atomic_commit_on_success(using=using):
+                if (not HAS_BULK_UPDATE or
+                        not self.can_bulk_save(validated_data)):
+                    return self._upsert_one_by_one(qs, identities,
+                                                   validated_data)
+                if can_native_upsert(model, using, identity_field,
+                                     identities, validated_data):
+                    fields = set()
+                    objs = []
+                    for identity, values in zip(identities, validated_data):
+                        fields.update(values)
+                        # read-only identity (i.e. primary key) is taken
+                        # from initial data
+                        values = dict(values)
+                        values.pop(identity_field, None)
+                        values[field.attname] = identity
+                        objs.append(model(**values))
+                    fields.discard(identity_field)
+                    fields.discard(model._meta.pk.name)
+                    qs.bulk_create(objs, batch_size=batch_size,
+                                   update_conflicts=bool(fields),
+                                   ignore_conflicts=not fields,
+                                   unique_fields=[identity_field],
+                                   update_fields=sorted(fields))
+                    # primary keys of updated rows are not returned
+                    existing = self._fetch_by_identity(qs, identities)
+                    return [existing[i] for i in identities]
+
+                existing = self._fetch_by_identity(qs, identities)
+                created, updated, fields = [], [], set()
+                objs = []
+                for identity, values in zip(identities, validated_data):
+                    obj = existing.get(identity)
+                    if obj is None:
+                        obj = model(**values)
+                        created.append(obj)
+                    else:
+                        for k, v in values.items():
+                            setattr(obj, k, v)
+                        fields.update(values)
+                        updated.append(obj)
+                    objs.append(obj)
+                fields.discard(model._meta.pk.name)
+                if updated and fields:
+                    qs.bulk_update(updated, sorted(fields),
+                                   batch_size=batch_size)
+                if created:
+                    qs.bulk_create(created, batch_size=batch_size)
+                return objs
+
+        def _upsert_one_by_one(self, qs, identities, validated_data):
+            existing = self._fetch_by_identity(qs, identities)
+            objs = []
+            for identity, values in zip(identities, validated_data):
+                obj = existing.get(identity)
+                if obj is None:
+                    obj = self.child.create(values)
+                else:
+                    for k, v in values.items():
+                        setattr(obj, k, v)
+                    obj.save()
+                objs.append(obj)
+            return objs
+
+        def _fetch_by_identity(self, qs, identities):
+            """ Return dict {identity: instance} of existing instances.
+            """
+            identity_field = self.child.identity_field
+            attname = qs.model._meta.get_field(identity_field).attname
+            values = [i for i in identities if i is not None]
+            if not values:
+                return {}
+            qs = qs.filter(**{identity_field + '__in': values})
+            return dict((getattr(obj, attname), obj) for obj in qs)
+
+        def _match_instances(self, instance):
+            """ Order instances like items of initial data by identity.
+            """
+            identity_field = self.child.identity_field
+            field = self.child.Meta.model._meta.get_field(identity_field)
+            instances = dict((getattr(obj, field.attname), obj)
+                             for obj in instance)
+            try:
+                return [instances[field.to_python(self.child.get_identity(item))]
+                        for item in self.initial_data]
+            except KeyError as e:
+                raise RuntimeError("instance with identity {} is not "
+                                   "found".format(e))
+
+        def bulk_create(self, validated_data, batch_size=None):
+            """ Creates objects with a few INSERT queries.
+
+            Falls back to item-by-item creation for models with multi-table
+            inheritance or custom save(), for serializers with custom
+            create() or update() and for many-to-many values.
+            Primary keys of created objects are set only if database backend
+            is able to return them.
+
+            :returns created objects
+            """
+            model = self.child.Meta.model
+            if not self.can_bulk_save(validated_data):
+                return self.create(validated_data)
+            objs = [model(**values) for values in validated_data]
+            return self.get_queryset().bulk_create(objs, batch_size=batch_size)
+
+        def can_bulk_save(self, validated_data):
+            """ Check if objects could be saved without Model.save() and
+            custom serializer create() or update() calls.
+            """
+            if getattr(self.child, 'custom_save', False):
+                return False
+            return can_bulk_save(self.child.Meta.model, validated_data)
+
+        def get_queryset(self):
+            """ Queryset of requested manager and database passed by task
+            in serializer context, default manager of model otherwise.
+            """
+            queryset = self.context.get('queryset')
+            if queryset is None:
+                queryset = self.child.Meta.model._default_manager.all()
+            return queryset
+
+
+def _as_list(value):
+    if not value:
+        return []
+    if isinstance(value, six.string_types):
+        return [value]
+    return value
+
+
+def can_raw_delete(model):
+    """ Check if rows of model could be deleted without cascade collecting:
+    no other rows depend on them.
+    """
+    opts = model._meta
+    if opts.many_to_many or opts.get_parent_list():
+        return False
+    for rel in opts.related_objects:
+        if rel.many_to_many or rel.on_delete is not DO_NOTHING:
+            return False
+    for field in opts.private_fields:
+        if hasattr(field, 'bulk_related_objects'):
+            # generic relations
+            return False
+    return True
+
+
+def overrides_create(serializer_class):
+    """ Check if serializer class has custom create() method.
+    """
+    create = getattr(serializer_class.create, '__func__',
+                     serializer_class.create)
+    default = getattr(serializers.ModelSerializer.create, '__func__',
+                      serializers.ModelSerializer.create)
+    return create is not default
+
+
+def overrides_update(serializer_class):
+    """ Check if serializer class has custom update() method.
+    """
+    update = getattr(serializer_class.update, '__func__',
+                     serializer_class.update)
+    default = getattr(serializers.ModelSerializer.update, '__func__',
+                      serializers.ModelSerializer.update)
+    return update is not default
+
+
+def create_instance(queryset, validated_data):
+    """ Create object with queryset like ModelSerializer.create() does with
+    default manager of model.
+    """
+    validated_data = dict(validated_data)
+    many_to_many = {}
+    for field in queryset.model._meta.many_to_many:
+        if field.name in validated_data:
+            many_to_many[field.name] = validated_data.pop(field.name)
+    instance = queryset.create(**validated_data)
+    for name, value in many_to_many.items():
+        getattr(instance, name).set(value)
+    return instance
+
+
+def can_native_upsert(model, using, identity_field, identities,
+                      validated_data):
+    """ Check if QuerySet.bulk_create could update conflicting rows.
+
+    :param identities: values of unique identity field of objects
+    :param validated_data: values of other fields of objects
+    """
+    features = connections[using].features
+    if not getattr(features, 'supports_update_conflicts_with_target', False):
+        # Django < 4.1 or database without ON CONFLICT (...) DO UPDATE
+        return False
+    field = model._meta.get_field(identity_field)
+    if not (field.primary_key or field.unique):
+        return False
+    if any(identity is None for identity in identities):
+        return False
+    # rows are inserted before conflicts are detected, so partial data of
+    # existing rows would violate NOT NULL constraints
+    required = set(required_fields(model))
+    required.discard(identity_field)
+    return all(required.issubset(values) for values in validated_data)
+
+
+def required_fields(model):
+    """ Return names of fields which are NULL in inserted row if value is
+    not passed.
+    """
+    opts = model._meta
+    return [f.name for f in opts.concrete_fields
+            if not f.null and f is not opts.auto_field and
+            not getattr(f, 'auto_now', False) and
+            not getattr(f, 'auto_now_add', False) and
+            f.get_default() is None]
+
+
+def can_bulk_save(model, validated_data):
+    """ Check if objects could be saved without Model.save() calls.
+    """
+    concrete_model = model._meta.concrete_model
+    for parent in model._meta.get_parent_list():
+        if parent._meta.concrete_model is not concrete_model:
+            # multi-table inheritance
+            return False
+    if model.save is not Model.save:
+        return False
+    m2m_names = set(f.name for f in model._meta.many_to_many)
+    return not any(m2m_names.intersection(values) for values in validated_data)
 
 
 class RpcTask(Task):
     """ Base celery rpc task class
     """
 
+    # Task does not change data, so it may be served by read replica
+    read_only = False
+
+    # Models and functions available to clients
+    resources = ResourceMap(config.resource_map, config.strict_resources,
+                            config.symbol_cache_size)
+
     @property
     def headers(self):
         return self.request.headers or {}
 
+    @property
+    def deadline(self):
+        """ Absolute time (unix timestamp) after which client does not wait
+        for results of request or None if unknown.
+        """
+        deadline = self.headers.get('deadline')
+        if deadline is None:
+            # custom headers of message are request attributes in worker
+            deadline = getattr(self.request, 'deadline', None)
+        return deadline
+
+    @property
+    def remaining_time(self):
+        """ Seconds left until deadline of request or None if unknown.
+        """
+        deadline = self.deadline
+        if deadline is None:
+            return None
+        return deadline - time.time()
+
     def __call__(self, *args, **kwargs):
         with remote_error(self):
+            self.check_deadline()
             self.prepare_context(*args, **kwargs)
             return self.run(*args, **kwargs)
 
+    def check_deadline(self):
+        """ Refuse to handle request which client has stopped waiting for.
+        """
+        if not self.app.conf['check_deadline']:
+            return
+        remaining = self.remaining_time
+        if remaining is not None and remaining <= 0:
+            logger.warning("Skip task %s expired %.3fs ago", self.name,
+                           -remaining,
+                           extra={"referer": self.headers.get("referer")})
+            raise DeadlineExceeded('Deadline of request exceeded')
+
     def prepare_context(self, *args, **kwargs):
         """ Prepare context for calling task function. Do nothing by default.
         """
@@ -97,6 +435,20 @@ class ModelTask(RpcTask):
     """
     abstract = True
 
+    # Generated serializer classes shared by all model tasks
+    serializer_classes = LRUCache(config.serializer_cache_size)
+    # ValuesSerializer (or False if not supported) by serializer class
+    values_serializers = LRUCache(config.serializer_cache_size)
+    # (select_related, prefetch_related, only) by serializer class
+    query_plans = LRUCache(config.serializer_cache_size)
+    # Server-side cache of filter results
+    result_cache = ResultCache(config.server_cache_models,
+                               config.server_cache_size,
+                               config.server_cache_backend)
+    # aggregate functions available for requests by name
+    aggregate_functions = {'Sum': Sum, 'Avg': Avg, 'Min': Min, 'Max': Max,
+                           'Count': Count}
+
     def __call__(self, model, *args, **kwargs):
         logger.debug("Got task %s", self.name,
                      extra={"referer": self.headers.get("referer"),
@@ -107,11 +459,16 @@ class ModelTask(RpcTask):
     def prepare_context(self, model, *args, **kwargs):
         self.request.model = self._import_model(model)
 
+    @classmethod
+    def _import_model(cls, model_name):
+        """ Find model by name, check type and return.
+        """
+        return cls.resources.resolve('model', model_name, cls._check_model)
+
     @staticmethod
-    def _import_model(model_name):
-        """ Import class by full name, check type and return.
+    def _check_model(sym, model_name):
+        """ Resolve indirect model names, check type and return model.
         """
-        sym = symbol_by_name(model_name)
         if isinstance(sym, six.string_types):
             # perhaps model name is a value of 'sym'
             model_name = sym
@@ -120,22 +477,90 @@ class ModelTask(RpcTask):
             # perhaps model name is a result of call 'sym()'
             model_name = sym()
             sym = symbol_by_name(model_name)
-        if issubclass(sym, Model):
+        if inspect.isclass(sym) and issubclass(sym, Model):
             return sym
         raise TypeError(
             "Symbol '{}' is not a Django model".format(model_name))
 
-    @staticmethod
-    def _import_serializer(serializer_name):
-        """ Import class by full name, check type and return.
+    @classmethod
+    def _import_serializer(cls, serializer_name):
+        """ Find serializer class by name, check type and return.
         """
-        sym = symbol_by_name(serializer_name)
+        return cls.resources.resolve('serializer', serializer_name,
+                                     cls._check_serializer)
+
+    @staticmethod
+    def _check_serializer(sym, serializer_name):
         if inspect.isclass(sym) and issubclass(sym,
                                                serializers.ModelSerializer):
             return sym
         raise TypeError(
             "Symbol '{}' is not a DRF serializer".format(serializer_name))
 
+    def cached(self, fetch):
+        """ Return result of read-only request from server-side cache or
+        fetch and cache it if model is listed in `server_cache_models`.
+
+        Requests piped with changes are not cached, because they see
+        uncommitted data. Results read from database other than the one
+        changes are written to (i.e. lagging replica) are cached only for
+        models with finite ttl, otherwise rows read right after invalidation
+        could stay stale forever.
+
+        :param fetch: callable without arguments performing request
+        """
+        request = self.request
+        if (not self.result_cache.enabled_for(self.model) or
+                len(request.args or ()) > 1 or
+                self.headers.get('piped_changes')):
+            return fetch()
+        if (self.result_cache.ttl(self.model) is None and
+                self.db_alias != router.db_for_write(self.model)):
+            return fetch()
+        return self.result_cache.get_or_fetch(self.model, request.kwargs,
+                                              fetch, self.name)
+
+    def filter_queryset(self, qs, filters=None, exclude=None, filters_Q=None,
+                        exclude_Q=None):
+        """ Apply lookups and Q-objects of request to queryset.
+        """
+        if filters or filters_Q:
+            filters = filters if isinstance(filters, dict) else {}
+            filters_Q = filters_Q if isinstance(filters_Q, Q) else Q()
+            qs = qs.filter(filters_Q, **filters)
+        if exclude or exclude_Q:
+            exclude = exclude if isinstance(exclude, dict) else {}
+            exclude_Q = exclude_Q if isinstance(exclude_Q, Q) else Q()
+            qs = qs.exclude(exclude_Q, **exclude)
+        return qs
+
+    @classmethod
+    def build_aggregates(cls, aggregates):
+        """ Convert requested aggregates to Django aggregate expressions.
+
+        :param aggregates: dict {name: [function, field]} or
+            {name: [function, field, {'distinct': True}]}, where function is
+            one of `aggregate_functions`
+        :return: dict {name: aggregate expression}
+        :raise ModelTaskError: unknown function or malformed aggregate
+        """
+        if not isinstance(aggregates, dict) or not aggregates:
+            raise ModelTaskError("Aggregates must be a non-empty dict")
+        result = {}
+        for name, spec in aggregates.items():
+            if (not isinstance(spec, (list, tuple)) or
+                    len(spec) not in (2, 3) or
+                    spec[0] not in cls.aggregate_functions):
+                raise ModelTaskError(
+                    "Invalid aggregate %r: %r" % (name, spec))
+            options = dict(spec[2]) if len(spec) == 3 else {}
+            if set(options) - set(['distinct']):
+                raise ModelTaskError(
+                    "Invalid options of aggregate %r: %r" % (name, options))
+            function = cls.aggregate_functions[spec[0]]
+            result[name] = function(spec[1], **options)
+        return result
+
     @staticmethod
     def _create_queryset(model):
         """ Construct queryset by params.
@@ -144,6 +569,9 @@ class ModelTask(RpcTask):
 
     def _create_serializer_class(self, model_class):
         """ Return REST framework serializer class for model.
+
+        Generated classes are cached by (model, base serializer, fields,
+        identity field), see `serializer_classes` stats for cache tuning.
         """
 
         # default serializer
@@ -155,7 +583,37 @@ class ModelTask(RpcTask):
             base_serializer_class = self._import_serializer(custom_serializer)
 
         identity_field = self.identity_field
+        fields = self.request.kwargs.get("fields")
+        if fields:
+            fields = tuple(fields)
+
+        return self.get_serializer_class(model_class, base_serializer_class,
+                                         fields, identity_field)
+
+    @classmethod
+    def get_serializer_class(cls, model_class, base_serializer_class,
+                             fields=None, identity_field=None):
+        """ Return cached or new serializer class for model.
 
+        :param model_class: Django model
+        :param base_serializer_class: DRF model serializer
+        :param fields: tuple of serialized fields or None for all
+        :param identity_field: name of key-field, by default primary key
+        """
+        identity_field = identity_field or model_class._meta.pk.name
+        key = (model_class, base_serializer_class, fields, identity_field)
+        serializer_class = cls.serializer_classes.get(key)
+        if serializer_class is None:
+            serializer_class = cls._build_serializer_class(
+                model_class, base_serializer_class, fields, identity_field)
+            cls.serializer_classes.set(key, serializer_class)
+        return serializer_class
+
+    @staticmethod
+    def _build_serializer_class(model_class, base_serializer_class,
+                                serializer_fields, identity_field):
+        """ Define serializer class for model.
+        """
         # DRF >= 3.4
         base_serializer_fields = (getattr(
             getattr(base_serializer_class, 'Meta', None), 'fields', None))
@@ -169,19 +627,37 @@ class ModelTask(RpcTask):
                     # connect overriden list serializer to child serializer
                     list_serializer_class = GenericListSerializerClass
 
-                if DRF34:
+                if serializer_fields:
+                    fields = list(serializer_fields)
+                elif DRF34:
                     # implicit fields: DRF 3.4 - deprecated , DRF 3.5 - removed
                     fields = base_serializer_fields or '__all__'
 
+            # custom create() or update() must be called for each object
+            custom_save = DRF3 and (
+                overrides_create(base_serializer_class) or
+                overrides_update(base_serializer_class))
+
+            @property
+            def identity_field(self):
+                return identity_field
+
             def get_identity(self, data):
                 try:
                     return data.get(identity_field, data.get('pk', None))
                 except AttributeError:
                     return None
 
-        fields = self.request.kwargs.get("fields")
-        if fields:
-            GenericModelSerializer.Meta.fields = fields
+            if DRF3 and not overrides_create(base_serializer_class):
+                def create(self, validated_data):
+                    """ Creates object with queryset passed by task in
+                    serializer context.
+                    """
+                    queryset = self.context.get('queryset')
+                    if queryset is None:
+                        return super(GenericModelSerializer, self).create(
+                            validated_data)
+                    return create_instance(queryset, validated_data)
 
         return GenericModelSerializer
 
@@ -189,6 +665,144 @@ class ModelTask(RpcTask):
     def serializer_class(self):
         return self._create_serializer_class(self.model)
 
+    def serialize_queryset(self, qs, select_related=None,
+                           prefetch_related=None):
+        """ Serialize all objects of queryset.
+
+        Rows are fetched with QuerySet.values() and serialized without model
+        instances if custom serializer is not requested and all fields of
+        generated serializer are supported by ValuesSerializer.
+
+        Otherwise related objects accessed by serializer are fetched with
+        select_related/prefetch_related in addition to explicitly requested,
+        and only model fields used by serializer are loaded.
+
+        :param select_related: list of relations to join
+        :param prefetch_related: list of relations to prefetch
+        """
+        serializer_class = self.serializer_class
+        if (DRF3 and self.app.conf['values_serialization'] and
+                not self.request.kwargs.get('serializer_cls')):
+            values_serializer = self.values_serializers.get(serializer_class)
+            if values_serializer is None:
+                values_serializer = (ValuesSerializer.build(serializer_class)
+                                     or False)
+                self.values_serializers.set(serializer_class,
+                                            values_serializer)
+            if values_serializer:
+                return values_serializer.serialize(qs)
+        qs = self.plan_query(qs, serializer_class, select_related,
+                             prefetch_related)
+        return serializer_class(instance=qs, many=True).data
+
+    def paginate(self, qs, order_by, cursor, limit, select_related=None,
+                 prefetch_related=None):
+        """ Return page of queryset following cursor.
+
+        Keys of page rows are selected with "greater than" predicate on
+        ordering values of last row of previous page, then page objects are
+        serialized by their primary keys.
+
+        :param order_by: ordering of rows, primary key is added to make it
+            unique, NULLs of nullable fields are ordered last
+        :param cursor: cursor from previous page or '' for the first page
+        :param limit: max number of rows in page
+        :return: dict with serialized rows in 'results' and cursor of next
+            page in 'cursor' (None for the last page)
+        :raise InvalidCursor: cursor is malformed or made for other ordering
+        """
+        order_by = keyset_order(order_by, self.pk_name)
+        nullable = nullable_fields(self.model, order_by)
+        qs = qs.order_by(*keyset_ordering(order_by, nullable))
+        if cursor:
+            qs = qs.filter(keyset_q(order_by, decode_cursor(cursor, order_by),
+                                    nullable))
+        names = [f.lstrip('-') for f in order_by]
+        pk_index = [i for i, name in enumerate(names)
+                    if name in ('pk', self.pk_name)][0]
+        keys = list(qs.values_list(*names)[:limit])
+        results = []
+        if keys:
+            qs = qs.filter(pk__in=[k[pk_index] for k in keys])
+            results = self.serialize_queryset(qs, select_related,
+                                              prefetch_related)
+        next_cursor = None
+        if keys and len(keys) >= limit:
+            next_cursor = encode_cursor(order_by, keys[-1])
+        return {'results': results, 'cursor': next_cursor}
+
+    def store_chunks(self, qs, order_by, chunk_size, select_related=None,
+                     prefetch_related=None):
+        """ Store serialized rows of queryset into result backend by chunks.
+
+        Chunks are selected like pages of cursor pagination and stored with
+        keys `chunk_id(request id, index)` as dicts with rows in 'rows' and
+        'more' flag, which is False for the last chunk. So only one chunk is
+        kept in memory of server and client reads chunks while others are
+        fetched. Storing stops when client abandons result (see
+        `chunks_cancel_id`). Deadline of request is checked only before the
+        first chunk, as client waits for each chunk separately.
+
+        :param order_by: ordering of rows, primary key is added to make it
+            unique
+        :param chunk_size: max number of rows in chunk
+        :return: number of stored chunks
+        :raise ModelTaskError: result backend can not store chunks
+        """
+        if not can_store_chunks(self.backend):
+            raise ModelTaskError('Result backend %s can not store chunks' %
+                                 type(self.backend).__name__)
+        cancel_id = chunks_cancel_id(self.request.id)
+        cursor, index, more = '', 0, True
+        while more:
+            page = self.paginate(qs, order_by, cursor, chunk_size,
+                                 select_related, prefetch_related)
+            cursor = page['cursor']
+            more = cursor is not None
+            key = chunk_id(self.request.id, index)
+            self.backend.store_result(key,
+                                      {'rows': page['results'], 'more': more},
+                                      states.SUCCESS)
+            index += 1
+            if self.backend.get_state(cancel_id) == states.SUCCESS:
+                # client may have dropped chunks before this one was stored
+                self.backend.forget(key)
+                self.backend.forget(cancel_id)
+                break
+        return index
+
+    def plan_query(self, qs, serializer_class, select_related=None,
+                   prefetch_related=None):
+        """ Add relations used by serializer to select_related and
+        prefetch_related of queryset and do not load model fields which are
+        not used by serializer.
+        """
+        select, prefetch, columns = [], [], None
+        if DRF3:
+            plan = self.query_plans.get(serializer_class)
+            if plan is None:
+                plan = (plan_related(serializer_class) +
+                        (plan_columns(serializer_class),))
+                self.query_plans.set(serializer_class, plan)
+            conf = self.app.conf
+            if conf['plan_related']:
+                select, prefetch = plan[:2]
+            if conf['prune_columns']:
+                columns = plan[2]
+        select_related = _as_list(select_related)
+        select = list(select) + list(select_related)
+        prefetch = list(prefetch) + list(_as_list(prefetch_related))
+        if select:
+            qs = qs.select_related(*select)
+        if prefetch:
+            qs = qs.prefetch_related(*prefetch)
+        if columns:
+            # joined relations can not be deferred
+            columns = set(columns)
+            columns.update(p.split('__')[0] for p in select_related)
+            qs = qs.only(*sorted(columns))
+        return qs
+
     @property
     def model(self):
         return self.request.model
@@ -203,9 +817,43 @@ class ModelTask(RpcTask):
         """
         return self.request.kwargs.get('identity') or self.pk_name
 
+    @property
+    def db_alias(self):
+        """ Database alias serving request.
+
+        Explicit `database` of request is used if passed. Read-only tasks
+        use `read_database` from config or Django router's db_for_read
+        (except piped with changing tasks), others use db_for_write.
+
+        :raise ModelTaskError: unknown database alias
+        """
+        database = self.request.kwargs.get('database')
+        if database:
+            if database not in settings.DATABASES:
+                raise ModelTaskError("Unknown database %r" % (database,))
+            return database
+        if self.read_only and not self.headers.get('piped_changes'):
+            return (self.app.conf['read_database'] or
+                    router.db_for_read(self.model))
+        return router.db_for_write(self.model)
+
     @property
     def default_queryset(self):
-        return self._create_queryset(self.model)
+        """ Queryset of requested `manager` (or default one) using database
+        alias of request.
+
+        :raise ModelTaskError: model has no such manager
+        """
+        name = self.request.kwargs.get('manager')
+        if name:
+            manager = self.model._meta.managers_map.get(name)
+            if manager is None:
+                raise ModelTaskError("Model %s has no manager %r" %
+                                     (self.model.__name__, name))
+            qs = manager.all()
+        else:
+            qs = self._create_queryset(self.model)
+        return qs.using(self.db_alias)
 
 
 class ModelChangeTask(ModelTask):
@@ -213,6 +861,26 @@ class ModelChangeTask(ModelTask):
     """
     abstract = True
 
+    def __call__(self, model, *args, **kwargs):
+        try:
+            return super(ModelChangeTask, self).__call__(model, *args,
+                                                         **kwargs)
+        finally:
+            # bulk queries do not send signals of models
+            changed = getattr(self.request, 'model', None)
+            if changed is not None:
+                self.result_cache.invalidate(changed,
+                                             self._changed_alias(changed))
+
+    def _changed_alias(self, model):
+        """ Database alias changes of request were written to.
+        """
+        try:
+            return self.db_alias
+        except ModelTaskError:
+            # unknown database, nothing is written
+            return router.db_for_write(model)
+
     def get_instance(self, data, using=None):
         """ Prepare instance (or several instances) to changes.
 
@@ -227,7 +895,7 @@ class ModelChangeTask(ModelTask):
         get_identity = lambda item: item.get(identity_field, item.get('pk'))
         qs = self.default_queryset
         if using:
-            qs.using(using)
+            qs = qs.using(using)
         if isinstance(data, dict):
             instance = qs.get(**{identity_field: get_identity(data)})
             many = False
@@ -237,8 +905,37 @@ class ModelChangeTask(ModelTask):
             many = True
         return instance, many
 
+    def bulk_delete(self, data, raw=False, batch_size=None):
+        """ Delete several objects with a few set-based queries.
+
+        :param data: list of values with identities of objects
+        :param raw: skip delete signals and cascade collecting if model has
+            no dependent relations, otherwise ignored
+        :param batch_size: max number of objects deleted by one query,
+            by default `bulk_batch_size` from config
+        :return: number of deleted rows
+        """
+        identity_field = self.identity_field
+        identity_values = [item.get(identity_field, item.get('pk'))
+                           for item in data]
+        batch_size = batch_size or self.app.conf['bulk_batch_size']
+        raw = raw and can_raw_delete(self.model)
+        qs = self.default_queryset
+        using = qs.db
+        deleted = 0
+        with atomic_commit_on_success(using=using):
+            for i in range(0, len(identity_values), batch_size):
+                chunk = qs.filter(**{identity_field + '__in':
+                                     identity_values[i:i + batch_size]})
+                if raw:
+                    deleted += chunk._raw_delete(using) or 0
+                else:
+                    deleted += chunk.delete()[0]
+        return deleted
+
     def perform_changes(self, instance, data, many, allow_add_remove=False,
-                        partial=True, force_insert=False, force_update=False):
+                        partial=True, force_insert=False, force_update=False,
+                        bulk=False, batch_size=None):
         """ Change model in accordance with params
 
         :param instance: one or several instances of model
@@ -247,21 +944,36 @@ class ModelChangeTask(ModelTask):
         :param allow_add_remove: True if need to create absent or delete missed
             instances.
         :param partial: True if need partial update
+        :param bulk: save several instances with bulk queries, missing
+            instances are created if `allow_add_remove` is True
+        :param batch_size: max number of instances in one bulk query,
+            by default `bulk_batch_size` from config
         :return: serialized model data or list of one or errors
 
         """
+        bulk = bulk and many and DRF3
+        batch_size = batch_size or self.app.conf['bulk_batch_size']
         kwargs = {'allow_add_remove': allow_add_remove} if not DRF3 else {}
         s = self.serializer_class(instance=instance, data=data, many=many,
-                                  partial=partial, **kwargs)
+                                  partial=partial,
+                                  context={'queryset': self.default_queryset},
+                                  **kwargs)
 
         if s.is_valid():
             if not DRF3:
                 s.save(force_insert=force_insert,
                        force_update=force_update)
+            elif force_insert and bulk:
+                s.instance = s.bulk_create(s.validated_data, batch_size)
             elif force_insert:
                 s.instance = s.create(s.validated_data)
+            elif force_update and bulk:
+                s.instance = s.bulk_update(s.instance, s.validated_data,
+                                           batch_size)
             elif force_update:
-                s.update(s.instance, s.validated_data)
+                s.instance = s.update(s.instance, s.validated_data)
+            elif allow_add_remove and bulk:
+                s.instance = s.bulk_upsert(s.validated_data, batch_size)
             else:
                 s.save()
             return s.data
@@ -286,11 +998,15 @@ class FunctionTask(RpcTask):
     def prepare_context(self, function, *args, **kwargs):
         self.request.function = self._import_function(function)
 
-    @staticmethod
-    def _import_function(func_name):
-        """ Import class by full name, check type and return.
+    @classmethod
+    def _import_function(cls, func_name):
+        """ Find function by name, check type and return.
         """
-        sym = symbol_by_name(func_name)
+        return cls.resources.resolve('function', func_name,
+                                     cls._check_function)
+
+    @staticmethod
+    def _check_function(sym, func_name):
         if hasattr(sym, '__call__'):
             return sym
         raise TypeError("Symbol '{}' is not a function".format(func_name))
@@ -310,6 +1026,10 @@ class PipeTask(RpcTask):
         return super(PipeTask, self).__call__(*args, **kwargs)
 
 
+if config.server_cache_models:
+    ModelTask.result_cache.connect()
+
+
 def get_base_task_class(base_task_name):
     """ Provide base task for actual tasks
 
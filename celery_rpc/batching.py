@@ -0,0 +1,212 @@
+# coding: utf-8
+""" Client-side merging of single-object writes into bulk requests.
+"""
+from __future__ import absolute_import
+
+import threading
+from concurrent.futures import Future
+
+from .cache import encode_key
+from .exceptions import RestFrameworkError
+from .utils import unpack_exception
+
+
+class Batcher(object):
+    """ Collects single-object writes to the same model and sends them as one
+    bulk request.
+
+    Batch is sent when it has `max_size` items or `window` seconds after first
+    item is added. Each writer gets a future resolved with its own object
+    state or its own validation error.
+    """
+
+    class _Batch(object):
+        def __init__(self, kwargs, timeout, retries):
+            self.kwargs = kwargs
+            self.timeout = timeout
+            self.retries = retries
+            self.items = []
+            self.timer = None
+
+    # methods which write existing objects matched by identity
+    identity_methods = ('update', 'update_or_create')
+    # methods which may be safely repeated object by object after failure of
+    # bulk request
+    idempotent_methods = ('update', 'update_or_create')
+
+    def __init__(self, client, max_size=100, window=0.01):
+        """
+        :param client: rpc client which sends bulk requests
+        :param max_size: max number of objects in one request
+        :param window: max delay of sending request (seconds)
+        """
+        self.client = client
+        self.max_size = max_size
+        self.window = window
+        self._batches = {}
+        self._lock = threading.Lock()
+
+    def submit(self, method, model, data, kwargs=None, high_priority=False,
+               timeout=None, retries=1):
+        """ Add single-object write to batch
+
+        :param method: client method name like 'create'
+        :param model: full name of model symbol like 'package.module:Class'
+        :param data: dict with data of object
+        :param kwargs: optional parameters of request (dict)
+        :param high_priority: send batch with high priority
+        :param timeout: timeout of waiting for results of batch
+        :param retries: number of tries to send batch
+        :return: concurrent.futures.Future with result of write
+        """
+        future = Future()
+        key = (method, model, encode_key(kwargs), bool(high_priority),
+               timeout, retries)
+        with self._lock:
+            batch = self._batches.get(key)
+            if batch is None:
+                batch = self._batches[key] = self._Batch(kwargs, timeout,
+                                                         retries)
+                batch.timer = threading.Timer(self.window, self._flush,
+                                              args=(key, batch))
+                batch.timer.daemon = True
+                batch.timer.start()
+            batch.items.append((data, future))
+            full = len(batch.items) >= self.max_size
+        if full:
+            self._flush(key, batch)
+        return future
+
+    def flush(self):
+        """ Send all pending batches immediately.
+        """
+        with self._lock:
+            batches = list(self._batches.items())
+        for key, batch in batches:
+            self._flush(key, batch)
+
+    def _flush(self, key, batch):
+        with self._lock:
+            if self._batches.get(key) is not batch:
+                # already sent
+                return
+            del self._batches[key]
+        batch.timer.cancel()
+        method, model, _, high_priority = key[:4]
+        options = {'kwargs': batch.kwargs, 'high_priority': high_priority,
+                   'timeout': batch.timeout, 'retries': batch.retries}
+        for items in self._split(method, batch.kwargs, batch.items):
+            self._send(method, model, options, items)
+
+    def _split(self, method, kwargs, items):
+        """ Split batch into requests which server can apply in bulk.
+
+        Writes of the same object go to separate requests sent in order of
+        writes. For update_or_create objects without identity (i.e. new
+        ones) are sent apart from objects which may exist.
+        """
+        if method not in self.identity_methods:
+            return [items]
+        identity = (kwargs or {}).get('identity')
+        new, rounds, seen = [], [], []
+        for item in items:
+            value = self._get_identity(item[0], identity)
+            if value is None and method == 'update_or_create':
+                new.append(item)
+                continue
+            for i, identities in enumerate(seen):
+                if value not in identities:
+                    break
+            else:
+                i = len(seen)
+                rounds.append([])
+                seen.append(set())
+            rounds[i].append(item)
+            seen[i].add(value)
+        return [r for r in rounds + [new] if r]
+
+    @staticmethod
+    def _get_identity(data, identity):
+        for name in (identity, 'pk', 'id'):
+            value = data.get(name) if name else None
+            if value is not None:
+                return encode_key(value)
+        return None
+
+    def _send(self, method, model, options, items):
+        """ Send bulk request and resolve futures of items.
+
+        Items with validation errors get their own errors, other items of
+        batch are sent again. If bulk request fails for other reason,
+        idempotent writes are sent object by object.
+        """
+        data = [d for d, _ in items]
+        try:
+            results = getattr(self.client, method)(model, data, batch=False,
+                                                   **options)
+        except Exception as e:
+            errors = self._item_errors(e, len(items))
+            if errors is not None:
+                valid = []
+                for item, error in zip(items, errors):
+                    if error:
+                        item[1].set_exception(self._item_error(e, error))
+                    else:
+                        valid.append(item)
+                if valid:
+                    self._send(method, model, options, valid)
+            elif len(items) > 1 and method in self.idempotent_methods:
+                for item in items:
+                    self._send_one(method, model, options, item)
+            else:
+                for _, future in items:
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(items, results):
+            future.set_result(result)
+
+    def _send_one(self, method, model, options, item):
+        data, future = item
+        try:
+            result = getattr(self.client, method)(model, data, batch=False,
+                                                  **options)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    def _item_errors(self, error, count):
+        """ Extract per-item validation errors of bulk request or None.
+        """
+        error = self._validation_error(error)
+        if error is None or len(error.args) < 2:
+            return None
+        errors = error.args[1]
+        if not isinstance(errors, list) or len(errors) != count:
+            return None
+        return errors
+
+    def _item_error(self, error, item_error):
+        """ Build error of one item like error of bulk request.
+        """
+        cause = self._validation_error(error)
+        exc = cause.__class__(cause.args[0], item_error)
+        if cause is not error:
+            exc = error.__class__(error.args[0], exc)
+        return exc
+
+    def _validation_error(self, error):
+        """ Find serializer error raised by server.
+
+        Without wrapping of remote errors by client it raises ResponseError
+        with error of server (maybe wrapped by server) as second argument.
+        """
+        if (error.__class__.__name__ == 'ResponseError' and
+                len(error.args) > 1):
+            error = error.args[1]
+        if error.__class__.__name__ == 'RemoteException':
+            serializer = self.client._app.conf['result_serializer']
+            error = unpack_exception(error, True, serializer=serializer)
+        if error.__class__.__name__ != RestFrameworkError.__name__:
+            return None
+        return error
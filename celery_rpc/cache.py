@@ -0,0 +1,206 @@
+# coding: utf-8
+""" In-process caches used by celery-rpc client and server.
+"""
+from __future__ import absolute_import
+
+import copy
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import six
+
+from .codecs import RpcJsonEncoder
+
+
+class LRUCache(object):
+    """ Thread-safe bounded LRU cache with optional expiration of items.
+    """
+
+    def __init__(self, max_size=1000):
+        """
+        :param max_size: max number of items stored in cache
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """ Return value stored by key or `default` if there is no actual one.
+        """
+        with self._lock:
+            try:
+                value, expires = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires is not None and expires < time.time():
+                self.misses += 1
+                return default
+            # mark item as recently used
+            self._data[key] = value, expires
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """ Store value by key, drop least recently used items on overflow.
+
+        :param ttl: lifetime of item in seconds, forever if None
+        """
+        expires = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value, expires
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def stats(self):
+        """ Counters for cache tuning.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self)}
+
+
+def encode_key(obj):
+    """ Encode request parameters to string usable as a cache key.
+    """
+    return json.dumps(obj, cls=RpcJsonEncoder, sort_keys=True)
+
+
+def normalize_filter_kwargs(kwargs):
+    """ Build hashable representation of filter request parameters.
+
+    Equal requests (i.e. with different order of lookups or with string and
+    one-item list `order_by`) get equal representation. Q-objects are encoded
+    in the same way as codecs do.
+    """
+    kwargs = dict(kwargs or {})
+    order_by = kwargs.get('order_by')
+    if isinstance(order_by, six.string_types):
+        kwargs['order_by'] = [order_by]
+    elif isinstance(order_by, tuple):
+        kwargs['order_by'] = list(order_by)
+    fields = kwargs.get('fields')
+    if isinstance(fields, tuple):
+        kwargs['fields'] = list(fields)
+    return encode_key(kwargs)
+
+
+class FilterCache(object):
+    """ Read-through cache for results of filter requests.
+
+    Each model has a generation counter, which is a part of cache key.
+    Invalidation of model bumps generation, so all cached results for model
+    become unreachable and are evicted later by LRU policy.
+    """
+
+    def __init__(self, models, max_size=1000):
+        """
+        :param models: dict {model name: ttl in seconds} of cached models
+        :param max_size: max number of cached results
+        """
+        self.models = dict(models)
+        self._cache = LRUCache(max_size)
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def enabled_for(self, model):
+        return model in self.models
+
+    def get_or_fetch(self, model, kwargs, fetch):
+        """ Return cached result of request or fetch and cache it.
+
+        :param model: model name
+        :param kwargs: filter request parameters
+        :param fetch: callable without arguments performing request
+        :return: result of request
+        """
+        key = (model, self._generations.get(model, 0),
+               normalize_filter_kwargs(kwargs))
+        missing = object()
+        value = self._cache.get(key, missing)
+        if value is not missing:
+            return copy.deepcopy(value)
+        value = fetch()
+        # result is not cached if model was invalidated while fetching
+        if self._generations.get(model, 0) == key[1]:
+            self._cache.set(key, copy.deepcopy(value), self.models[model])
+        return value
+
+    def invalidate(self, model):
+        """ Drop all cached results for model.
+        """
+        if model not in self.models:
+            return
+        with self._lock:
+            self._generations[model] = self._generations.get(model, 0) + 1
+
+    def clear(self):
+        self._cache.clear()
+
+    @property
+    def stats(self):
+        return self._cache.stats
+
+
+class SingleFlight(object):
+    """ Coalesces concurrent identical requests into one.
+
+    First thread performs request, other threads with the same key wait for
+    it and receive a copy of its result or the same exception.
+    """
+
+    class _Call(object):
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fetch):
+        """ Perform request or join identical request in flight.
+
+        :param key: hashable request identity
+        :param fetch: callable without arguments performing request
+        :return: result of request
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = fetch()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
@@ -2,17 +2,31 @@ from __future__ import absolute_import
 
 import os
 import socket
+import threading
+import time
 import warnings
+from logging import getLogger
 
+from celery import states
 from celery.exceptions import TimeoutError
+from celery.result import AsyncResult, ResultSet
 from celery.utils import nodename
 
-from . import utils
+from . import config, utils
+from .cache import (FilterCache, SingleFlight, encode_key,
+                    normalize_filter_kwargs)
 from .config import get_result_timeout
 from .exceptions import RestFrameworkError, remote_exception_registry
 
 TEST_MODE = bool(os.environ.get('CELERY_RPC_TEST_MODE', False))
 
+logger = getLogger(__name__)
+
+# Tasks changing model state on server
+MODEL_CHANGE_TASK_NAMES = (utils.UPDATE_TASK_NAME, utils.GETSET_TASK_NAME,
+                           utils.UPDATE_OR_CREATE_TASK_NAME,
+                           utils.CREATE_TASK_NAME, utils.DELETE_TASK_NAME)
+
 
 def _async_to_nowait(nowait=False, **kwargs):
     if 'async' in kwargs:
@@ -47,20 +61,43 @@ class Client(object):
 
     _app = None
     _task_stubs = None
+    filter_cache = None
+    _batcher = None
+
+    # Single-object writes may be merged into bulk requests
+    supports_batching = True
 
-    def __init__(self, app_config=None):
+    # Initial and max delays between checks of result readiness (seconds)
+    poll_interval = 0.005
+    max_poll_interval = 0.25
+
+    def __init__(self, app_config=None, shared=None):
         """ Adjust server interaction parameters
 
         :param app_config: alternative configuration parameters for Celery app.
+        :param shared: use Celery app, broker connection pool and task stubs
+            shared with other clients with equal configuration, by default
+            `client_shared_app` from config
 
         """
-        self._app = utils.create_celery_app(config=app_config)
-        if TEST_MODE:
-            # XXX Working ONLY while tests running
-            from .app import rpc
-            self._task_stubs = rpc.tasks
+        if shared is None:
+            shared = (app_config or {}).get('client_shared_app',
+                                            config.client_shared_app)
+        if shared:
+            self._app, self._task_stubs = shared_apps.get(app_config)
         else:
-            self._task_stubs = self._register_stub_tasks(self._app)
+            self._app, self._task_stubs = self._create_app(app_config)
+
+        self._client_name = self.get_client_name()
+        self._signature_templates = self._create_signature_templates()
+
+        cache_models = self._app.conf.get('client_cache_models')
+        if cache_models:
+            self.filter_cache = FilterCache(
+                cache_models, self._app.conf['client_cache_size'])
+
+        self._single_flight = SingleFlight()
+        self._batcher_lock = threading.Lock()
 
         self.errors = remote_exception_registry
 
@@ -82,16 +119,40 @@ class Client(object):
         :return: celery.canvas.Signature instance
 
         """
-        task = self._task_stubs[task_name]
-        options.setdefault("headers", {})
-        options["headers"]["referer"] = self.get_client_name()
+        try:
+            task, template = self._signature_templates[task_name, high_priority]
+        except KeyError:
+            task = self._task_stubs[task_name]
+            template = self._create_signature_template(task, high_priority)
+        headers = options.get("headers")
+        options = dict(template, **options)
+        options["headers"] = dict(headers or (), referer=self._client_name)
+        return task.subtask(args=args, kwargs=kwargs, **options)
+
+    def _create_signature_templates(self):
+        """ Precompute options of signatures for all known tasks
+
+        :return: dict {(task name, high priority flag): (task, options)}
+        """
+        templates = {}
+        for name in utils.TASK_NAME_MAP.values():
+            task = self._task_stubs[name]
+            for high_priority in (False, True):
+                templates[name, high_priority] = (
+                    task, self._create_signature_template(task, high_priority))
+        return templates
+
+    def _create_signature_template(self, task, high_priority=False):
+        """ Options of signature which are the same for all requests to task.
+        """
+        options = {}
         if high_priority:
             conf = task.app.conf
             options['routing_key'] = conf['task_high_priority_routing_key']
-        return task.subtask(args=args, kwargs=kwargs, **options)
+        return options
 
     def filter(self, model, kwargs=None, nowait=False, timeout=None, retries=1,
-               high_priority=False, **options):
+               high_priority=False, coalesce=None, **options):
         """ Call filtering Django model objects on server
 
         :param model: full name of model symbol like 'package.module:Class'
@@ -100,6 +161,8 @@ class Client(object):
         :param retries: number of tries to send request
         :param high_priority: ability to speedup consuming of the task
             if server support prioritization, by default False
+        :param coalesce: share one request between concurrent identical
+            requests, by default `coalesce_requests` from config
         :param kwargs: optional parameters of request
             filters - dict of terms compatible with django database query
             offset - offset from which return a results
@@ -110,20 +173,285 @@ class Client(object):
                 minus ('-') set reverse order, default = []
             filters_Q - django Q-object for filtering models
             exclude_Q - django Q-object for excluding matched models
+            select_related - relations to join (list or string)
+            prefetch_related - relations to prefetch (list or string)
+            manager - name of model manager, by default default manager
+            database - database alias, by default chosen by server policy
+            cursor - enables cursor pagination: '' for the first page or
+                'cursor' of previous page, result is dict with 'results'
+                and 'cursor' of next page (None for the last page)
 
         :param options: optional parameter of apply_async
         :return: list of filtered objects or AsyncResult if nowait is True
         :raise: see get_result()
 
+        Results for models listed in `client_cache_models` config are cached
+        (except nowait requests).
+
         """
         nowait = _async_to_nowait(nowait, **options)
         args = (model, )
         signature = self.prepare_task(utils.FILTER_TASK_NAME, args, kwargs,
                                       high_priority=high_priority, **options)
+        def fetch():
+            return self.send_request(signature, nowait, timeout, retries)
+
+        if nowait:
+            return fetch()
+        if coalesce is None:
+            coalesce = self._app.conf['coalesce_requests']
+        if coalesce:
+            key = (utils.FILTER_TASK_NAME, model,
+                   normalize_filter_kwargs(kwargs))
+            fetch = self._coalesced(key, fetch)
+        cache = self.filter_cache
+        if cache is None or not cache.enabled_for(model):
+            return fetch()
+        return cache.get_or_fetch(model, kwargs, fetch)
+
+    def iter_filter(self, model, kwargs=None, page_size=None, timeout=None,
+                    retries=1, high_priority=False, **options):
+        """ Iterate over all filtered Django model objects page by page
+
+        Pages are requested with server-side cursor pagination ("greater than
+        last seen key" predicates instead of offsets), so each page costs the
+        same for any position in the table. Next page is requested while
+        current one is consumed.
+
+        :param model: full name of model symbol like 'package.module:Class'
+        :param kwargs: optional parameters of request like for filter(),
+            except `offset`, `limit` and `cursor`. Primary key is added to
+            `order_by` to make it unique, NULLs are ordered last.
+        :param page_size: number of objects in one request,
+            by default `filter_limit` from config
+        :param timeout: timeout of waiting for each page
+        :param retries: number of tries to send request
+        :param high_priority: ability to speedup consuming of the task
+        :param options: optional parameter of apply_async
+        :return: iterator over filtered objects
+        :raise Client.InvalidRequest: unsupported parameters of request
+        :raise: see get_result()
+
+        """
+        kwargs = self._prepare_iter_filter(kwargs, page_size)
+        page = self.filter(model, dict(kwargs, cursor=''), nowait=True,
+                           high_priority=high_priority, retries=retries,
+                           **options)
+        while page is not None:
+            result = self.get_result(page, timeout)
+            page = None
+            if result['cursor'] is not None:
+                # prefetch next page while caller handles current one
+                page = self.filter(
+                    model, dict(kwargs, cursor=result['cursor']),
+                    nowait=True, high_priority=high_priority, retries=retries,
+                    **options)
+            for row in result['results']:
+                yield row
+
+    def _prepare_iter_filter(self, kwargs, page_size):
+        kwargs = dict(kwargs or {})
+        for name in ('offset', 'limit', 'cursor', 'chunk_size'):
+            if name in kwargs:
+                raise self.InvalidRequest(
+                    '%s is not supported, use page_size' % name)
+        kwargs['limit'] = page_size or self._app.conf['filter_limit']
+        return kwargs
+
+    def stream_filter(self, model, kwargs=None, chunk_size=None,
+                      timeout=None, retries=1, high_priority=False,
+                      **options):
+        """ Iterate over all filtered Django model objects delivered by
+        chunks
+
+        Server stores serialized objects into result backend by chunks,
+        client fetches and decodes them one by one and drops them from
+        backend, so client keeps only one chunk in memory. Chunks not
+        consumed yet stay in backend, which must be a key-value or database
+        backend (not rpc://). If iteration is abandoned (iterator is
+        closed or garbage collected), remaining chunks are dropped and server
+        stops storing new ones. Request is sent before iteration starts.
+
+        :param model: full name of model symbol like 'package.module:Class'
+        :param kwargs: optional parameters of request like for filter(),
+            except `offset`, `limit` and `cursor`. Primary key is added to
+            `order_by` to make it unique, NULLs are ordered last.
+        :param chunk_size: number of objects in one chunk,
+            by default `filter_chunk_size` from config
+        :param timeout: timeout of waiting for each chunk
+        :param retries: number of tries to send request
+        :param high_priority: ability to speedup consuming of the task
+        :param options: optional parameter of apply_async
+        :return: iterator over filtered objects
+        :raise Client.InvalidRequest: unsupported parameters of request
+        :raise: see get_result()
+
+        """
+        kwargs = self._prepare_stream_filter(kwargs, chunk_size)
+        result = self.filter(model, kwargs, nowait=True, timeout=timeout,
+                             high_priority=high_priority, retries=retries,
+                             **options)
+        return self._iter_chunks(result, timeout)
+
+    def _prepare_stream_filter(self, kwargs, chunk_size):
+        if not utils.can_store_chunks(self._app.backend):
+            raise self.InvalidRequest(
+                'Result backend %s can not store chunks' %
+                type(self._app.backend).__name__)
+        kwargs = dict(kwargs or {})
+        for name in ('offset', 'limit', 'cursor'):
+            if name in kwargs:
+                raise self.InvalidRequest(
+                    '%s is not supported, use chunk_size' % name)
+        kwargs['chunk_size'] = (chunk_size or
+                                self._app.conf['filter_chunk_size'])
+        return kwargs
+
+    def _iter_chunks(self, result, timeout=None):
+        timeout = timeout or get_result_timeout
+        more = True
+        index = 0
+        try:
+            while more:
+                deadline = time.time() + timeout
+                delay = self.poll_interval
+                chunk = self._poll_chunk(result, index)
+                while chunk is None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise self.TimeoutError(
+                            'Timeout exceeded while waiting for results')
+                    time.sleep(min(delay, remaining))
+                    delay = min(delay * 2, self.max_poll_interval)
+                    chunk = self._poll_chunk(result, index)
+                index += 1
+                more = chunk['more']
+                for row in chunk['rows']:
+                    yield row
+        finally:
+            if more:
+                # iteration is abandoned or failed
+                self._drop_chunks(result, index)
+
+    def _poll_chunk(self, result, index):
+        """ Return chunk of result and drop it from backend or None if chunk
+        is not ready yet.
+
+        :raise: error of failed request, see get_result()
+        """
+        # chunks are stored before request is finished
+        done = result.ready()
+        chunk = AsyncResult(utils.chunk_id(result.id, index), app=self._app)
+        if not chunk.ready():
+            if not done:
+                return None
+            self._collect_result(result)
+            raise self.ResponseError(
+                'Chunk %d of result %s is missing' % (index, result.id))
+        value = self._collect_result(chunk)
+        chunk.forget()
+        return value
+
+    def _drop_chunks(self, result, index):
+        """ Drop not consumed chunks of result starting from index and stop
+        server from storing more of them.
+        """
+        backend = self._app.backend
+        cancel_id = utils.chunks_cancel_id(result.id)
+        cancelled = not result.ready()
+        if cancelled:
+            # server checks this mark after storing each chunk
+            backend.store_result(cancel_id, True, states.SUCCESS)
+        while True:
+            chunk = AsyncResult(utils.chunk_id(result.id, index),
+                                app=self._app)
+            if not chunk.ready():
+                break
+            chunk.forget()
+            index += 1
+        if cancelled and result.ready():
+            # request is finished, nobody else will drop the mark
+            backend.forget(cancel_id)
+
+    def count(self, model, kwargs=None, nowait=False, timeout=None, retries=1,
+              high_priority=False, **options):
+        """ Count Django model objects on server
+
+        :param model: full name of model symbol like 'package.module:Class'
+        :param kwargs: optional parameters of request
+            filters, exclude, filters_Q, exclude_Q - like for filter()
+        :param nowait: enables delayed collecting of result
+        :param timeout: timeout of waiting for results
+        :param retries: number of tries to send request
+        :param high_priority: ability to speedup consuming of the task
+            if server support prioritization, by default False
+        :param options: optional parameter of apply_async
+        :return: number of matched objects or AsyncResult if nowait is True
+        :raise: see get_result()
+
+        """
+        nowait = _async_to_nowait(nowait, **options)
+        signature = self.prepare_task(utils.COUNT_TASK_NAME, (model, ),
+                                      kwargs, high_priority=high_priority,
+                                      **options)
+        return self.send_request(signature, nowait, timeout, retries)
+
+    def exists(self, model, kwargs=None, nowait=False, timeout=None,
+               retries=1, high_priority=False, **options):
+        """ Check existence of Django model objects on server
+
+        :param model: full name of model symbol like 'package.module:Class'
+        :param kwargs: optional parameters of request
+            filters, exclude, filters_Q, exclude_Q - like for filter()
+        :param nowait: enables delayed collecting of result
+        :param timeout: timeout of waiting for results
+        :param retries: number of tries to send request
+        :param high_priority: ability to speedup consuming of the task
+            if server support prioritization, by default False
+        :param options: optional parameter of apply_async
+        :return: True if any object matches or AsyncResult if nowait is True
+        :raise: see get_result()
+
+        """
+        nowait = _async_to_nowait(nowait, **options)
+        signature = self.prepare_task(utils.EXISTS_TASK_NAME, (model, ),
+                                      kwargs, high_priority=high_priority,
+                                      **options)
+        return self.send_request(signature, nowait, timeout, retries)
+
+    def aggregate(self, model, aggregates, kwargs=None, nowait=False,
+                  timeout=None, retries=1, high_priority=False, **options):
+        """ Aggregate values of Django model objects on server
+
+        :param model: full name of model symbol like 'package.module:Class'
+        :param aggregates: dict {name: [function, field]} or
+            {name: [function, field, {'distinct': True}]}, functions are
+            'Sum', 'Avg', 'Min', 'Max' and 'Count'
+        :param kwargs: optional parameters of request
+            filters, exclude, filters_Q, exclude_Q - like for filter()
+            group_by - fields to group objects by (list or string)
+            order_by - order of groups, by default group_by
+            offset - offset of first group
+            limit - max number of groups
+        :param nowait: enables delayed collecting of result
+        :param timeout: timeout of waiting for results
+        :param retries: number of tries to send request
+        :param high_priority: ability to speedup consuming of the task
+            if server support prioritization, by default False
+        :param options: optional parameter of apply_async
+        :return: dict {name: value}, list of such dicts with group_by values
+            for grouped request or AsyncResult if nowait is True
+        :raise: see get_result()
+
+        """
+        nowait = _async_to_nowait(nowait, **options)
+        signature = self.prepare_task(utils.AGGREGATE_TASK_NAME,
+                                      (model, aggregates), kwargs,
+                                      high_priority=high_priority, **options)
         return self.send_request(signature, nowait, timeout, retries)
 
     def update(self, model, data, kwargs=None, nowait=False, timeout=None,
-               retries=1, high_priority=False, **options):
+               retries=1, high_priority=False, batch=None, **options):
         """ Call update Django model objects on server
 
         :param model: full name of model symbol like 'package.module:Class'
@@ -134,19 +462,26 @@ class Client(object):
         :param retries: number of tries to send request
         :param high_priority: ability to speedup consuming of the task
             if server support prioritization, by default False
+        :param batch: merge single-object request with concurrent ones into
+            bulk request, by default `batch_writes` from config
         :param options: optional parameter of apply_async
         :return: dict with updated state of model or list of them or
-            AsyncResult if nowait is True
+            AsyncResult if nowait is True (concurrent.futures.Future for
+            batched request)
         :raise InvalidRequest: if data has non iterable type
 
         """
         if not hasattr(data, '__iter__'):
             raise self.InvalidRequest("Parameter 'data' must be a dict or list")
         nowait = _async_to_nowait(nowait, **options)
+        if self._should_batch(batch, data, options):
+            return self._submit_batched('update', model, data, kwargs, nowait,
+                                        high_priority, timeout, retries)
         args = (model, data)
         signature = self.prepare_task(utils.UPDATE_TASK_NAME, args, kwargs,
                                       high_priority=high_priority, **options)
-        return self.send_request(signature, nowait, timeout, retries)
+        return self._send_changes([model], signature, nowait, timeout,
+                                  retries)
 
     def getset(self, model, data, kwargs=None, nowait=False, timeout=None,
                retries=1, high_priority=False, **options):
@@ -172,10 +507,12 @@ class Client(object):
         args = (model, data)
         signature = self.prepare_task(utils.GETSET_TASK_NAME, args, kwargs,
                                       high_priority=high_priority, **options)
-        return self.send_request(signature, nowait, timeout, retries)
+        return self._send_changes([model], signature, nowait, timeout,
+                                  retries)
 
     def update_or_create(self, model, data, kwargs=None, nowait=False,
-                         timeout=None, retries=1, high_priority=False, **options):
+                         timeout=None, retries=1, high_priority=False,
+                         batch=None, **options):
         """ Call update Django model objects on server. If there is not for some
         data, then a new object will be created.
 
@@ -187,9 +524,12 @@ class Client(object):
         :param retries: number of tries to send request
         :param high_priority: ability to speedup consuming of the task
             if server support prioritization, by default False
+        :param batch: merge single-object request with concurrent ones into
+            bulk request, by default `batch_writes` from config
         :param options: optional parameter of apply_async
         :return: dict with updated state of model or list of them or
-            AsyncResult if nowait is True
+            AsyncResult if nowait is True (concurrent.futures.Future for
+            batched request)
         :raise InvalidRequest: if data has non iterable type
 
         """
@@ -197,13 +537,18 @@ class Client(object):
             raise self.InvalidRequest("Parameter 'data' must be a dict or list")
         args = (model, data)
         nowait = _async_to_nowait(nowait, **options)
+        if self._should_batch(batch, data, options):
+            return self._submit_batched('update_or_create', model, data,
+                                        kwargs, nowait, high_priority,
+                                        timeout, retries)
         signature = self.prepare_task(
             utils.UPDATE_OR_CREATE_TASK_NAME, args, kwargs,
             high_priority=high_priority, **options)
-        return self.send_request(signature, nowait, timeout, retries)
+        return self._send_changes([model], signature, nowait, timeout,
+                                  retries)
 
     def create(self, model, data, kwargs=None, nowait=False, timeout=None,
-               retries=1, high_priority=False, **options):
+               retries=1, high_priority=False, batch=None, **options):
         """ Call create Django model objects on server.
 
         :param model: full name of model symbol like 'package.module:Class'
@@ -214,20 +559,27 @@ class Client(object):
         :param retries: number of tries to send request
         :param high_priority: ability to speedup consuming of the task
             if server support prioritization, by default False
+        :param batch: merge single-object request with concurrent ones into
+            bulk request, by default `batch_writes` from config
         :param options: optional parameter of apply_async
         :return: dict with updated state of model or list of them or
-            AsyncResult if nowait is True
+            AsyncResult if nowait is True (concurrent.futures.Future for
+            batched request)
         :raise InvalidRequest: if data has non iterable type
 
         """
         if not hasattr(data, '__iter__'):
             raise self.InvalidRequest("Parameter 'data' must be a dict or list")
         nowait = _async_to_nowait(nowait, **options)
+        if self._should_batch(batch, data, options):
+            return self._submit_batched('create', model, data, kwargs, nowait,
+                                        high_priority, timeout, retries)
         args = (model, data)
         signature = self.prepare_task(
             utils.CREATE_TASK_NAME, args, kwargs, high_priority=high_priority,
             **options)
-        return self.send_request(signature, nowait, timeout, retries)
+        return self._send_changes([model], signature, nowait, timeout,
+                                  retries)
 
     def delete(self, model, data, kwargs=None, nowait=False, timeout=None,
                retries=1, high_priority=False, **options):
@@ -252,10 +604,11 @@ class Client(object):
         nowait = _async_to_nowait(nowait, **options)
         signature = self.prepare_task(utils.DELETE_TASK_NAME, args, kwargs,
                                       high_priority=high_priority, **options)
-        return self.send_request(signature, nowait, timeout, retries)
+        return self._send_changes([model], signature, nowait, timeout,
+                                  retries)
 
     def call(self, function, args=None, kwargs=None, nowait=False, timeout=None,
-             retries=1, high_priority=False, **options):
+             retries=1, high_priority=False, coalesce=False, **options):
         """ Call function on server
 
         :param function: full name of model symbol like 'package.module:Class'
@@ -266,16 +619,86 @@ class Client(object):
         :param retries: number of tries to send request
         :param high_priority: ability to speedup consuming of the task
             if server support prioritization, by default False
+        :param coalesce: share one request between concurrent identical
+            calls; use it for read-only functions only
         :param options: optional parameter of apply_async
         :return: result of function call or AsyncResult if nowait is True
         :raise InvalidRequest: if data has non iterable type
 
         """
-        args = (function, args, kwargs)
+        call_args = (function, args, kwargs)
         nowait = _async_to_nowait(nowait, **options)
-        signature = self.prepare_task(utils.CALL_TASK_NAME, args, None,
+        signature = self.prepare_task(utils.CALL_TASK_NAME, call_args, None,
                                       high_priority=high_priority, **options)
-        return self.send_request(signature, nowait, timeout, retries)
+
+        def fetch():
+            return self.send_request(signature, nowait, timeout, retries)
+
+        if coalesce and not nowait:
+            key = (utils.CALL_TASK_NAME, function, encode_key([args, kwargs]))
+            fetch = self._coalesced(key, fetch)
+        return fetch()
+
+    def call_many(self, function, calls, chunk_size=None, timeout=None,
+                  retries=1, high_priority=False, **options):
+        """ Call function on server several times with different parameters
+
+        Calls are sent in chunks of `chunk_size` calls per message, function
+        is resolved on server once per chunk.
+
+        :param function: full name of function symbol like
+            'package.module:function'
+        :param calls: list of (args, kwargs) pairs for each call
+        :param chunk_size: max number of calls in one message, by default
+            `call_many_chunk_size` from config
+        :param timeout: timeout of waiting for results
+        :param retries: number of tries to send each chunk
+        :param high_priority: ability to speedup consuming of the task
+            if server support prioritization, by default False
+        :param options: optional parameter of apply_async
+        :return: list of results of each call; failed calls are represented
+            by exception instances
+        :raise InvalidRequest: if calls have invalid structure
+
+        """
+        signatures = self._prepare_call_many(function, calls, chunk_size,
+                                             high_priority, **options)
+        async_results = [self.send_request(s, True, timeout, retries)
+                         for s in signatures]
+        return self._unpack_call_many(self.gather(async_results, timeout))
+
+    def _prepare_call_many(self, function, calls, chunk_size=None,
+                           high_priority=False, **options):
+        """ Split calls to chunks and prepare signature for each chunk.
+        """
+        try:
+            calls = [[list(args or []), kwargs or {}] for args, kwargs in calls]
+        except (TypeError, ValueError):
+            raise self.InvalidRequest(
+                "Parameter 'calls' must be a list of (args, kwargs) pairs")
+        chunk_size = chunk_size or self._app.conf['call_many_chunk_size']
+        signatures = []
+        for i in range(0, len(calls), chunk_size):
+            args = (function, calls[i:i + chunk_size])
+            signatures.append(self.prepare_task(
+                utils.CALL_MANY_TASK_NAME, args, None,
+                high_priority=high_priority, **options))
+        return signatures
+
+    def _unpack_call_many(self, chunks):
+        """ Join results of chunks, convert failed calls to exceptions.
+        """
+        serializer = self._app.conf['result_serializer']
+        results = []
+        for chunk in chunks:
+            for ok, value in chunk:
+                if not ok:
+                    exc = remote_exception_registry.unpack_exception(
+                        value, serializer)
+                    value = exc or self.ResponseError(
+                        'Something goes wrong while calling', value)
+                results.append(value)
+        return results
 
     def get_result(self, async_result, timeout=None, **options):
         """ Collect results from delayed result object
@@ -287,28 +710,168 @@ class Client(object):
             Framework at server (only is serializer is pickle or yaml)
         :raise Client.ResponseError: something goes wrong
 
+        """
+        return self._collect_result(async_result, timeout, **options)
+
+    def _collect_result(self, async_result, timeout=None, **options):
+        """ Wait for result and translate errors of failed request.
         """
         timeout = timeout or get_result_timeout
 
         try:
             return async_result.get(timeout=timeout, **options)
-        except TimeoutError:
-            raise self.TimeoutError('Timeout exceeded while waiting for results')
         except RestFrameworkError:
             # !!! Not working with JSON serializer
             raise
         except Exception as e:
-            exc = self._unpack_exception(e)
-            if not exc:
-                exc = self.ResponseError(
-                    'Something goes wrong while getting results', e)
-            raise exc
+            raise self._translate_error(e)
+
+    def gather(self, async_results, timeout=None, **options):
+        """ Collect results from several delayed result objects at once
+
+        Results are fetched in one backend round-trip if result backend
+        supports it (i.e. redis or cache backends), otherwise one by one.
+
+        :param async_results: list of Celery AsyncResult objects
+        :param timeout: timeout of waiting for all results
+        :return: list of results in the same order as `async_results`
+        :raise: see get_result()
+
+        """
+        timeout = timeout or get_result_timeout
+        result_set = ResultSet(list(async_results), app=self._app)
+        if not result_set.results:
+            return []
+        try:
+            return result_set.get(timeout=timeout, **options)
+        except RestFrameworkError:
+            raise
+        except Exception as e:
+            raise self._translate_error(e)
+
+    def as_completed(self, async_results, timeout=None, interval=0.05):
+        """ Iterate over results of delayed result objects as they complete
+
+        :param async_results: list of Celery AsyncResult objects
+        :param timeout: timeout of waiting for all results
+        :param interval: delay between polls for backends without native
+            support of collecting several results at once
+        :return: generator of (AsyncResult, result) pairs in order of
+            completion
+        :raise: see get_result()
+
+        """
+        timeout = timeout or get_result_timeout
+        result_set = ResultSet(list(async_results), app=self._app)
+        if not result_set.results:
+            return
+        if result_set.supports_native_join:
+            by_id = {r.id: r for r in result_set.results}
+            try:
+                for task_id, meta in result_set.iter_native(
+                        timeout=timeout, interval=interval):
+                    if meta['status'] in states.PROPAGATE_STATES:
+                        raise meta['result']
+                    yield by_id[task_id], meta['result']
+            except RestFrameworkError:
+                raise
+            except Exception as e:
+                raise self._translate_error(e)
+            return
+
+        pending = list(result_set.results)
+        started = time.time()
+        while pending:
+            for r in [r for r in pending if r.ready()]:
+                pending.remove(r)
+                yield r, self.get_result(r, timeout)
+            if not pending:
+                break
+            if time.time() - started > timeout:
+                raise self.TimeoutError(
+                    'Timeout exceeded while waiting for results')
+            time.sleep(interval)
+
+    def _translate_error(self, error):
+        """ Convert error raised while getting results to client exception.
+        """
+        if isinstance(error, TimeoutError):
+            return self.TimeoutError(
+                'Timeout exceeded while waiting for results')
+        exc = self._unpack_exception(error)
+        if not exc:
+            exc = self.ResponseError(
+                'Something goes wrong while getting results', error)
+        return exc
 
     def _unpack_exception(self, error):
         wrap_errors = self._app.conf['wrap_remote_errors']
         serializer = self._app.conf['result_serializer']
         return utils.unpack_exception(error, wrap_errors, serializer=serializer)
 
+    def _should_batch(self, batch, data, options=None):
+        """ Check if request must be merged into bulk request.
+
+        Requests with options of apply_async are not merged.
+        """
+        if not self.supports_batching or not isinstance(data, dict):
+            return False
+        if options:
+            return False
+        if batch is None:
+            batch = self._app.conf['batch_writes']
+        return batch
+
+    def _submit_batched(self, method, model, data, kwargs, nowait=False,
+                        high_priority=False, timeout=None, retries=1):
+        """ Add single-object request to bulk request.
+
+        Requests are merged only with requests having the same kwargs,
+        priority, timeout and retries.
+
+        :return: future of result if nowait else result
+        """
+        if self._batcher is None:
+            from .batching import Batcher
+            with self._batcher_lock:
+                if self._batcher is None:
+                    self._batcher = Batcher(
+                        self, max_size=self._app.conf['batch_max_size'],
+                        window=self._app.conf['batch_window'])
+        future = self._batcher.submit(method, model, data, kwargs,
+                                      high_priority, timeout, retries)
+        return future if nowait else future.result()
+
+    def _coalesced(self, key, fetch):
+        """ Wrap request to share it between concurrent identical requests.
+        """
+        if self._single_flight is None:
+            return fetch
+        return lambda: self._single_flight.do(key, fetch)
+
+    def _send_changes(self, models, signature, nowait=False, timeout=None,
+                      retries=1):
+        """ Send request changing models and drop their cached filter results.
+
+        Cache is invalidated before sending and again when request returns,
+        so results of filter requests served while changes were applied are
+        dropped too. Result of nowait request is not awaited, so filter
+        requests made before changes are applied may be cached.
+        """
+        for model in models:
+            self._invalidate_cache(model)
+        try:
+            return self.send_request(signature, nowait, timeout, retries)
+        finally:
+            for model in models:
+                self._invalidate_cache(model)
+
+    def _invalidate_cache(self, model):
+        """ Drop cached filter results for model changed by request.
+        """
+        if self.filter_cache is not None:
+            self.filter_cache.invalidate(model)
+
     def pipe(self):
         """ Create pipeline for RPC request
         :return: Instance of Pipe
@@ -331,24 +894,64 @@ class Client(object):
         :raise Client.ResponseError: something goes wrong (if nowait=False)
 
         """
-        expires = timeout or get_result_timeout
+        timeout = timeout or get_result_timeout
+        deadline = time.time() + timeout
         nowait = _async_to_nowait(nowait, **kwargs)
+        attempt = 0
         while True:
             # noinspection PyBroadException
             try:
-                try:
-                    r = signature.apply_async(expires=expires)
-                except Exception as e:
-                    raise self.RequestError(
-                        'Something goes wrong while sending request', e)
+                r = self._apply(signature, timeout, deadline)
                 if nowait:
                     return r
                 else:
                     return self.get_result(r, timeout)
             except Exception:
-                retries -= 1
-                if retries <= 0:
+                attempt += 1
+                delay = self._retry_delay(attempt, retries, deadline)
+                if delay is None:
                     raise
+                time.sleep(delay)
+                timeout = deadline - time.time()
+
+    def _apply(self, signature, expires, deadline):
+        """ Send task message with absolute deadline of request in headers.
+        """
+        headers = dict(signature.options.get('headers') or (),
+                       deadline=deadline)
+        try:
+            return signature.apply_async(expires=expires, headers=headers)
+        except Exception as e:
+            raise self.RequestError(
+                'Something goes wrong while sending request', e)
+
+    def _retry_delay(self, attempt, retries, deadline):
+        """ Delay before next try of request or None if request should not
+        be retried: tries are exhausted or overall deadline will be exceeded.
+        """
+        if attempt >= retries:
+            return None
+        conf = self._app.conf
+        delay = min(conf['retry_backoff'] * 2 ** (attempt - 1),
+                    conf['retry_backoff_max'])
+        if time.time() + delay >= deadline:
+            return None
+        return delay
+
+    @classmethod
+    def _create_app(cls, app_config=None):
+        """ Create Celery app for client
+
+        :param app_config: alternative configuration parameters for Celery app.
+        :return: (celery application, dict {task_name: task_stub})
+
+        """
+        app = utils.create_celery_app(config=app_config)
+        if TEST_MODE:
+            # XXX Working ONLY while tests running
+            from .app import rpc
+            return app, rpc.tasks
+        return app, cls._register_stub_tasks(app)
 
     @classmethod
     def _register_stub_tasks(cls, app):
@@ -368,6 +971,89 @@ class Client(object):
         return tasks
 
 
+class SharedApps(object):
+    """ Process-wide registry of Celery apps shared by clients.
+
+    Clients with equal configuration get the same Celery app, so they share
+    broker connection pool (limited by `broker_pool_limit` config) and task
+    stubs. Registry is reset in child process after fork.
+
+    With `connection_limit` pools of all apps get their limits from this
+    process-wide budget: each new app takes its `broker_pool_limit`
+    connections (one if pooling is disabled) while budget lasts, and apps
+    created after budget is exhausted get minimal pool of one connection.
+    """
+
+    def __init__(self, connection_limit=None):
+        """
+        :param connection_limit: max total number of broker connections of
+            all apps or None for no limit
+        """
+        self.connection_limit = connection_limit
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._apps = {}
+        self._connections = 0
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def get(self, app_config=None):
+        """ Get or create shared Celery app for configuration
+
+        :param app_config: alternative configuration parameters for Celery app.
+        :return: (celery application, dict {task_name: task_stub})
+
+        """
+        if self._pid != os.getpid():
+            # forked without register_at_fork support
+            self._reset()
+        key = repr(sorted((app_config or {}).items()))
+        entry = self._apps.get(key)
+        if entry is not None:
+            return entry
+        with self._lock:
+            entry = self._apps.get(key)
+            if entry is None:
+                entry = Client._create_app(app_config)
+                self._limit_connections(entry[0])
+                self._apps[key] = entry
+            return entry
+
+    def _limit_connections(self, app):
+        """ Take broker pool limit of new app from process-wide budget.
+        """
+        limit = self.connection_limit
+        if limit is None:
+            return
+        # disabled pooling opens connection per message, so without pool
+        # connections could not be counted
+        wanted = app.conf['broker_pool_limit'] or 1
+        available = limit - self._connections
+        if available < 1:
+            logger.warning("All %d broker connections are taken by %d shared "
+                           "apps, new app gets one connection over limit",
+                           limit, len(self._apps))
+            pool_limit = 1
+        else:
+            pool_limit = min(wanted, available)
+        app.conf.broker_pool_limit = pool_limit
+        self._connections += pool_limit
+
+    def clear(self):
+        with self._lock:
+            self._apps = {}
+            self._connections = 0
+
+    def __len__(self):
+        return len(self._apps)
+
+
+shared_apps = SharedApps(config.client_shared_connection_limit)
+
+
 class Pipe(object):
     """ Builder of pipeline of RPC requests.
     """
@@ -398,7 +1084,10 @@ class Pipe(object):
         signature = self.client.prepare_task(
             task_name, (self._pipeline,), None, high_priority=high_priority,
             **options)
-        return self.client.send_request(signature, nowait, timeout, retries)
+        models = [t['args'][0] for t in self._pipeline
+                  if t['name'] in MODEL_CHANGE_TASK_NAMES]
+        return self.client._send_changes(models, signature, nowait, timeout,
+                                         retries)
 
     @staticmethod
     def _prepare_task(task_name, args, kwargs, options=None):
@@ -410,6 +1099,19 @@ class Pipe(object):
                                   kwargs)
         return self._push(task)
 
+    def count(self, model, kwargs=None):
+        task = self._prepare_task(utils.COUNT_TASK_NAME, (model, ), kwargs)
+        return self._push(task)
+
+    def exists(self, model, kwargs=None):
+        task = self._prepare_task(utils.EXISTS_TASK_NAME, (model, ), kwargs)
+        return self._push(task)
+
+    def aggregate(self, model, aggregates, kwargs=None):
+        task = self._prepare_task(utils.AGGREGATE_TASK_NAME,
+                                  (model, aggregates), kwargs)
+        return self._push(task)
+
     def delete(self, model, data=None, kwargs=None):
         """ Delete models identified by `data` or by result of previous request.
 
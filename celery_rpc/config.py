@@ -10,6 +10,29 @@ except ImportError:
 # Default limit for results of filter call
 filter_limit = 1000
 
+# Filter results without custom serializer are serialized from rows fetched
+# with QuerySet.values() (model instances are not created). Models with file
+# fields or fields with from_db_value() are serialized from instances.
+values_serialization = True
+
+# Filter joins or prefetches related objects used by serializer
+plan_related = True
+
+# Filter loads only model fields used by serializer
+prune_columns = True
+
+# Database alias for read-only tasks (filter, count, exists, aggregate),
+# for example a read replica. By default it is chosen by Django database
+# routers (db_for_read). Changing tasks and read-only tasks piped with them
+# always use db_for_write. Explicit `database` of request overrides both.
+read_database = None
+
+# Default number of rows in one chunk of filter result delivered by chunks
+filter_chunk_size = 1000
+
+# Default max number of objects in one bulk query
+bulk_batch_size = 1000
+
 # Default timeout for getting results
 get_result_timeout = 10
 
@@ -23,6 +46,87 @@ wrap_remote_errors = False
 # Do it on your own risk!
 override_base_tasks = {}
 
+# Models, functions and serializers available to clients: dict {requested
+# name: full name of symbol}. Mapped symbols are imported at worker process
+# start.
+# Example: {'countries': 'app.models:Country',
+#           'app.functions:convert': 'app.functions:convert'}
+resource_map = {}
+
+# Reject requests of names missing in `resource_map` without import attempt
+strict_resources = False
+
+# Max number of cached symbols resolved by requested names
+symbol_cache_size = 1000
+
+# Warm-up of worker process before consuming requests: names of models,
+# custom serializers and functions to resolve and prepare, and aliases of
+# databases to connect (useless with CONN_MAX_AGE = 0, as connections are
+# closed before each task). Mapped resources are always imported.
+warmup_models = []
+warmup_serializers = []
+warmup_functions = []
+warmup_databases = []
+
+# Max number of generated serializer classes cached by server
+serializer_cache_size = 1000
+
+# Clients with equal configuration share one Celery app, broker connection
+# pool and task stubs. Total number of broker connections in process is
+# limited by `broker_pool_limit` times number of distinct client configs,
+# or by `client_shared_connection_limit` if it is set (in CELERY_RPC_CONFIG
+# setting, per-client configs do not change it): each shared app takes its
+# `broker_pool_limit` connections (one if pooling is disabled) from this
+# budget while it lasts, later apps get one connection each and a warning
+# is logged.
+client_shared_app = False
+client_shared_connection_limit = None
+
+# Failed requests are retried after exponential backoff delay starting from
+# `retry_backoff` and limited by `retry_backoff_max` seconds. Retries do not
+# exceed overall timeout of request.
+retry_backoff = 0.1
+retry_backoff_max = 1
+
+# Server skips requests with expired deadline (sent by client in headers as
+# absolute unix time). Requires synchronized clocks of clients and servers.
+check_deadline = True
+
+# Concurrent identical filter requests of one client share one request
+coalesce_requests = False
+
+# Single-object create, update and update_or_create requests are merged
+# into bulk requests of up to `batch_max_size` objects, which are sent not
+# later than `batch_window` seconds after first object is added.
+batch_writes = False
+batch_max_size = 100
+batch_window = 0.01
+
+# Max number of function calls sent in one message by Client.call_many
+call_many_chunk_size = 1000
+
+# Client-side cache for filter results: dict {model name: ttl in seconds}.
+# Cached results are invalidated by model changes sent by the same client.
+# Example: {'app.models:Country': 300}
+client_cache_models = {}
+
+# Max number of cached filter results per client
+client_cache_size = 1000
+
+# Server-side cache for filter results: dict {model label: ttl in seconds
+# or None}. Cached results are invalidated by post_save, post_delete and
+# m2m_changed signals and by changing rpc tasks. Results read from replica
+# (not db_for_write database) are cached only for models with ttl.
+# Example: {'app.Country': 300}
+server_cache_models = {}
+
+# Max number of cached filter results in worker process memory
+server_cache_size = 1000
+
+# Alias of Django cache backend for server-side cache shared by worker
+# processes, results are stored in process memory if None
+server_cache_backend = None
+
 # default celery rpc client name which will be passed as referer header
 rpc_client_name = "celery_rpc_client"
 
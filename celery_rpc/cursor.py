@@ -0,0 +1,144 @@
+# coding: utf-8
+""" Keyset (cursor) pagination of querysets.
+
+Page following a cursor is selected by "greater than" predicate on ordering
+values of the last row of previous page, so any page costs the same as the
+first one and concurrent inserts do not shift pages. NULLs of nullable
+ordering fields are placed after other values in both directions.
+"""
+from __future__ import absolute_import
+
+import base64
+import binascii
+import datetime
+import json
+
+import six
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F, Q
+
+from .exceptions import InvalidCursor
+
+
+def keyset_order(order_by, pk_name):
+    """ Return ordering made unique by adding primary key to its end.
+
+    :param order_by: ordering like for QuerySet.order_by() (list or string)
+    :param pk_name: name of primary key field of model
+    """
+    if not order_by:
+        order_by = []
+    elif isinstance(order_by, six.string_types):
+        order_by = [order_by]
+    order_by = list(order_by)
+    names = [f.lstrip('-') for f in order_by]
+    if 'pk' not in names and pk_name not in names:
+        order_by.append('pk')
+    return order_by
+
+
+def nullable_fields(model, order_by):
+    """ Return names of ordering fields which may be NULL.
+
+    Field is nullable if it is declared with null=True or if it is joined by
+    nullable or reverse relation. Names which could not be resolved to model
+    fields are considered nullable.
+    """
+    result = set()
+    for field in order_by:
+        name = field.lstrip('-')
+        opts = model._meta
+        for part in name.split('__'):
+            if part == 'pk':
+                model_field = opts.pk
+            else:
+                try:
+                    model_field = opts.get_field(part)
+                except FieldDoesNotExist:
+                    result.add(name)
+                    break
+            if (getattr(model_field, 'null', False) or
+                    not model_field.concrete):
+                result.add(name)
+                break
+            if not model_field.is_relation:
+                break
+            opts = model_field.related_model._meta
+    return result
+
+
+def keyset_ordering(order_by, nullable=()):
+    """ Return ordering expressions placing NULLs of nullable fields last,
+    as `keyset_q` expects.
+    """
+    result = []
+    for field in order_by:
+        name = field.lstrip('-')
+        if name not in nullable:
+            result.append(field)
+        elif field.startswith('-'):
+            result.append(F(name).desc(nulls_last=True))
+        else:
+            result.append(F(name).asc(nulls_last=True))
+    return result
+
+
+def keyset_q(order_by, values, nullable=()):
+    """ Build predicate selecting rows following row with ordering `values`.
+
+    For ordering (a, -b, pk) it is
+    a > x OR (a = x AND b < y) OR (a = x AND b = y AND pk > z).
+    NULLs of `nullable` fields follow all other values.
+    """
+    after = Q()
+    equal = Q()
+    for field, value in zip(order_by, values):
+        name = field.lstrip('-')
+        if value is None:
+            # nothing follows NULL
+            equal &= Q(**{name + '__isnull': True})
+            continue
+        lookup = '%s__%s' % (name, 'lt' if field.startswith('-') else 'gt')
+        following = Q(**{lookup: value})
+        if name in nullable:
+            following |= Q(**{name + '__isnull': True})
+        after |= equal & following
+        equal &= Q(**{name: value})
+    return after
+
+
+class CursorJSONEncoder(DjangoJSONEncoder):
+    """ Encodes datetime and time values with microseconds.
+
+    DjangoJSONEncoder truncates them to milliseconds, so last row of page
+    would follow its own cursor and would be returned again.
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super(CursorJSONEncoder, self).default(o)
+
+
+def encode_cursor(order_by, values):
+    """ Return opaque cursor pointing after row with ordering `values`.
+    """
+    data = json.dumps([order_by, list(values)], cls=CursorJSONEncoder,
+                      separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, order_by):
+    """ Return ordering values of row from cursor.
+
+    :raise InvalidCursor: cursor is malformed or made for other ordering
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor.encode('ascii'))
+        cursor_order, values = json.loads(data.decode('utf-8'))
+    except (AttributeError, TypeError, ValueError, binascii.Error):
+        raise InvalidCursor("Malformed cursor %r" % (cursor,))
+    if cursor_order != list(order_by) or len(values) != len(order_by):
+        raise InvalidCursor("Cursor does not match order_by %r" % (order_by,))
+    return values
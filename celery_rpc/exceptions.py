@@ -18,6 +18,21 @@ class RestFrameworkError(ModelTaskError):
     """
 
 
+class InvalidCursor(ModelTaskError):
+    """ Cursor of page is malformed or does not match request
+    """
+
+
+class ResourceNotFound(Exception):
+    """ Requested model or function is not available
+    """
+
+
+class DeadlineExceeded(Exception):
+    """ Request is not handled because client has stopped waiting for it
+    """
+
+
 class RemoteException(Exception):
     """ Wrapper for remote exceptions."""
 
@@ -0,0 +1,120 @@
+# coding: utf-8
+""" Planning of select_related/prefetch_related for serializers.
+"""
+from __future__ import absolute_import
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.serializers import (BaseSerializer, ListSerializer,
+                                        Serializer)
+
+
+def plan_related(serializer_class):
+    """ Find relations of model which are accessed by serializer.
+
+    Relations to one object are joined with select_related, relations to
+    many objects (and everything behind them) are prefetched.
+
+    :param serializer_class: DRF model serializer class
+    :return: (list of select_related paths, list of prefetch_related paths)
+    """
+    select, prefetch = set(), set()
+    _plan_serializer(serializer_class(), serializer_class.Meta.model, '',
+                     False, select, prefetch)
+    # paths covered by longer ones are redundant
+    select = [p for p in select
+              if not any(o.startswith(p + '__') for o in select)]
+    prefetch = [p for p in prefetch
+                if not any(o.startswith(p + '__') for o in prefetch)]
+    return sorted(select), sorted(prefetch)
+
+
+def plan_columns(serializer_class):
+    """ Find model fields which are accessed by serializer.
+
+    :param serializer_class: DRF model serializer class
+    :return: list of field names for QuerySet.only() or None if all fields
+        are needed or fields could not be determined (e.g. serializer uses
+        properties or methods of model, nests objects of reverse relation or
+        overrides `to_representation()`)
+    """
+    if overrides_representation(serializer_class):
+        # custom representation may read any attribute of instance
+        return None
+    model = serializer_class.Meta.model
+    opts = model._meta
+    names = set([opts.pk.name])
+    for field in serializer_class().fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*':
+            return None
+        model_field = _get_field(model, field.source_attrs[0])
+        if model_field is None:
+            return None
+        if model_field.concrete:
+            names.add(model_field.name)
+        elif isinstance(field, BaseSerializer):
+            # objects fetched by reverse relation refer to deferred instance
+            return None
+    if len(names) >= len(opts.concrete_fields):
+        return None
+    return sorted(names)
+
+
+def overrides_representation(serializer_class):
+    """ Check if serializer class has custom to_representation() method.
+    """
+    method = getattr(serializer_class.to_representation, '__func__',
+                     serializer_class.to_representation)
+    default = getattr(Serializer.to_representation, '__func__',
+                      Serializer.to_representation)
+    return method is not default
+
+
+def _plan_serializer(serializer, model, prefix, many, select, prefetch):
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*':
+            if isinstance(field, BaseSerializer):
+                _plan_serializer(field, model, prefix, many, select, prefetch)
+            continue
+        _plan_field(field, model, prefix, many, select, prefetch)
+
+
+def _plan_field(field, model, prefix, many, select, prefetch):
+    attrs = field.source_attrs
+    for i, attr in enumerate(attrs):
+        model_field = _get_field(model, attr)
+        if model_field is None or not model_field.is_relation:
+            return
+        last = i == len(attrs) - 1
+        if (last and type(field) is PrimaryKeyRelatedField and
+                model_field.concrete and not model_field.many_to_many):
+            # only value of foreign key column is needed
+            return
+        path = prefix + attr
+        many = many or model_field.one_to_many or model_field.many_to_many
+        (prefetch if many else select).add(path)
+        prefix = path + '__'
+        model = model_field.related_model
+
+    if isinstance(field, ListSerializer):
+        field = field.child
+    if isinstance(field, BaseSerializer):
+        _plan_serializer(field, model, prefix, many, select, prefetch)
+
+
+def _get_field(model, attr):
+    """ Find model field or reverse relation by attribute name.
+    """
+    opts = model._meta
+    try:
+        return opts.get_field(attr)
+    except FieldDoesNotExist:
+        pass
+    for rel in opts.related_objects:
+        if rel.get_accessor_name() == attr:
+            return rel
+    return None
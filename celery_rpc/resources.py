@@ -0,0 +1,78 @@
+# coding: utf-8
+""" Resolving of model, function and serializer names requested by clients.
+"""
+from __future__ import absolute_import
+
+import six
+
+from .cache import LRUCache
+from .exceptions import ResourceNotFound
+from .utils import symbol_by_name
+
+
+class ResourceMap(object):
+    """ Maps names requested by clients to models and functions.
+
+    Mapped names are imported once (see `load()`), other names are imported
+    on first request and cached. In strict mode only mapped names are
+    allowed and no import is attempted for unknown names.
+    """
+
+    def __init__(self, resources=None, strict=False, max_size=1000):
+        """
+        :param resources: dict {requested name: symbol or its full name}
+        :param strict: reject names missing in `resources`
+        :param max_size: max number of cached resolved names
+        """
+        self.resources = dict(resources or {})
+        self.strict = strict
+        self._symbols = {}
+        self._cache = LRUCache(max_size)
+
+    def load(self):
+        """ Import all mapped symbols.
+        """
+        for name in self.resources:
+            self._find(name)
+
+    def resolve(self, kind, name, check):
+        """ Return symbol of resource by name.
+
+        :param kind: kind of resource like 'model', resolved symbols are
+            cached per kind
+        :param name: requested name of resource
+        :param check: callable (symbol, name) which checks symbol and
+            returns resource or raises TypeError
+        :raise ResourceNotFound: unknown name in strict mode
+        """
+        key = (kind, name)
+        resource = self._cache.get(key)
+        if resource is None:
+            resource = check(self._find(name), name)
+            self._cache.set(key, resource)
+        return resource
+
+    def _find(self, name):
+        if name in self.resources:
+            try:
+                return self._symbols[name]
+            except KeyError:
+                pass
+            symbol = self.resources[name]
+            if isinstance(symbol, six.string_types):
+                symbol = symbol_by_name(symbol)
+            self._symbols[name] = symbol
+            return symbol
+        if self.strict:
+            raise ResourceNotFound("Unknown resource '{}'".format(name))
+        return symbol_by_name(name)
+
+    def clear(self):
+        """ Forget all imported and cached symbols.
+        """
+        self._symbols.clear()
+        self._cache.clear()
+
+    @property
+    def stats(self):
+        return self._cache.stats
@@ -0,0 +1,212 @@
+# coding: utf-8
+""" Server-side cache for results of filter requests.
+"""
+from __future__ import absolute_import
+
+import copy
+import hashlib
+import threading
+import time
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from .cache import LRUCache, normalize_filter_kwargs
+
+
+class ResultCache(object):
+    """ Read-through cache of serialized filter results shared by requests
+    from all clients.
+
+    Each model has a generation counter, which is a part of cache key.
+    Model changes (signals of Django models and changing rpc tasks) bump
+    generation, so all cached results for model become unreachable and are
+    evicted later by LRU policy or expire in backend.
+
+    Results are stored in process memory or in Django cache backend. With
+    in-process store only changes made in worker process invalidate cache,
+    so models changed by other processes must have short ttl. Generations
+    of Django cache backend are shared by all processes using it.
+    """
+
+    key_prefix = 'celery_rpc:result'
+
+    def __init__(self, models, max_size=1000, backend=None):
+        """
+        :param models: dict {model label like 'app.Model': ttl in seconds
+            or None} of cached models
+        :param max_size: max number of results cached in process memory
+        :param backend: alias of Django cache backend to store results, in
+            process memory if None
+        """
+        self.models = dict(models)
+        self.backend = backend
+        self._local = LRUCache(max_size)
+        self._generations = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        if self.backend is None:
+            return None
+        from django.core.cache import caches
+        return caches[self.backend]
+
+    def enabled_for(self, model):
+        return model._meta.label in self.models
+
+    def ttl(self, model):
+        """ Time to live of cached results for model (None is forever).
+        """
+        return self.models.get(model._meta.label)
+
+    def get_or_fetch(self, model, kwargs, fetch, namespace=''):
+        """ Return cached result of request or fetch and cache it.
+
+        :param model: model class
+        :param kwargs: filter request parameters
+        :param fetch: callable without arguments performing request
+        :param namespace: distinguishes results of different requests with
+            the same parameters, e.g. task name
+        :return: result of request
+        """
+        label = model._meta.label
+        generation = self._get_generation(label)
+        key = self._make_key(namespace, label, generation, kwargs)
+        missing = object()
+        value = self._get(key, missing)
+        self._count(label, 'hits' if value is not missing else 'misses')
+        if value is not missing:
+            return value
+        value = fetch()
+        # result is not cached if model was changed while fetching
+        if self._get_generation(label) == generation:
+            self._set(key, value, self.models[label])
+        return value
+
+    def invalidate(self, model, using=None):
+        """ Drop all cached results for model.
+
+        Inside transaction model is invalidated again after commit, so
+        results fetched by concurrent requests before commit are dropped.
+        """
+        label = model._meta.label
+        if label not in self.models:
+            return
+        self._bump_generation(label)
+        if transaction.get_connection(using).in_atomic_block:
+            transaction.on_commit(lambda: self._bump_generation(label),
+                                  using=using)
+
+    def connect(self):
+        """ Invalidate cached results on changes of models by Django
+        signals.
+
+        Receivers are connected for cached models only, because deletion of
+        objects with receivers can not be fast. Models are referred by
+        labels, so receivers are connected when models are loaded.
+        """
+        for label in self.models:
+            uid = 'celery_rpc_result_cache_' + label
+            post_save.connect(self._on_change, label, weak=False,
+                              dispatch_uid=uid)
+            post_delete.connect(self._on_change, label, weak=False,
+                                dispatch_uid=uid)
+        m2m_changed.connect(self._on_m2m_change, weak=False,
+                            dispatch_uid='celery_rpc_result_cache_m2m')
+
+    def disconnect(self):
+        for label in self.models:
+            uid = 'celery_rpc_result_cache_' + label
+            post_save.disconnect(sender=label, dispatch_uid=uid)
+            post_delete.disconnect(sender=label, dispatch_uid=uid)
+        m2m_changed.disconnect(dispatch_uid='celery_rpc_result_cache_m2m')
+
+    def _on_change(self, sender, using=None, **kwargs):
+        self.invalidate(sender, using)
+
+    def _on_m2m_change(self, sender, instance, action, model, using=None,
+                       **kwargs):
+        if not action.startswith('post_'):
+            return
+        for changed in (sender, type(instance), model):
+            self.invalidate(changed, using)
+
+    def clear(self):
+        """ Drop cached results of process memory and reset counters.
+        """
+        with self._lock:
+            self._counters.clear()
+        self._local.clear()
+
+    @property
+    def stats(self):
+        """ Hits and misses of cache in total and per model.
+        """
+        with self._lock:
+            models = dict((label, dict(counters))
+                          for label, counters in self._counters.items())
+        hits = sum(c.get('hits', 0) for c in models.values())
+        misses = sum(c.get('misses', 0) for c in models.values())
+        total = hits + misses
+        return {'hits': hits, 'misses': misses,
+                'hit_rate': float(hits) / total if total else 0.0,
+                'size': len(self._local), 'models': models}
+
+    def _count(self, label, counter):
+        with self._lock:
+            counters = self._counters.setdefault(label,
+                                                 {'hits': 0, 'misses': 0})
+            counters[counter] += 1
+
+    def _make_key(self, namespace, label, generation, kwargs):
+        digest = hashlib.sha1(
+            normalize_filter_kwargs(kwargs).encode('utf-8')).hexdigest()
+        return '%s:%s:%s:%s:%s' % (self.key_prefix, namespace, label,
+                                   generation, digest)
+
+    def _generation_key(self, label):
+        return '%s:%s:generation' % (self.key_prefix, label)
+
+    def _get_generation(self, label):
+        store = self.store
+        if store is None:
+            return self._generations.get(label, 0)
+        key = self._generation_key(label)
+        generation = store.get(key)
+        if generation is None:
+            # evicted counter must not return to values of cached results
+            store.add(key, self._new_generation(), None)
+            generation = store.get(key)
+        return generation
+
+    def _bump_generation(self, label):
+        store = self.store
+        if store is None:
+            with self._lock:
+                self._generations[label] = self._generations.get(label, 0) + 1
+            return
+        key = self._generation_key(label)
+        try:
+            store.incr(key)
+        except ValueError:
+            store.set(key, self._new_generation(), None)
+
+    @staticmethod
+    def _new_generation():
+        return int(time.time() * 1000000)
+
+    def _get(self, key, default):
+        store = self.store
+        if store is None:
+            value = self._local.get(key, default)
+            return value if value is default else copy.deepcopy(value)
+        return store.get(key, default)
+
+    def _set(self, key, value, ttl):
+        store = self.store
+        if store is None:
+            self._local.set(key, copy.deepcopy(value), ttl)
+        else:
+            store.set(key, value, ttl)
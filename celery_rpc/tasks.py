@@ -1,25 +1,26 @@
 from __future__ import absolute_import
 
-from django.db import router
-from django.db.models import Q
 import six
+from kombu.serialization import dumps
 
 from celery_rpc.utils import unproxy
 from . import config, utils
 from .app import rpc
 from .base import get_base_task_class, atomic_commit_on_success
-from .exceptions import RestFrameworkError
+from .exceptions import RestFrameworkError, RemoteException
 
 
 _base_model_task = get_base_task_class('ModelTask')
 
 
 @rpc.task(name=utils.FILTER_TASK_NAME, bind=True, base=_base_model_task,
-          shared=False)
+          shared=False, read_only=True)
 def filter(self, model, filters=None, offset=0,
            limit=config.filter_limit, fields=None, exclude=None,
            depth=0, manager='objects', database=None, serializer_cls=None,
-           order_by=None, filters_Q=None, exclude_Q=None, *args, **kwargs):
+           order_by=None, filters_Q=None, exclude_Q=None, select_related=None,
+           prefetch_related=None, cursor=None, chunk_size=None, *args,
+           **kwargs):
     """ Filter Django models and return serialized queryset.
 
     :param model: full name of model class like 'app.models:Model'
@@ -31,25 +32,117 @@ def filter(self, model, filters=None, offset=0,
     :param order_by: order of result list (list, tuple or string), default = []
     :param filters_Q: Django Q object for filter()
     :param exclude_Q: Django Q object for exclude()
-    :return: list of serialized model data
+    :param select_related: relations to join in addition to used by
+        serializer (list or string)
+    :param prefetch_related: relations to prefetch in addition to used by
+        serializer (list or string)
+    :param cursor: enables cursor pagination instead of offset, '' for the
+        first page or cursor returned with previous page
+    :param chunk_size: enables delivery of all filtered objects by chunks
+        of `chunk_size` rows stored in result backend, `offset` and `limit`
+        are ignored
+    :return: list of serialized model data or dict with list in 'results'
+        and cursor of next page in 'cursor' if cursor is not None or number
+        of chunks if chunk_size is set
 
     """
-    qs = self.default_queryset
-    if filters or filters_Q:
-        filters = filters if isinstance(filters, dict) else {}
-        filters_Q = filters_Q if isinstance(filters_Q, Q) else Q()
-        qs = qs.filter(filters_Q, **filters)
-    if exclude or exclude_Q:
-        exclude = exclude if isinstance(exclude, dict) else {}
-        exclude_Q = exclude_Q if isinstance(exclude_Q, Q) else Q()
-        qs = qs.exclude(exclude_Q, **exclude)
-    if order_by:
-        if isinstance(order_by, six.string_types):
-            qs = qs.order_by(order_by)
-        elif isinstance(order_by, (list, tuple)):
-            qs = qs.order_by(*order_by)
-    qs = qs[offset:offset+limit]
-    return self.serializer_class(instance=qs, many=True).data
+    def fetch():
+        qs = self.filter_queryset(self.default_queryset, filters, exclude,
+                                  filters_Q, exclude_Q)
+        if cursor is not None:
+            return self.paginate(qs, order_by, cursor, limit, select_related,
+                                 prefetch_related)
+        if order_by:
+            if isinstance(order_by, six.string_types):
+                qs = qs.order_by(order_by)
+            elif isinstance(order_by, (list, tuple)):
+                qs = qs.order_by(*order_by)
+        qs = qs[offset:offset+limit]
+        return self.serialize_queryset(qs, select_related, prefetch_related)
+
+    if chunk_size:
+        qs = self.filter_queryset(self.default_queryset, filters, exclude,
+                                  filters_Q, exclude_Q)
+        return self.store_chunks(qs, order_by, chunk_size, select_related,
+                                 prefetch_related)
+    return self.cached(fetch)
+
+
+@rpc.task(name=utils.COUNT_TASK_NAME, bind=True, base=_base_model_task,
+          shared=False, read_only=True)
+def count(self, model, filters=None, exclude=None, manager='objects',
+          database=None, filters_Q=None, exclude_Q=None, *args, **kwargs):
+    """ Count Django models matching lookups.
+
+    :param model: full name of model class like 'app.models:Model'
+    :param filters: supported lookups for filter like {'pk__in': [1,2,3]}
+    :param exclude: supported lookups for exclude like {'pk__in': [1,2,3]}
+    :param filters_Q: Django Q object for filter()
+    :param exclude_Q: Django Q object for exclude()
+    :return: number of matched objects
+
+    """
+    qs = self.filter_queryset(self.default_queryset, filters, exclude,
+                              filters_Q, exclude_Q)
+    return qs.count()
+
+
+@rpc.task(name=utils.EXISTS_TASK_NAME, bind=True, base=_base_model_task,
+          shared=False, read_only=True)
+def exists(self, model, filters=None, exclude=None, manager='objects',
+           database=None, filters_Q=None, exclude_Q=None, *args, **kwargs):
+    """ Check if any Django model matches lookups.
+
+    :param model: full name of model class like 'app.models:Model'
+    :param filters: supported lookups for filter like {'pk__in': [1,2,3]}
+    :param exclude: supported lookups for exclude like {'pk__in': [1,2,3]}
+    :param filters_Q: Django Q object for filter()
+    :param exclude_Q: Django Q object for exclude()
+    :return: True if at least one object matches
+
+    """
+    qs = self.filter_queryset(self.default_queryset, filters, exclude,
+                              filters_Q, exclude_Q)
+    return qs.exists()
+
+
+@rpc.task(name=utils.AGGREGATE_TASK_NAME, bind=True, base=_base_model_task,
+          shared=False, read_only=True)
+def aggregate(self, model, aggregates, filters=None, exclude=None,
+              group_by=None, order_by=None, offset=0,
+              limit=config.filter_limit, manager='objects', database=None,
+              filters_Q=None, exclude_Q=None, *args, **kwargs):
+    """ Aggregate values of Django models matching lookups.
+
+    :param model: full name of model class like 'app.models:Model'
+    :param aggregates: dict {name: [function, field]} or
+        {name: [function, field, {'distinct': True}]}, functions are
+        Sum, Avg, Min, Max and Count
+    :param filters: supported lookups for filter like {'pk__in': [1,2,3]}
+    :param exclude: supported lookups for exclude like {'pk__in': [1,2,3]}
+    :param group_by: fields to group objects by (list or string)
+    :param order_by: order of groups (list, tuple or string),
+        by default `group_by`
+    :param offset: offset of first group (by default 0)
+    :param limit: max number of groups (by default 1000)
+    :param filters_Q: Django Q object for filter()
+    :param exclude_Q: Django Q object for exclude()
+    :return: dict {name: value} or list of dicts with values of `group_by`
+        fields and aggregates for each group if `group_by` is set
+
+    """
+    expressions = self.build_aggregates(aggregates)
+    qs = self.filter_queryset(self.default_queryset, filters, exclude,
+                              filters_Q, exclude_Q)
+    if not group_by:
+        return qs.aggregate(**expressions)
+    if isinstance(group_by, six.string_types):
+        group_by = [group_by]
+    if isinstance(order_by, six.string_types):
+        order_by = [order_by]
+    qs = qs.values(*group_by).annotate(**expressions)
+    qs = qs.order_by(*(order_by or group_by))
+    return list(qs[offset:offset+limit])
 
 
 _base_model_change_task = get_base_task_class('ModelChangeTask')
@@ -58,18 +151,22 @@ _base_model_change_task = get_base_task_class('ModelChangeTask')
 @rpc.task(name=utils.UPDATE_TASK_NAME, bind=True, base=_base_model_change_task,
           shared=False)
 def update(self, model, data, fields=None, nocache=False,
-           manager='objects', database=None, serializer_cls=None, *args, **kwargs):
+           manager='objects', database=None, serializer_cls=None, bulk=False,
+           batch_size=None, *args, **kwargs):
     """ Update Django models by PK and return new values.
 
     :param model: full name of model class like 'app.models:ModelClass'
     :param data: values of one or several objects
         {'id': 1, 'title': 'hello'} or [{'id': 1, 'title': 'hello'}]
+    :param bulk: update several objects with bulk UPDATE queries
+    :param batch_size: max number of objects in one UPDATE query
     :return: serialized model data or list of one or errors
 
     """
     instance, many = self.get_instance(data)
     return self.perform_changes(instance=instance, data=data, many=many,
-                                allow_add_remove=False, force_update=True)
+                                allow_add_remove=False, force_update=True,
+                                bulk=bulk, batch_size=batch_size)
 
 
 @rpc.task(name=utils.GETSET_TASK_NAME, bind=True, base=_base_model_change_task,
@@ -85,9 +182,9 @@ def getset(self, model, data, fields=None, nocache=False,
 
     """
     from celery_rpc.base import DRF3
-    db_for_write = router.db_for_write(self.model)
+    db_for_write = self.db_alias
     with atomic_commit_on_success(using=db_for_write):
-        instance, many = self.get_instance(data, using=db_for_write)
+        instance, many = self.get_instance(data)
         if DRF3:
             kwargs = {}
         else:
@@ -121,15 +218,23 @@ def getset(self, model, data, fields=None, nocache=False,
 @rpc.task(name=utils.UPDATE_OR_CREATE_TASK_NAME, bind=True,
           base=_base_model_change_task, shared=False)
 def update_or_create(self, model, data, fields=None, nocache=False,
-                     manager='objects', database=None, serializer_cls=None, *args, **kwargs):
+                     manager='objects', database=None, serializer_cls=None,
+                     bulk=False, batch_size=None, *args, **kwargs):
     """ Update Django models by PK or create new and return new values.
 
     :param model: full name of model class like 'app.models:ModelClass'
     :param data: values of one or several objects
         {'id': 1, 'title': 'hello'} or [{'id': 1, 'title': 'hello'}]
+    :param bulk: update existing and create missing objects with bulk
+        queries (upsert)
+    :param batch_size: max number of objects in one query
     :return: serialized model data or list of one or errors
 
     """
+    if bulk and not isinstance(data, dict):
+        return self.perform_changes(instance=None, data=data, many=True,
+                                    allow_add_remove=True, bulk=True,
+                                    batch_size=batch_size)
     try:
         instance, many = self.get_instance(data)
     except self.model.DoesNotExist:
@@ -141,33 +246,43 @@ def update_or_create(self, model, data, fields=None, nocache=False,
 @rpc.task(name=utils.CREATE_TASK_NAME, bind=True, base=_base_model_change_task,
           shared=False)
 def create(self, model, data, fields=None, nocache=False,
-           manager='objects', database=None, serializer_cls=None, *args, **kwargs):
+           manager='objects', database=None, serializer_cls=None, bulk=False,
+           batch_size=None, *args, **kwargs):
     """ Update Django models by PK or create new and return new values.
 
     :param model: full name of model class like 'app.models:ModelClass'
     :param data: values of one or several objects
         {'id': 1, 'title': 'hello'} or [{'id': 1, 'title': 'hello'}]
+    :param bulk: insert several objects with bulk INSERT queries
+    :param batch_size: max number of objects in one INSERT query
     :return: serialized model data or list of one or errors
 
     """
     instance, many = (None, False if isinstance(data, dict) else True)
     return self.perform_changes(instance=instance, data=data, many=many,
                                 allow_add_remove=many, force_insert=True,
-                                partial=False)
+                                partial=False, bulk=bulk,
+                                batch_size=batch_size)
 
 
 @rpc.task(name=utils.DELETE_TASK_NAME, bind=True, base=_base_model_change_task,
           shared=False)
 def delete(self, model, data, fields=None, nocache=False,
-           manager='objects', database=None, serializer_cls=None, *args, **kwargs):
+           manager='objects', database=None, serializer_cls=None, bulk=False,
+           raw=False, batch_size=None, *args, **kwargs):
     """ Delete Django models by PK.
 
     :param model: full name of model class like 'app.models:ModelClass'
     :param data: values of one or several objects
         {'id': 1, 'title': 'hello'} or [{'id': 1, 'title': 'hello'}]
-    :return: None or [] if many
+    :param bulk: delete several objects with set-based queries
+    :param raw: skip delete signals in bulk mode if model allows it
+    :param batch_size: max number of objects deleted by one query
+    :return: None or [] if many, number of deleted rows in bulk mode
 
     """
+    if bulk and not isinstance(data, dict):
+        return self.bulk_delete(data, raw=raw, batch_size=batch_size)
     instance, many = self.get_instance(data)
     if not many:
         try:
@@ -193,6 +308,35 @@ def call(self, function, args, kwargs):
         {'id': 1, 'title': 'hello'} or [{'id': 1, 'title': 'hello'}]
     :return: result of function
 
+    """
+    args, kwargs = _check_call_params(args, kwargs)
+    return self.function(*args, **kwargs)
+
+
+@rpc.task(name=utils.CALL_MANY_TASK_NAME, bind=True, base=_base_function_task,
+          shared=False)
+def call_many(self, function, calls):
+    """ Call function several times with different args & kwargs
+
+    :param function: full function name like 'package.module:function'
+    :param calls: list of [args, kwargs] pairs for each call
+    :return: list of [True, result] for successful calls and
+        [False, packed error] for failed ones
+
+    """
+    serializer = self.app.conf['result_serializer']
+    results = []
+    for args, kwargs in calls:
+        try:
+            args, kwargs = _check_call_params(args, kwargs)
+            results.append([True, self.function(*args, **kwargs)])
+        except Exception as e:
+            results.append([False, _pack_error(e, serializer)])
+    return results
+
+
+def _check_call_params(args, kwargs):
+    """ Validate positional and named parameters of function call.
     """
     args = args or []
     kwargs = kwargs or {}
@@ -202,9 +346,21 @@ def call(self, function, args, kwargs):
         raise TypeError(message)
     if not isinstance(kwargs, dict):
         message = "Invalid type of 'kwargs', need: 'dict', got: '{}'".format(
-            type(args))
+            type(kwargs))
         raise TypeError(message)
-    return self.function(*args, **kwargs)
+    return args, kwargs
+
+
+def _pack_error(error, serializer):
+    """ Serialize exception for passing it to client inside of result.
+    """
+    try:
+        return RemoteException(error, serializer).args[0]
+    except Exception:
+        # exception args are not serializable
+        cls = error.__class__
+        args = (cls.__module__, cls.__name__, (repr(error),))
+        return dumps(args, serializer=serializer)[2]
 
 
 _base_pipe_task = get_base_task_class('PipeTask')
@@ -221,6 +377,10 @@ def pipe(self, pipeline):
     r = None
     headers = self.headers
     headers["piped"] = True
+    # reads must see changes made by previous tasks of pipeline
+    headers["piped_changes"] = not all(
+        getattr(self.app.tasks[t['name']], 'read_only', False)
+        for t in pipeline)
     with atomic_commit_on_success():
         for t in pipeline:
             task = self.app.tasks[t['name']]
@@ -239,7 +399,8 @@ def pipe(self, pipeline):
     return result
 
 
-@rpc.task(name=utils.TRANSLATE_TASK_NAME, bind=True, shared=False)
+@rpc.task(name=utils.TRANSLATE_TASK_NAME, bind=True, shared=False,
+          read_only=True)
 def translate(self, map, data, defaults=None):
     """ Translate keys by map.
 
@@ -265,7 +426,8 @@ def translate(self, map, data, defaults=None):
         return _translate_keys_and_set_defaults(data)
 
 
-@rpc.task(name=utils.RESULT_TASK_NAME, bind=True, shared=False)
+@rpc.task(name=utils.RESULT_TASK_NAME, bind=True, shared=False,
+          read_only=True)
 def result(self, index, data):
     """ Return result from pipe results lists by index.
     Need to explicitly specify which value to transmit a subsequent task.
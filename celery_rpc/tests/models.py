@@ -12,12 +12,20 @@ class NonAutoPrimaryKeyModel(models.Model):
     id = models.IntegerField(primary_key=True)
 
 
+class PositiveF1Manager(models.Manager):
+    def get_queryset(self):
+        return super(PositiveF1Manager, self).get_queryset().filter(f1__gt=0)
+
+
 class PartialUpdateModel(models.Model):
     """ For partial update checks
     """
     f1 = models.IntegerField()
     f2 = models.IntegerField()
 
+    objects = models.Manager()
+    positive = PositiveF1Manager()
+
 
 class FkSimpleModel(models.Model):
     fk = models.ForeignKey(SimpleModel, on_delete=models.CASCADE)
@@ -28,3 +36,28 @@ class ManyToManyModel(models.Model):
     """ For m2m add/delete tests
     """
     m2m = models.ManyToManyField(SimpleModel)
+
+
+class CustomSaveModel(models.Model):
+    """ For checks of bulk operations fallback to Model.save()
+    """
+    char = models.CharField(max_length=64)
+
+    def save(self, *args, **kwargs):
+        self.char = self.char.upper()
+        super(CustomSaveModel, self).save(*args, **kwargs)
+
+
+class UpperCharField(models.CharField):
+    """ Converts values loaded from database
+    """
+
+    def from_db_value(self, value, expression, connection, *args):
+        return value if value is None else value.upper()
+
+
+class FileModel(models.Model):
+    """ For checks of fields which values are converted by model
+    """
+    file = models.FileField(upload_to='files', blank=True)
+    upper = UpperCharField(max_length=64, blank=True)
@@ -0,0 +1,225 @@
+from __future__ import absolute_import
+
+import os
+import threading
+from unittest import skipIf
+
+import mock
+import six
+from django.test import TransactionTestCase
+
+from .utils import SimpleModelTestMixin
+
+if six.PY3:
+    import asyncio
+    from ..aio import AsyncClient
+
+
+def allow_eager_orm_in_loop(test_case):
+    """ Eager tasks are executed inside event loop, so Django must permit
+    synchronous ORM calls from async context in tests.
+    """
+    patcher = mock.patch.dict(os.environ, DJANGO_ALLOW_ASYNC_UNSAFE='true')
+    patcher.start()
+    test_case.addCleanup(patcher.stop)
+
+
+@skipIf(six.PY2, "asyncio is not supported")
+class AsyncClientTests(SimpleModelTestMixin, TransactionTestCase):
+    """ asyncio client tests
+    """
+
+    def setUp(self):
+        super(AsyncClientTests, self).setUp()
+        allow_eager_orm_in_loop(self)
+        self.client = AsyncClient()
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        # let pollers notice cancelled waiters and finish
+        # asyncio.all_tasks() appeared in Python 3.7
+        all_tasks = getattr(asyncio, 'all_tasks', None) or \
+            asyncio.Task.all_tasks
+        pending = [t for t in all_tasks(self.loop) if not t.done()]
+        if pending:
+            self.loop.run_until_complete(asyncio.wait(pending, timeout=1))
+        self.loop.close()
+        super(AsyncClientTests, self).tearDown()
+
+    def run_loop(self, awaitable):
+        return self.loop.run_until_complete(awaitable)
+
+    def testFilter(self):
+        """ Filter is awaitable and returns serialized models
+        """
+        r = self.run_loop(self.client.filter(
+            self.MODEL_SYMBOL,
+            kwargs=dict(filters={'pk': self.models[0].pk})))
+        self.assertEqual([self.get_model_dict(self.models[0])], r)
+
+    def testCount(self):
+        """ Count is awaitable
+        """
+        r = self.run_loop(self.client.count(self.MODEL_SYMBOL))
+        self.assertEqual(len(self.models), r)
+
+    def testCreate(self):
+        """ Create is awaitable
+        """
+        r = self.run_loop(self.client.create(self.MODEL_SYMBOL,
+                                             {'char': 'async'}))
+        self.assertEqual('async', self.MODEL.objects.get(pk=r['id']).char)
+
+    def testCall(self):
+        """ Call is awaitable
+        """
+        r = self.run_loop(self.client.call(
+            'celery_rpc.tests.test_tasks:plus', [2, 3]))
+        self.assertEqual(5, r)
+
+    def testIterFilter(self):
+        """ Objects are iterated asynchronously page by page
+        """
+        iterator = self.client.iter_filter(self.MODEL_SYMBOL, page_size=2)
+        r = []
+        while True:
+            try:
+                r.append(self.run_loop(iterator.__anext__()))
+            except StopAsyncIteration:
+                break
+        self.assertEqual(sorted(m.pk for m in self.models),
+                         [o['id'] for o in r])
+
+    def testStreamFilter(self):
+        """ Objects delivered by chunks are iterated asynchronously
+        """
+        iterator = self.client.stream_filter(self.MODEL_SYMBOL, chunk_size=2)
+        r = []
+        while True:
+            try:
+                r.append(self.run_loop(iterator.__anext__()))
+            except StopAsyncIteration:
+                break
+        self.assertEqual(sorted(m.pk for m in self.models),
+                         [o['id'] for o in r])
+
+    def testStreamFilterClosed(self):
+        """ Remaining chunks are dropped by closing of iterator
+        """
+        iterator = self.client.stream_filter(self.MODEL_SYMBOL, chunk_size=2)
+        with mock.patch.object(self.client, '_drop_chunks',
+                               wraps=self.client._drop_chunks) as drop:
+            self.run_loop(iterator.__anext__())
+            self.run_loop(iterator.aclose())
+            with self.assertRaises(StopAsyncIteration):
+                self.run_loop(iterator.__anext__())
+        self.assertEqual(1, drop.call_count)
+        self.assertEqual(1, drop.call_args[0][1])
+
+    def testStreamFilterPolling(self):
+        """ Chunks are polled outside of event loop thread
+        """
+        threads = []
+        poll = self.client._poll_chunk
+
+        def record(*args):
+            threads.append(threading.current_thread())
+            return poll(*args)
+
+        iterator = self.client.stream_filter(self.MODEL_SYMBOL, chunk_size=5)
+        with mock.patch.object(self.client, '_poll_chunk', side_effect=record):
+            self.run_loop(iterator.__anext__())
+        self.assertEqual(1, len(threads))
+        self.assertIsNot(threading.current_thread(), threads[0])
+
+    def testNowait(self):
+        """ Awaiting with nowait returns AsyncResult, which is awaitable with
+        get_result
+        """
+        async_result = self.run_loop(self.client.filter(self.MODEL_SYMBOL,
+                                                        nowait=True))
+        r = self.run_loop(self.client.get_result(async_result))
+        self.assertEqual(len(self.models), len(r))
+
+    def testGather(self):
+        """ Several nowait results are awaited together
+        """
+        async_results = [
+            self.run_loop(self.client.filter(
+                self.MODEL_SYMBOL, nowait=True,
+                kwargs=dict(filters={'pk': m.pk})))
+            for m in self.models]
+        r = self.run_loop(self.client.gather(async_results))
+        self.assertEqual([[self.get_model_dict(m)] for m in self.models], r)
+
+    def testWaitsForReadiness(self):
+        """ Result is polled until ready
+        """
+        async_result = mock.Mock()
+        async_result.ready.side_effect = [False, False, True]
+        async_result.get.return_value = 'result'
+        r = self.run_loop(self.client.get_result(async_result))
+        self.assertEqual('result', r)
+        self.assertEqual(3, async_result.ready.call_count)
+
+    def testSharedPolling(self):
+        """ Results awaited together are polled by one check per tick
+        """
+        results = [mock.Mock(), mock.Mock()]
+        for r, readiness in zip(results, ([False, True], [False, False,
+                                                          True])):
+            r.ready.side_effect = readiness
+            r.get.return_value = r
+        with mock.patch.object(self.client, '_ready_results',
+                               wraps=self.client._ready_results) as check:
+            r = self.run_loop(self.client.gather(results))
+        self.assertEqual(results, r)
+        self.assertEqual(3, check.call_count)
+
+    def testPublishInExecutor(self):
+        """ Messages are published outside of event loop thread
+        """
+        threads = []
+        apply = self.client._apply
+
+        def record(*args):
+            threads.append(threading.current_thread())
+            return apply(*args)
+
+        with mock.patch.object(self.client, '_apply', side_effect=record):
+            self.run_loop(self.client.count(self.MODEL_SYMBOL))
+        self.assertEqual(1, len(threads))
+        self.assertIsNot(threading.current_thread(), threads[0])
+
+    def testTimeout(self):
+        """ Timeout error raised if result is not ready in time
+        """
+        async_result = mock.Mock()
+        async_result.ready.return_value = False
+        with self.assertRaises(AsyncClient.TimeoutError):
+            self.run_loop(self.client.get_result(async_result, timeout=0.02))
+        self.assertFalse(async_result.get.called)
+
+    def testRemoteError(self):
+        """ Remote errors are unpacked like in sync client
+        """
+        with self.assertRaisesRegexp(ImportError, "No module named"):
+            self.run_loop(self.client.filter('not.existing.Model'))
+
+
+@skipIf(six.PY2, "asyncio is not supported")
+class AsyncPipeTests(SimpleModelTestMixin, TransactionTestCase):
+    """ Pipeline with asyncio client
+    """
+
+    def testPipeRun(self):
+        """ Pipe.run is awaitable for AsyncClient
+        """
+        allow_eager_orm_in_loop(self)
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        p = AsyncClient().pipe()
+        p = p.update(self.MODEL_SYMBOL,
+                     {'pk': self.models[0].pk, 'char': 'hello'})
+        r = loop.run_until_complete(p.run())
+        self.assertEqual('hello', r[0]['char'])
@@ -0,0 +1,295 @@
+from __future__ import absolute_import
+
+import threading
+import time
+
+import mock
+from django.db.models import Q
+from django.test import TestCase
+
+from .. import utils
+from ..cache import LRUCache, SingleFlight, normalize_filter_kwargs
+from ..client import Client
+from .utils import SimpleModelTestMixin
+
+
+class LRUCacheTests(TestCase):
+    """ Bounded LRU cache tests
+    """
+
+    def testGetSet(self):
+        cache = LRUCache()
+        cache.set('a', 1)
+        self.assertEqual(1, cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual({'hits': 1, 'misses': 1, 'size': 1}, cache.stats)
+
+    def testEviction(self):
+        """ Least recently used items are evicted
+        """
+        cache = LRUCache(max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(1, cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(2, len(cache))
+
+    def testExpiration(self):
+        cache = LRUCache()
+        with mock.patch('time.time', return_value=1000):
+            cache.set('a', 1, ttl=10)
+        with mock.patch('time.time', return_value=1005):
+            self.assertEqual(1, cache.get('a'))
+        with mock.patch('time.time', return_value=1011):
+            self.assertIsNone(cache.get('a'))
+
+    def testNormalizeFilterKwargs(self):
+        """ Equal requests have equal keys
+        """
+        self.assertEqual(
+            normalize_filter_kwargs({'order_by': 'a', 'limit': 1,
+                                     'filters_Q': Q(a=1)}),
+            normalize_filter_kwargs({'limit': 1, 'order_by': ['a'],
+                                     'filters_Q': Q(a=1)}))
+        self.assertNotEqual(
+            normalize_filter_kwargs({'filters_Q': Q(a=1)}),
+            normalize_filter_kwargs({'filters_Q': Q(a=2)}))
+        self.assertEqual(normalize_filter_kwargs(None),
+                         normalize_filter_kwargs({}))
+
+
+class FilterCacheTests(SimpleModelTestMixin, TestCase):
+    """ Client-side cache for filter requests
+    """
+
+    def setUp(self):
+        super(FilterCacheTests, self).setUp()
+        self.client = Client({'client_cache_models': {self.MODEL_SYMBOL: 60}})
+        self.kwargs = {'filters': {'pk': self.models[0].pk}}
+
+    def filter(self, model=None, **kwargs):
+        with mock.patch.object(self.client, 'send_request',
+                               wraps=self.client.send_request) as send:
+            r = self.client.filter(model or self.MODEL_SYMBOL,
+                                   kwargs=self.kwargs, **kwargs)
+        return r, send.call_count
+
+    def testDisabledByDefault(self):
+        self.assertIsNone(Client().filter_cache)
+
+    def testCached(self):
+        """ Repeated request is served from cache
+        """
+        r1, sent = self.filter()
+        self.assertEqual(1, sent)
+        r2, sent = self.filter()
+        self.assertEqual(0, sent)
+        self.assertEqual(r1, r2)
+        self.assertEqual(1, self.client.filter_cache.stats['hits'])
+        self.assertEqual(1, self.client.filter_cache.stats['misses'])
+
+    def testResultCopied(self):
+        """ Changing of returned result does not affect cache
+        """
+        r, _ = self.filter()
+        r[0]['char'] = 'changed'
+        r, _ = self.filter()
+        self.assertEqual(self.models[0].char, r[0]['char'])
+
+    def testNotCachedModel(self):
+        self.filter('celery_rpc.tests.models:FkSimpleModel')
+        _, sent = self.filter('celery_rpc.tests.models:FkSimpleModel')
+        self.assertEqual(1, sent)
+
+    def testNowaitNotCached(self):
+        self.filter()
+        r, sent = self.filter(nowait=True)
+        self.assertEqual(1, sent)
+
+    def testInvalidation(self):
+        """ Change of model by client invalidates cached results
+        """
+        self.filter()
+        self.client.update(self.MODEL_SYMBOL,
+                           {'pk': self.models[0].pk, 'char': 'new'})
+        r, sent = self.filter()
+        self.assertEqual(1, sent)
+        self.assertEqual('new', r[0]['char'])
+
+    def testPipeInvalidation(self):
+        """ Change of model in pipeline invalidates cached results
+        """
+        self.filter()
+        p = self.client.pipe().delete(self.MODEL_SYMBOL,
+                                      {'pk': self.models[0].pk})
+        p.run()
+        r, sent = self.filter()
+        self.assertEqual(1, sent)
+        self.assertEqual([], r)
+
+    def testFilterWhileChanging(self):
+        """ Results fetched while change is applied are dropped when change
+        returns
+        """
+        send_request = self.client.send_request
+
+        def send_change(signature, *args, **kwargs):
+            if signature.task == utils.UPDATE_TASK_NAME:
+                # concurrent filter is served before change is applied
+                self.client.filter(self.MODEL_SYMBOL, kwargs=self.kwargs)
+            return send_request(signature, *args, **kwargs)
+
+        with mock.patch.object(self.client, 'send_request',
+                               side_effect=send_change):
+            self.client.update(self.MODEL_SYMBOL,
+                               {'pk': self.models[0].pk, 'char': 'new'})
+        r, sent = self.filter()
+        self.assertEqual(1, sent)
+        self.assertEqual('new', r[0]['char'])
+
+    def testInvalidationWhileFetching(self):
+        """ Result is not cached if model is changed while fetching
+        """
+        cache = self.client.filter_cache
+
+        def fetch():
+            cache.invalidate(self.MODEL_SYMBOL)
+            return []
+
+        cache.get_or_fetch(self.MODEL_SYMBOL, self.kwargs, fetch)
+        self.assertEqual(0, cache.stats['size'])
+
+
+class SingleFlightTests(TestCase):
+    """ Coalescing of concurrent identical requests
+    """
+
+    def setUp(self):
+        super(SingleFlightTests, self).setUp()
+        # number of threads waiting for request in flight
+        self.waiting = 0
+        self.joined = threading.Condition()
+        test = self
+
+        class WaitCountingEvent(object):
+            def __init__(self):
+                self._event = threading.Event()
+
+            def set(self):
+                self._event.set()
+
+            def wait(self, timeout=None):
+                with test.joined:
+                    test.waiting += 1
+                    test.joined.notify_all()
+                return self._event.wait(timeout)
+
+        class Call(SingleFlight._Call):
+            def __init__(self):
+                super(Call, self).__init__()
+                self.done = WaitCountingEvent()
+
+        patcher = mock.patch.object(SingleFlight, '_Call', Call)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_concurrently(self, func, count=5):
+        results = [None] * count
+
+        def run(i):
+            try:
+                results[i] = func()
+            except Exception as e:
+                results[i] = e
+
+        threads = [threading.Thread(target=run, args=(i,))
+                   for i in range(count)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+    def slow_fetch(self, result=None, error=None, followers=4):
+        """ Fetch finishing only after `followers` threads have joined
+        request in flight
+        """
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            deadline = time.time() + 10
+            with self.joined:
+                while (self.waiting < followers and
+                       time.time() < deadline):
+                    self.joined.wait(deadline - time.time())
+                self.waiting = 0
+            if error:
+                raise error
+            return result
+
+        return fetch, calls
+
+    def testCoalesce(self):
+        """ Concurrent identical requests are performed once
+        """
+        single_flight = SingleFlight()
+        fetch, calls = self.slow_fetch(result=[{'a': 1}])
+        results = self.run_concurrently(
+            lambda: single_flight.do('key', fetch))
+        self.assertEqual(1, len(calls))
+        self.assertEqual([[{'a': 1}]] * 5, results)
+
+    def testError(self):
+        """ Error is raised for each waiting request
+        """
+        single_flight = SingleFlight()
+        error = ValueError('failed')
+        fetch, calls = self.slow_fetch(error=error)
+        results = self.run_concurrently(
+            lambda: single_flight.do('key', fetch))
+        self.assertEqual(1, len(calls))
+        self.assertEqual([error] * 5, results)
+
+    def testSequential(self):
+        """ Finished request is not shared
+        """
+        single_flight = SingleFlight()
+        fetch, calls = self.slow_fetch(followers=0)
+        single_flight.do('key', fetch)
+        single_flight.do('key', fetch)
+        self.assertEqual(2, len(calls))
+
+    def testClientFilter(self):
+        """ Client coalesces concurrent identical filter requests
+        """
+        client = Client({'coalesce_requests': True})
+        fetch, calls = self.slow_fetch(result=[])
+        with mock.patch.object(client, 'send_request',
+                               side_effect=lambda *a: fetch()):
+            self.run_concurrently(
+                lambda: client.filter('app.models:Model',
+                                      kwargs={'filters': {'a': 1}}))
+        self.assertEqual(1, len(calls))
+        fetch, calls = self.slow_fetch(result=[], followers=0)
+        with mock.patch.object(client, 'send_request',
+                               side_effect=lambda *a: fetch()):
+            self.run_concurrently(
+                lambda: client.filter('app.models:Model',
+                                      kwargs={'filters': {'a': 1}},
+                                      coalesce=False))
+        self.assertEqual(5, len(calls))
+
+    def testClientCall(self):
+        """ Client coalesces concurrent identical calls if requested
+        """
+        client = Client()
+        fetch, calls = self.slow_fetch(result=1)
+        with mock.patch.object(client, 'send_request',
+                               side_effect=lambda *a: fetch()):
+            self.run_concurrently(
+                lambda: client.call('app.functions:func', [1],
+                                    coalesce=True))
+        self.assertEqual(1, len(calls))
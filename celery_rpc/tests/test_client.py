@@ -2,15 +2,22 @@ from __future__ import absolute_import
 
 import random
 import socket
+import threading
+import time
 from datetime import datetime
+from uuid import uuid4
 import mock
 
+from celery import states
+from celery.result import AsyncResult
 from django.test import TestCase
+from kombu.serialization import dumps
 from rest_framework import serializers
 
 from celery_rpc.base import DRF3
+from celery_rpc.exceptions import RestFrameworkError
 from .. import config, utils
-from ..client import Client
+from ..client import Client, SharedApps, shared_apps
 from .utils import SimpleModelTestMixin
 
 
@@ -60,6 +67,22 @@ class HighPriorityRequestTests(TestCase):
         """
         self._assertProxyMethodSupportHighPriority('filter')
 
+    def testHighPriorityCount(self):
+        """ Method `count` support high priority requests
+        """
+        self._assertProxyMethodSupportHighPriority('count')
+
+    def testHighPriorityExists(self):
+        """ Method `exists` support high priority requests
+        """
+        self._assertProxyMethodSupportHighPriority('exists')
+
+    def testHighPriorityAggregate(self):
+        """ Method `aggregate` support high priority requests
+        """
+        self._assertProxyMethodSupportHighPriority('aggregate',
+                                                   {'n': ['Count', 'pk']})
+
     def testHighPriorityUpdate(self):
         """ Method `update` support high priority requests
         """
@@ -149,6 +172,47 @@ class SetRefererTests(SimpleModelTestMixin, TestCase):
             {"referer": "@".join([config.rpc_client_name, socket.gethostname()])})
 
 
+class SignatureTemplateTests(TestCase):
+    """ Client prepares signatures from precomputed templates
+    """
+    @classmethod
+    def setUpClass(cls):
+        super(SignatureTemplateTests, cls).setUpClass()
+        cls.rpc_client = Client()
+        cls.task_name = utils.FILTER_TASK_NAME
+
+    def testNoHostnameLookupPerRequest(self):
+        """ Client name is not computed for each request
+        """
+        with mock.patch('socket.gethostname') as gethostname:
+            self.rpc_client.prepare_task(self.task_name, None, None)
+        self.assertFalse(gethostname.called)
+
+    def testHeadersNotShared(self):
+        """ Headers of signatures are independent copies
+        """
+        s1 = self.rpc_client.prepare_task(self.task_name, None, None)
+        s1.options['headers']['piped'] = True
+        s2 = self.rpc_client.prepare_task(self.task_name, None, None,
+                                          high_priority=True)
+        s3 = self.rpc_client.prepare_task(self.task_name, None, None)
+        self.assertNotIn('piped', s2.options['headers'])
+        self.assertNotIn('piped', s3.options['headers'])
+        self.assertNotIn('routing_key', s3.options)
+
+    def testCustomOptions(self):
+        """ Options of request are merged with template
+        """
+        s = self.rpc_client.prepare_task(self.task_name, None, None,
+                                         high_priority=True,
+                                         headers={'custom': 1}, priority=5)
+        self.assertEqual(1, s.options['headers']['custom'])
+        self.assertIn('referer', s.options['headers'])
+        self.assertEqual(5, s.options['priority'])
+        self.assertEqual(config.task_default_routing_key + '.high_priority',
+                         s.options['routing_key'])
+
+
 class TaskExpireTests(TestCase):
     """ Tests expiry time for tasks
     """
@@ -186,3 +250,590 @@ class TaskExpireTests(TestCase):
 
         self._assertExpires(method_name, self.test_expires,
                             timeout=self.test_expires)
+
+
+class DeadlineTests(TestCase):
+    """ Client sends overall deadline of request and retries within it
+    """
+
+    def setUp(self):
+        super(DeadlineTests, self).setUp()
+        self.rpc_client = Client()
+        self.signature = self.rpc_client.prepare_task(
+            utils.CALL_TASK_NAME, ('celery_rpc.tests.test_tasks:plus',
+                                   [1, 2], None), None)
+
+    def send(self, side_effect, **kwargs):
+        with mock.patch('celery_rpc.tasks.call.apply_async',
+                        side_effect=side_effect) as apply_async:
+            with mock.patch('time.sleep') as sleep:
+                try:
+                    self.rpc_client.send_request(self.signature, True,
+                                                 **kwargs)
+                except Client.RequestError:
+                    pass
+        return apply_async.call_args_list, sleep.call_args_list
+
+    def testDeadlineHeader(self):
+        """ Deadline is passed with other headers
+        """
+        now = time.time()
+        calls, _ = self.send(None, timeout=5)
+        headers = calls[0][1]['headers']
+        self.assertIn('referer', headers)
+        self.assertTrue(now + 5 <= headers['deadline'] <= time.time() + 5)
+
+    def testRetryBackoff(self):
+        """ Retries are delayed and keep original deadline
+        """
+        calls, sleeps = self.send(
+            [ValueError(), ValueError(), mock.DEFAULT], timeout=5, retries=3)
+        self.assertEqual(3, len(calls))
+        self.assertEqual([0.1, 0.2], [c[0][0] for c in sleeps])
+        deadlines = set(c[1]['headers']['deadline'] for c in calls)
+        self.assertEqual(1, len(deadlines))
+        self.assertEqual(5, calls[0][1]['expires'])
+        self.assertTrue(calls[2][1]['expires'] < 5)
+
+    def testRetryWithinDeadline(self):
+        """ Request is not retried if backoff exceeds deadline
+        """
+        calls, sleeps = self.send([ValueError()] * 3, timeout=0.05,
+                                  retries=3)
+        self.assertEqual(1, len(calls))
+        self.assertEqual([], sleeps)
+
+
+class GatherTests(SimpleModelTestMixin, TestCase):
+    """ Collecting results of several nowait requests
+    """
+    @classmethod
+    def setUpClass(cls):
+        super(GatherTests, cls).setUpClass()
+        cls.rpc_client = Client()
+
+    def _filter_nowait(self):
+        return [self.rpc_client.filter(self.MODEL_SYMBOL, nowait=True,
+                                       kwargs={'filters': {'pk': m.pk}})
+                for m in self.models]
+
+    def _store_results(self, values):
+        """ Put results to result backend as worker does
+        """
+        results = []
+        for value in values:
+            task_id = str(uuid4())
+            self.rpc_client._app.backend.store_result(task_id, value,
+                                                      'SUCCESS')
+            results.append(self.rpc_client._app.AsyncResult(task_id))
+        return results
+
+    def testGather(self):
+        """ Results are collected in order of requests
+        """
+        r = self.rpc_client.gather(self._filter_nowait())
+        expected = [[self.get_model_dict(m)] for m in self.models]
+        self.assertEqual(expected, r)
+
+    def testGatherEmpty(self):
+        self.assertEqual([], self.rpc_client.gather([]))
+
+    def testGatherNative(self):
+        """ Results are fetched natively from result backend
+        """
+        results = self._store_results(range(5))
+        self.assertTrue(results[0].supports_native_join)
+        with mock.patch.object(results[0].backend, 'get_many',
+                               wraps=results[0].backend.get_many) as get_many:
+            r = self.rpc_client.gather(results)
+        self.assertEqual(list(range(5)), r)
+        self.assertEqual(1, get_many.call_count)
+
+    def testGatherRemoteError(self):
+        """ Remote errors are unpacked
+        """
+        results = self._filter_nowait()
+        results.append(self.rpc_client.filter('not.existing.Model',
+                                              nowait=True))
+        with self.assertRaisesRegexp(ImportError, "No module named"):
+            self.rpc_client.gather(results)
+
+    def testAsCompleted(self):
+        """ Results are iterated with their AsyncResult objects
+        """
+        results = self._filter_nowait()
+        r = dict(self.rpc_client.as_completed(results))
+        self.assertEqual(set(results), set(r.keys()))
+        for async_result, m in zip(results, self.models):
+            self.assertEqual([self.get_model_dict(m)], r[async_result])
+
+    def testAsCompletedNative(self):
+        """ Results are iterated natively from result backend
+        """
+        results = self._store_results(range(3))
+        r = dict(self.rpc_client.as_completed(results))
+        self.assertEqual({0, 1, 2}, set(r.values()))
+
+    def testAsCompletedTimeout(self):
+        """ Timeout error raised for unfinished results
+        """
+        results = self._store_results(range(1))
+        results.append(self.rpc_client._app.AsyncResult(str(uuid4())))
+        with self.assertRaises(Client.TimeoutError):
+            list(self.rpc_client.as_completed(results, timeout=0.1,
+                                              interval=0.01))
+
+
+class CallManyTests(TestCase):
+    """ Batched calls of function
+    """
+    FUNCTION = 'celery_rpc.tests.test_tasks:plus'
+
+    @classmethod
+    def setUpClass(cls):
+        super(CallManyTests, cls).setUpClass()
+        cls.rpc_client = Client()
+
+    def testCallMany(self):
+        """ Results are returned in order of calls
+        """
+        calls = [((i, i), None) for i in range(5)]
+        r = self.rpc_client.call_many(self.FUNCTION, calls)
+        self.assertEqual([0, 2, 4, 6, 8], r)
+
+    def testChunks(self):
+        """ Calls are sent in chunks
+        """
+        calls = [((i,), {'b': 1}) for i in range(5)]
+        with mock.patch.object(Client, 'send_request',
+                               wraps=self.rpc_client.send_request) as send:
+            r = self.rpc_client.call_many(self.FUNCTION, calls, chunk_size=2)
+        self.assertEqual([1, 2, 3, 4, 5], r)
+        self.assertEqual(3, send.call_count)
+
+    def testErrors(self):
+        """ Failed calls are returned as exceptions
+        """
+        r = self.rpc_client.call_many(self.FUNCTION,
+                                      [((1, 2), None), ((1,), None)])
+        self.assertEqual(3, r[0])
+        self.assertIsInstance(r[1], TypeError)
+        self.assertIsInstance(r[1], self.rpc_client.errors.RemoteError)
+
+    def testInvalidCalls(self):
+        with self.assertRaises(Client.InvalidRequest):
+            self.rpc_client.call_many(self.FUNCTION, [1, 2])
+
+
+class SharedAppTests(TestCase):
+    """ Clients with equal config share Celery app
+    """
+
+    def setUp(self):
+        super(SharedAppTests, self).setUp()
+        self.addCleanup(shared_apps.clear)
+
+    def testNotSharedByDefault(self):
+        self.assertIsNot(Client()._app, Client()._app)
+
+    def testShared(self):
+        """ Clients with equal configs share app and task stubs
+        """
+        c1 = Client({'task_default_queue': 'q1'}, shared=True)
+        c2 = Client({'task_default_queue': 'q1'}, shared=True)
+        c3 = Client({'task_default_queue': 'q2'}, shared=True)
+        self.assertIs(c1._app, c2._app)
+        self.assertIs(c1._task_stubs, c2._task_stubs)
+        self.assertIsNot(c1._app, c3._app)
+        self.assertEqual(2, len(shared_apps))
+
+    def testSharedFromConfig(self):
+        c1 = Client({'client_shared_app': True})
+        c2 = Client({'client_shared_app': True})
+        self.assertIs(c1._app, c2._app)
+
+    def testResetAfterFork(self):
+        """ Apps are not reused in child process
+        """
+        registry = SharedApps()
+        app, _ = registry.get()
+        self.assertIs(app, registry.get()[0])
+        with mock.patch('os.getpid', return_value=-1):
+            self.assertIsNot(app, registry.get()[0])
+
+    def testConnectionLimit(self):
+        """ Pools of shared apps are limited by process-wide budget
+        """
+        registry = SharedApps(connection_limit=5)
+        conf = {'broker_pool_limit': 3}
+        app, _ = registry.get(dict(conf, task_default_queue='q1'))
+        self.assertEqual(3, app.conf.broker_pool_limit)
+        self.assertIs(app, registry.get(dict(conf,
+                                             task_default_queue='q1'))[0])
+        app, _ = registry.get(dict(conf, task_default_queue='q2'))
+        self.assertEqual(2, app.conf.broker_pool_limit)
+        registry.clear()
+        app, _ = registry.get(dict(conf, task_default_queue='q3'))
+        self.assertEqual(3, app.conf.broker_pool_limit)
+
+    def testConnectionLimitExhausted(self):
+        """ Apps created after budget is exhausted get minimal pool
+        """
+        registry = SharedApps(connection_limit=2)
+        registry.get({'task_default_queue': 'q1'})
+        with mock.patch('celery_rpc.client.logger') as logger:
+            app, _ = registry.get({'task_default_queue': 'q2'})
+        self.assertEqual(1, app.conf.broker_pool_limit)
+        self.assertTrue(logger.warning.called)
+
+    def testConnectionLimitWithoutPool(self):
+        """ App with disabled pooling takes one connection of budget
+        """
+        registry = SharedApps(connection_limit=4)
+        app, _ = registry.get({'broker_pool_limit': 0})
+        self.assertEqual(1, app.conf.broker_pool_limit)
+        app, _ = registry.get({'broker_pool_limit': None,
+                               'task_default_queue': 'q'})
+        self.assertEqual(1, app.conf.broker_pool_limit)
+        app, _ = registry.get({'task_default_queue': 'q1'})
+        self.assertEqual(2, app.conf.broker_pool_limit)
+
+    def testConnectionLimitFromConfig(self):
+        self.assertEqual(config.client_shared_connection_limit,
+                         shared_apps.connection_limit)
+
+    def testThreadSafe(self):
+        """ Concurrent clients get the same app
+        """
+        registry = SharedApps()
+        apps = []
+        threads = [threading.Thread(target=lambda: apps.append(
+            registry.get({'task_default_queue': 'q'})[0])) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(1, len(set(map(id, apps))))
+
+
+class BatchingTests(SimpleModelTestMixin, TestCase):
+    """ Merging of single-object writes into bulk requests
+    """
+
+    def setUp(self):
+        super(BatchingTests, self).setUp()
+        # batch is sent by the writer which fills it
+        self.rpc_client = Client({'batch_writes': True, 'batch_max_size': 3,
+                                  'batch_window': 60})
+
+    def write(self, method, data_list):
+        with mock.patch.object(self.rpc_client, 'send_request',
+                               wraps=self.rpc_client.send_request) as send:
+            futures = [getattr(self.rpc_client, method)(
+                self.MODEL_SYMBOL, data, nowait=True) for data in data_list]
+        return futures, send.call_count
+
+    def testCreate(self):
+        """ Single-object creates are sent as one request
+        """
+        futures, sent = self.write('create', [{'char': 'a'}, {'char': 'b'},
+                                              {'char': 'c'}])
+        self.assertEqual(1, sent)
+        results = [f.result() for f in futures]
+        self.assertEqual(['a', 'b', 'c'], [r['char'] for r in results])
+        for r in results:
+            self.assertEqual(r['char'], self.MODEL.objects.get(pk=r['id']).char)
+
+    def testUpdate(self):
+        data_list = [{'pk': m.pk, 'char': 'new%s' % i}
+                     for i, m in enumerate(self.models[:3])]
+        futures, sent = self.write('update', data_list)
+        self.assertEqual(1, sent)
+        for data, f in zip(data_list, futures):
+            self.assertEqual(data['char'], f.result()['char'])
+            self.assertEqual(data['char'],
+                             self.MODEL.objects.get(pk=data['pk']).char)
+
+    def testValidationErrors(self):
+        """ Writer of invalid object gets its own error, other objects are
+        written
+        """
+        futures, sent = self.write('create', [{'char': 'a'}, {'char': 'x' * 100},
+                                              {'char': 'c'}])
+        self.assertEqual(2, sent)
+        self.assertEqual('a', futures[0].result()['char'])
+        self.assertEqual('c', futures[2].result()['char'])
+        with self.assertRaises(RestFrameworkError) as ctx:
+            futures[1].result()
+        self.assertIn('char', ctx.exception.args[1])
+        self.assertEqual(2, self.MODEL.objects.filter(
+            char__in=['a', 'c']).count())
+
+    def testValidationErrorsNotWrapped(self):
+        """ Errors are split by items without wrapping of remote errors
+        """
+        self.rpc_client = Client({'batch_writes': True, 'batch_max_size': 3,
+                                  'batch_window': 60,
+                                  'wrap_remote_errors': False})
+        futures, sent = self.write('create', [{'char': 'a'}, {'char': 'x' * 100},
+                                              {'char': 'c'}])
+        self.assertEqual(2, sent)
+        self.assertEqual('c', futures[2].result()['char'])
+        with self.assertRaises(Client.ResponseError) as ctx:
+            futures[1].result()
+        self.assertIn('char', ctx.exception.args[1].args[1])
+
+    def testUpdateOrCreate(self):
+        """ Existing and new objects are sent in separate requests
+        """
+        data_list = [{'pk': self.models[0].pk, 'char': 'new'},
+                     {'char': 'created'}, {'char': 'created'}]
+        futures, sent = self.write('update_or_create', data_list)
+        self.assertEqual(2, sent)
+        results = [f.result() for f in futures]
+        self.assertEqual(self.models[0].pk, results[0]['id'])
+        self.assertEqual('new', self.MODEL.objects.get(
+            pk=self.models[0].pk).char)
+        self.assertEqual(2, self.MODEL.objects.filter(char='created').count())
+
+    def testSameObject(self):
+        """ Writes of the same object are sent in separate requests in order
+        """
+        pk = self.models[0].pk
+        data_list = [{'pk': pk, 'char': 'first'},
+                     {'pk': self.models[1].pk, 'char': 'other'},
+                     {'pk': pk, 'char': 'second'}]
+        futures, sent = self.write('update', data_list)
+        self.assertEqual(2, sent)
+        self.assertEqual(['first', 'other', 'second'],
+                         [f.result()['char'] for f in futures])
+        self.assertEqual('second', self.MODEL.objects.get(pk=pk).char)
+
+    def testFallback(self):
+        """ Objects are written one by one if bulk request fails
+        """
+        missing = max(m.pk for m in self.models) + 1
+        data_list = [{'pk': self.models[0].pk, 'char': 'new'},
+                     {'pk': missing, 'char': 'missing'},
+                     {'pk': self.models[1].pk, 'char': 'new'}]
+        futures, sent = self.write('update', data_list)
+        self.assertEqual(4, sent)
+        self.assertEqual('new', futures[0].result()['char'])
+        self.assertEqual('new', futures[2].result()['char'])
+        with self.assertRaises(Exception):
+            futures[1].result()
+        self.assertEqual(2, self.MODEL.objects.filter(char='new').count())
+
+    def testRequestOptions(self):
+        """ Requests are merged only with the same timeout and retries and
+        are not merged with options of apply_async
+        """
+        with mock.patch.object(self.rpc_client, 'send_request',
+                               wraps=self.rpc_client.send_request) as send:
+            futures = [
+                self.rpc_client.create(self.MODEL_SYMBOL, {'char': 'a'},
+                                       nowait=True, timeout=5),
+                self.rpc_client.create(self.MODEL_SYMBOL, {'char': 'b'},
+                                       nowait=True, timeout=10),
+                self.rpc_client.create(self.MODEL_SYMBOL, {'char': 'c'},
+                                       nowait=True, countdown=0)]
+            self.rpc_client._batcher.flush()
+        self.assertEqual(3, send.call_count)
+        self.assertEqual([5, 10], sorted(c[0][2] for c in
+                                         send.call_args_list[1:]))
+        self.assertEqual('c', futures[2].get()['char'])
+
+    def testWindow(self):
+        """ Incomplete batch is sent after window
+        """
+        client = Client({'batch_writes': True, 'batch_window': 0.01})
+        with mock.patch.object(client, 'create',
+                               wraps=client.create) as create:
+            create.side_effect = lambda model, data, **kw: data
+            r = client._submit_batched('create', self.MODEL_SYMBOL,
+                                       {'char': 'a'}, None)
+        self.assertEqual({'char': 'a'}, r)
+
+    def testListNotBatched(self):
+        futures, sent = self.write('create', [[{'char': 'a'}]])
+        self.assertEqual(1, sent)
+        self.assertEqual('a', futures[0].get()[0]['char'])
+
+    def testDisabled(self):
+        """ Batching is disabled by default and may be enabled per request
+        """
+        client = Client()
+        r = client.create(self.MODEL_SYMBOL, {'char': 'a'})
+        self.assertEqual('a', r['char'])
+        with mock.patch.object(client, '_submit_batched') as submit:
+            client.create(self.MODEL_SYMBOL, {'char': 'a'}, batch=True)
+        self.assertTrue(submit.called)
+
+
+class IterFilterTests(SimpleModelTestMixin, TestCase):
+    """ Iterating over filtered objects page by page
+    """
+
+    def setUp(self):
+        super(IterFilterTests, self).setUp()
+        self.rpc_client = Client()
+
+    def iter_filter(self, **kwargs):
+        with mock.patch.object(self.rpc_client, 'send_request',
+                               wraps=self.rpc_client.send_request) as send:
+            r = list(self.rpc_client.iter_filter(self.MODEL_SYMBOL, **kwargs))
+        return r, [c[0][0].kwargs for c in send.call_args_list]
+
+    def testAll(self):
+        """ All objects are returned in order without offsets
+        """
+        r, requests = self.iter_filter(page_size=2)
+        expected = sorted(m.pk for m in self.models)
+        self.assertEqual(expected, [o['id'] for o in r])
+        self.assertEqual(3, len(requests))
+        for kwargs in requests:
+            self.assertNotIn('offset', kwargs)
+            self.assertEqual(2, kwargs['limit'])
+
+    def testLastPageFull(self):
+        """ Empty page ends iteration
+        """
+        r, requests = self.iter_filter(page_size=5)
+        self.assertEqual(5, len(r))
+        self.assertEqual(2, len(requests))
+
+    def testFilters(self):
+        """ Filters are applied to each page
+        """
+        self.MODEL.objects.filter(pk=self.models[1].pk).update(char='skip')
+        r, _ = self.iter_filter(page_size=1,
+                                kwargs={'exclude': {'char': 'skip'}})
+        self.assertEqual(4, len(r))
+        self.assertNotIn(self.models[1].pk, [o['id'] for o in r])
+
+    def testOrderBy(self):
+        """ Objects are paged by given unique ordering
+        """
+        for i, m in enumerate(self.models):
+            m.char = 'x'
+            m.datetime = datetime(2020, 1, 1 + i % 2)
+            m.save()
+        order_by = ['-datetime', 'pk']
+        r, _ = self.iter_filter(page_size=2, kwargs={'order_by': order_by})
+        expected = [m.pk for m in self.MODEL.objects.order_by(*order_by)]
+        self.assertEqual(expected, [o['id'] for o in r])
+
+    def testFields(self):
+        """ Ordering fields may be missing in serialized objects
+        """
+        r, _ = self.iter_filter(page_size=2, kwargs={'fields': ['char']})
+        self.assertEqual(len(self.models), len(r))
+        self.assertEqual(['char'], list(r[0]))
+
+    def testDefaultCodec(self):
+        """ Requests of pages are encoded by default 'x-json' codec
+        """
+        _, requests = self.iter_filter(page_size=2)
+        self.assertIsNotNone(requests[-1]['cursor'])
+        for kwargs in requests:
+            dumps(kwargs, serializer='x-json')
+
+    def testOffset(self):
+        with self.assertRaises(Client.InvalidRequest):
+            self.iter_filter(kwargs={'offset': 1})
+
+
+class StreamFilterTests(SimpleModelTestMixin, TestCase):
+    """ Delivery of filtered objects by chunks
+    """
+
+    def setUp(self):
+        super(StreamFilterTests, self).setUp()
+        self.rpc_client = Client()
+
+    def testAll(self):
+        r = list(self.rpc_client.stream_filter(
+            self.MODEL_SYMBOL, chunk_size=2, kwargs={'order_by': '-char'}))
+        expected = sorted(self.models, key=lambda m: m.char, reverse=True)
+        self.assertEqual([m.pk for m in expected], [o['id'] for o in r])
+
+    def testLazy(self):
+        """ Chunks are fetched from backend and dropped one by one
+        """
+        with mock.patch.object(AsyncResult, 'forget', autospec=True,
+                               side_effect=AsyncResult.forget) as forget:
+            iterator = self.rpc_client.stream_filter(self.MODEL_SYMBOL,
+                                                     chunk_size=2)
+            self.assertEqual(self.models[0].pk, next(iterator)['id'])
+            self.assertEqual(1, forget.call_count)
+            next(iterator)
+            next(iterator)
+            self.assertEqual(2, forget.call_count)
+            self.assertEqual(2, len(list(iterator)))
+        chunks = [c[0][0] for c in forget.call_args_list]
+        self.assertEqual(3, len(chunks))
+        for chunk in chunks:
+            self.assertEqual(states.PENDING,
+                             AsyncResult(chunk.id, app=chunk.app).state)
+
+    def testLongStream(self):
+        """ Stream is not stopped by deadline after first chunk is selected
+        """
+        started = time.time()
+        clock = mock.Mock()
+        # every deadline check after the first one is late
+        clock.time.side_effect = lambda: started + (
+            config.get_result_timeout + 1) * (clock.time.call_count - 1)
+        apply = self.rpc_client._apply
+        with mock.patch.object(self.rpc_client, '_apply',
+                               side_effect=apply) as sent, \
+                mock.patch('celery_rpc.base.time', clock):
+            r = list(self.rpc_client.stream_filter(
+                self.MODEL_SYMBOL, chunk_size=1,
+                timeout=config.get_result_timeout * 3))
+        self.assertEqual(len(self.models), len(r))
+        self.assertEqual(config.get_result_timeout * 3,
+                         sent.call_args[0][1])
+
+    def testAbandoned(self):
+        """ Chunks are dropped from backend when iteration is abandoned
+        """
+        with mock.patch.object(AsyncResult, 'forget', autospec=True,
+                               side_effect=AsyncResult.forget) as forget:
+            iterator = self.rpc_client.stream_filter(self.MODEL_SYMBOL,
+                                                     chunk_size=2)
+            next(iterator)
+            iterator.close()
+        chunks = [c[0][0] for c in forget.call_args_list]
+        # first chunk is consumed, others are dropped on close
+        self.assertEqual(['0', '1', '2'],
+                         [c.id.rsplit('.', 1)[1] for c in chunks])
+        for chunk in chunks:
+            self.assertEqual(states.PENDING,
+                             AsyncResult(chunk.id, app=chunk.app).state)
+
+    def testBackoff(self):
+        """ Delay between polls of chunk grows exponentially
+        """
+        chunk = {'rows': [{'id': 1}], 'more': False}
+        with mock.patch.object(self.rpc_client, '_poll_chunk',
+                               side_effect=[None, None, None, chunk]), \
+                mock.patch('celery_rpc.client.time.sleep') as sleep:
+            r = list(self.rpc_client._iter_chunks(mock.Mock()))
+        self.assertEqual(chunk['rows'], r)
+        interval = Client.poll_interval
+        self.assertEqual([interval, interval * 2, interval * 4],
+                         [c[0][0] for c in sleep.call_args_list])
+
+    def testUnsupportedBackend(self):
+        """ Chunks are not sent to reply queue of rpc:// backend
+        """
+        client = Client({'result_backend': 'rpc://'})
+        with self.assertRaises(Client.InvalidRequest):
+            client.stream_filter(self.MODEL_SYMBOL)
+
+    def testUnsupportedKwargs(self):
+        for name in ('offset', 'limit', 'cursor'):
+            with self.assertRaises(Client.InvalidRequest):
+                self.rpc_client.stream_filter(self.MODEL_SYMBOL,
+                                              kwargs={name: 1})
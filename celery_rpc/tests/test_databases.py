@@ -0,0 +1,150 @@
+from __future__ import absolute_import
+
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .. import tasks
+from ..client import Client
+from ..exceptions import ModelTaskError
+from .models import PartialUpdateModel
+from .utils import SimpleModelTestMixin, unpack_exception
+
+
+class ReplicaRouter(object):
+    """ Sends reads to replica
+    """
+
+    def db_for_read(self, model, **hints):
+        return 'replica'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+
+class DatabaseRoutingTests(SimpleModelTestMixin, TransactionTestCase):
+    """ Requests are served by database chosen by policy
+    """
+    databases = {'default', 'replica'}
+    # Django < 2.2
+    multi_db = True
+
+    def setUp(self):
+        super(DatabaseRoutingTests, self).setUp()
+        self.client = Client()
+
+    def setReadDatabase(self, alias):
+        conf = tasks.rpc.conf
+        conf.read_database = alias
+        self.addCleanup(setattr, conf, 'read_database', None)
+
+    def assertServedBy(self, alias, task, *args, **kwargs):
+        """ Run task and check that all its queries are sent to alias
+        """
+        with CaptureQueriesContext(connections['default']) as default, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            r = task.delay(*args, **kwargs).get()
+        served = {'default': len(default), 'replica': len(replica)}
+        self.assertTrue(served.pop(alias), "No queries sent to %s" % alias)
+        self.assertEqual([0], list(served.values()))
+        return r
+
+    def testDefault(self):
+        """ Without policy reads are routed by Django routers
+        """
+        self.assertServedBy('default', tasks.filter, self.MODEL_SYMBOL)
+
+    def testReadDatabase(self):
+        self.setReadDatabase('replica')
+        r = self.assertServedBy('replica', tasks.filter, self.MODEL_SYMBOL)
+        self.assertEqual(len(self.models), len(r))
+        self.assertServedBy('replica', tasks.count, self.MODEL_SYMBOL)
+        self.assertServedBy('replica', tasks.exists, self.MODEL_SYMBOL)
+        self.assertServedBy('replica', tasks.aggregate, self.MODEL_SYMBOL,
+                            {'n': ['Count', 'pk']})
+
+    def testWritesToPrimary(self):
+        self.setReadDatabase('replica')
+        data = {'id': self.models[0].pk, 'char': 'primary'}
+        self.assertServedBy('default', tasks.update, self.MODEL_SYMBOL, data)
+        self.assertServedBy('default', tasks.getset, self.MODEL_SYMBOL, data)
+        self.assertServedBy('default', tasks.delete, self.MODEL_SYMBOL,
+                            [data], bulk=True)
+
+    @override_settings(DATABASE_ROUTERS=[
+        'celery_rpc.tests.test_databases.ReplicaRouter'])
+    def testRouter(self):
+        self.assertServedBy('replica', tasks.filter, self.MODEL_SYMBOL)
+        self.assertServedBy('default', tasks.update, self.MODEL_SYMBOL,
+                            {'id': self.models[0].pk, 'char': 'primary'})
+
+    def testExplicitDatabase(self):
+        self.assertServedBy('replica', tasks.filter, self.MODEL_SYMBOL,
+                            database='replica')
+
+    def testExplicitDatabaseWrites(self):
+        """ Objects are created and updated in explicitly requested database
+        """
+        pk = self.models[0].pk
+        self.assertServedBy('replica', tasks.create, self.MODEL_SYMBOL,
+                            {'char': 'created'}, database='replica')
+        self.assertServedBy('replica', tasks.create, self.MODEL_SYMBOL,
+                            [{'char': 'a'}, {'char': 'b'}], bulk=True,
+                            database='replica')
+        self.assertServedBy('replica', tasks.update, self.MODEL_SYMBOL,
+                            [{'id': pk, 'char': 'updated'}], bulk=True,
+                            database='replica')
+        self.assertServedBy('replica', tasks.update_or_create,
+                            self.MODEL_SYMBOL,
+                            [{'id': pk, 'char': 'upserted'}, {'char': 'new'}],
+                            bulk=True, database='replica')
+        self.assertEqual('upserted', self.MODEL.objects.get(pk=pk).char)
+        self.assertEqual(1, self.MODEL.objects.filter(char='new').count())
+
+    def testUnknownDatabase(self):
+        with self.assertRaises(Exception) as ctx:
+            with unpack_exception():
+                tasks.filter.delay(self.MODEL_SYMBOL, database='other').get()
+        self.assertIsInstance(ctx.exception, ModelTaskError)
+
+    def testPipeWithChanges(self):
+        """ Reads piped with changes see them on primary
+        """
+        self.setReadDatabase('replica')
+        kwargs = dict(filters={'pk': self.models[0].pk})
+        p = self.client.pipe()
+        p = p.update(self.MODEL_SYMBOL,
+                     {'id': self.models[0].pk, 'char': 'piped'})
+        p = p.filter(self.MODEL_SYMBOL, kwargs=kwargs)
+        with CaptureQueriesContext(connections['replica']) as replica:
+            r = p.run()
+        self.assertEqual(0, len(replica))
+        self.assertEqual('piped', r[1][0]['char'])
+
+        p = self.client.pipe().count(self.MODEL_SYMBOL, kwargs=kwargs)
+        with CaptureQueriesContext(connections['replica']) as replica:
+            self.assertEqual([1], p.run())
+        self.assertEqual(1, len(replica))
+
+
+class ManagerTests(TransactionTestCase):
+    """ Requests are served by requested model manager
+    """
+    MODEL_SYMBOL = 'celery_rpc.tests.models:PartialUpdateModel'
+
+    def setUp(self):
+        super(ManagerTests, self).setUp()
+        self.positive = PartialUpdateModel.objects.create(f1=1, f2=1)
+        PartialUpdateModel.objects.create(f1=0, f2=2)
+
+    def testManager(self):
+        r = tasks.filter.delay(self.MODEL_SYMBOL, manager='positive').get()
+        self.assertEqual([self.positive.pk], [i['id'] for i in r])
+        r = tasks.count.delay(self.MODEL_SYMBOL, manager='objects').get()
+        self.assertEqual(2, r)
+
+    def testUnknownManager(self):
+        with self.assertRaises(Exception) as ctx:
+            with unpack_exception():
+                tasks.filter.delay(self.MODEL_SYMBOL, manager='_meta').get()
+        self.assertIsInstance(ctx.exception, ModelTaskError)
@@ -55,6 +55,17 @@ class PipelineTests(BasePipelineTests):
                     [self.get_model_dict(self.models[1])]]
         self.assertEqual(expected, r)
 
+    def testAggregates(self):
+        """ Count, exists and aggregate work in pipeline.
+        """
+        kwargs = dict(filters={'pk__lte': self.models[1].pk})
+        p = self.pipe.count(self.MODEL_SYMBOL, kwargs=kwargs)
+        p = p.exists(self.MODEL_SYMBOL, kwargs=dict(filters={'pk': -1}))
+        p = p.aggregate(self.MODEL_SYMBOL, {'last': ['Max', 'pk']},
+                        kwargs=kwargs)
+        r = p.run()
+        self.assertEqual([2, False, {'last': self.models[1].pk}], r)
+
     def testUpdate(self):
         """ Update works well in pipeline.
         """
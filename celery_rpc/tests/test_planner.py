@@ -0,0 +1,241 @@
+from __future__ import absolute_import
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import serializers
+
+from .. import tasks
+from ..base import ModelTask
+from ..planner import plan_columns, plan_related
+from . import factories
+from .models import SimpleModel, FkSimpleModel, ManyToManyModel
+
+
+class SimpleSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SimpleModel
+        fields = ('id', 'char')
+
+
+class FkNestedSerializer(serializers.ModelSerializer):
+    fk = SimpleSerializer()
+
+    class Meta:
+        model = FkSimpleModel
+        fields = ('id', 'fk')
+
+
+class FkSourceSerializer(serializers.ModelSerializer):
+    fk_char = serializers.CharField(source='fk.char')
+
+    class Meta:
+        model = FkSimpleModel
+        fields = ('id', 'fk', 'fk_char')
+
+
+class M2MNestedSerializer(serializers.ModelSerializer):
+    m2m = SimpleSerializer(many=True)
+
+    class Meta:
+        model = ManyToManyModel
+        fields = ('id', 'm2m')
+
+
+class ReverseSerializer(serializers.ModelSerializer):
+    fksimplemodel_set = FkNestedSerializer(many=True)
+    m2m_ids = serializers.PrimaryKeyRelatedField(
+        source='manytomanymodel_set', many=True, read_only=True)
+
+    class Meta:
+        model = SimpleModel
+        fields = ('id', 'fksimplemodel_set', 'm2m_ids')
+
+
+class PropertySerializer(serializers.ModelSerializer):
+    pk_str = serializers.CharField(source='__str__')
+
+    class Meta:
+        model = SimpleModel
+        fields = ('id', 'pk_str')
+
+
+class RepresentationSerializer(SimpleSerializer):
+    def to_representation(self, instance):
+        data = super(RepresentationSerializer, self).to_representation(
+            instance)
+        data['datetime'] = instance.datetime.isoformat()
+        return data
+
+
+class PlanRelatedTests(TestCase):
+    """ Relations used by serializers are found
+    """
+
+    def testNoRelations(self):
+        self.assertEqual(([], []), plan_related(SimpleSerializer))
+
+    def testPrimaryKeyOnly(self):
+        """ Foreign key values do not need joins
+        """
+
+        class Serializer(serializers.ModelSerializer):
+            class Meta:
+                model = FkSimpleModel
+                fields = '__all__'
+
+        self.assertEqual(([], []), plan_related(Serializer))
+
+    def testNested(self):
+        self.assertEqual((['fk'], []), plan_related(FkNestedSerializer))
+
+    def testDottedSource(self):
+        self.assertEqual((['fk'], []), plan_related(FkSourceSerializer))
+
+    def testManyToMany(self):
+        self.assertEqual(([], ['m2m']), plan_related(M2MNestedSerializer))
+
+    def testReverse(self):
+        """ Relations behind reverse relations are prefetched
+        """
+        self.assertEqual(
+            ([], ['fksimplemodel_set__fk', 'manytomanymodel_set']),
+            plan_related(ReverseSerializer))
+
+
+class PlanColumnsTests(TestCase):
+    """ Model fields used by serializers are found
+    """
+
+    def testFields(self):
+        self.assertEqual(['char', 'id'], plan_columns(SimpleSerializer))
+
+    def testForeignKey(self):
+        """ Relations are loaded by foreign key column
+        """
+        self.assertEqual(['fk', 'id'], plan_columns(FkSourceSerializer))
+        self.assertEqual(['fk', 'id'], plan_columns(FkNestedSerializer))
+
+    def testAllFields(self):
+        class Serializer(serializers.ModelSerializer):
+            class Meta:
+                model = SimpleModel
+                fields = '__all__'
+
+        self.assertIsNone(plan_columns(Serializer))
+
+    def testNotModelField(self):
+        """ Serializers using methods of model load all fields
+        """
+        self.assertIsNone(plan_columns(PropertySerializer))
+
+    def testReverse(self):
+        """ Nested objects of reverse relation refer to instance itself
+        """
+        self.assertIsNone(plan_columns(ReverseSerializer))
+
+    def testCustomRepresentation(self):
+        """ Custom to_representation() may use any field of model
+        """
+        self.assertIsNone(plan_columns(RepresentationSerializer))
+
+
+class FilterColumnsTests(TestCase):
+    """ Filter task selects only columns of requested fields
+    """
+
+    def setUp(self):
+        super(FilterColumnsTests, self).setUp()
+        ModelTask.query_plans.clear()
+        self.model = factories.SimpleModelFactory()
+
+    def assertColumns(self, expected, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            r = tasks.filter.delay('celery_rpc.tests.models:SimpleModel',
+                                   **kwargs).get()
+        self.assertEqual(1, len(queries))
+        sql = queries[0]['sql']
+        columns = sql[sql.index('SELECT') + 6:sql.index('FROM')]
+        self.assertEqual(
+            expected, [c.strip().split('.')[-1].strip('"')
+                       for c in columns.split(',')])
+        return r
+
+    def testSerializer(self):
+        r = self.assertColumns(
+            ['id', 'char'],
+            serializer_cls='celery_rpc.tests.test_planner:SimpleSerializer')
+        self.assertEqual([{'id': self.model.pk, 'char': self.model.char}], r)
+
+    def testCustomRepresentation(self):
+        r = self.assertColumns(
+            ['id', 'char', 'datetime'],
+            serializer_cls='celery_rpc.tests.test_planner:'
+                           'RepresentationSerializer')
+        self.assertEqual(self.model.datetime.isoformat(), r[0]['datetime'])
+
+    def testRequestedFields(self):
+        """ Requested fields are selected without values serialization
+        """
+        conf = tasks.rpc.conf
+        conf.values_serialization = False
+        self.addCleanup(setattr, conf, 'values_serialization', True)
+        r = self.assertColumns(['id', 'char'], fields=['char'])
+        self.assertEqual([{'char': self.model.char}], r)
+
+    def testDisabled(self):
+        conf = tasks.rpc.conf
+        conf.prune_columns = False
+        self.addCleanup(setattr, conf, 'prune_columns', True)
+        self.assertColumns(
+            ['id', 'char', 'datetime'],
+            serializer_cls='celery_rpc.tests.test_planner:SimpleSerializer')
+
+
+class FilterRelatedTests(TestCase):
+    """ Filter task does not issue query per object for related fields
+    """
+
+    def setUp(self):
+        super(FilterRelatedTests, self).setUp()
+        ModelTask.query_plans.clear()
+        self.models = factories.SimpleModelFactory.create_batch(3)
+        for m in self.models:
+            factories.FkSimpleModelFactory(fk=m)
+            factories.ManyToManyModelFactory(m2m=self.models)
+
+    def filter(self, model, serializer, **kwargs):
+        serializer_cls = 'celery_rpc.tests.test_planner:' + serializer
+        return tasks.filter.delay('celery_rpc.tests.models:' + model,
+                                  serializer_cls=serializer_cls,
+                                  **kwargs).get()
+
+    def testSelectRelated(self):
+        with self.assertNumQueries(1):
+            r = self.filter('FkSimpleModel', 'FkNestedSerializer')
+        self.assertEqual([m.char for m in self.models],
+                         [i['fk']['char'] for i in r])
+
+    def testPrefetchRelated(self):
+        with self.assertNumQueries(3):
+            r = self.filter('SimpleModel', 'ReverseSerializer')
+        self.assertEqual(3, len(r))
+        self.assertEqual(1, len(r[0]['fksimplemodel_set']))
+        self.assertEqual(3, len(r[0]['m2m_ids']))
+
+    def testExplicit(self):
+        """ Explicitly requested relations are added to planned
+        """
+        with self.assertNumQueries(1):
+            self.filter('FkSimpleModel', 'FkSourceSerializer',
+                        select_related='fk')
+        with self.assertNumQueries(2):
+            self.filter('ManyToManyModel', 'M2MNestedSerializer',
+                        prefetch_related=['m2m'])
+
+    def testDisabled(self):
+        conf = tasks.rpc.conf
+        conf.plan_related = False
+        self.addCleanup(setattr, conf, 'plan_related', True)
+        with self.assertNumQueries(4):
+            self.filter('FkSimpleModel', 'FkNestedSerializer')
@@ -0,0 +1,114 @@
+from __future__ import absolute_import
+
+import mock
+from django.test import TestCase
+
+from .. import tasks
+from ..base import ModelTask, FunctionTask, RpcTask
+from ..exceptions import ResourceNotFound
+from ..resources import ResourceMap
+from ..utils import symbol_by_name
+from .models import SimpleModel
+from .test_tasks import plus
+from .utils import SimpleModelTestMixin, unpack_exception
+
+MODEL_SYMBOL = 'celery_rpc.tests.models:SimpleModel'
+FUNCTION_SYMBOL = 'celery_rpc.tests.test_tasks:plus'
+SERIALIZER_SYMBOL = 'celery_rpc.tests.test_tasks:SimpleTaskSerializer'
+
+
+class ResourceMapTests(TestCase):
+    """ Resolving of requested models and functions
+    """
+
+    def resolve(self, resources, name):
+        with mock.patch('celery_rpc.resources.symbol_by_name',
+                        wraps=symbol_by_name) as import_symbol:
+            r = resources.resolve('model', name, ModelTask._check_model)
+        return r, import_symbol.call_count
+
+    def testMapped(self):
+        """ Mapped names are imported once
+        """
+        resources = ResourceMap({'simple': MODEL_SYMBOL})
+        resources.load()
+        r, imported = self.resolve(resources, 'simple')
+        self.assertIs(SimpleModel, r)
+        self.assertEqual(0, imported)
+
+    def testMappedSymbol(self):
+        resources = ResourceMap({'simple': SimpleModel})
+        self.assertIs(SimpleModel, self.resolve(resources, 'simple')[0])
+
+    def testCached(self):
+        """ Dynamically resolved names are cached
+        """
+        resources = ResourceMap()
+        r, imported = self.resolve(resources, MODEL_SYMBOL)
+        self.assertIs(SimpleModel, r)
+        self.assertEqual(1, imported)
+        r, imported = self.resolve(resources, MODEL_SYMBOL)
+        self.assertIs(SimpleModel, r)
+        self.assertEqual(0, imported)
+        self.assertEqual(1, resources.stats['hits'])
+
+    def testStrict(self):
+        """ Unknown names are rejected without import in strict mode
+        """
+        resources = ResourceMap({'simple': MODEL_SYMBOL}, strict=True)
+        with self.assertRaises(ResourceNotFound):
+            self.resolve(resources, MODEL_SYMBOL)
+        self.assertIs(SimpleModel, self.resolve(resources, 'simple')[0])
+
+    def testKindChecked(self):
+        """ Symbol resolved as function is checked again for model
+        """
+        resources = ResourceMap()
+        self.assertIs(plus, resources.resolve('function', FUNCTION_SYMBOL,
+                                              FunctionTask._check_function))
+        with self.assertRaises(TypeError):
+            resources.resolve('model', FUNCTION_SYMBOL,
+                              ModelTask._check_model)
+
+
+class TaskResourcesTests(SimpleModelTestMixin, TestCase):
+    """ Tasks use resource map for requested names
+    """
+
+    def setUp(self):
+        super(TaskResourcesTests, self).setUp()
+        resources = ResourceMap({'simple': MODEL_SYMBOL, 'plus': plus,
+                                 'ids': SERIALIZER_SYMBOL}, strict=True)
+        patcher = mock.patch.object(RpcTask, 'resources', resources)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def testFilter(self):
+        r = tasks.filter.delay('simple').get()
+        self.assertEqual(5, len(r))
+
+    def testCall(self):
+        r = tasks.call.delay('plus', [1, 2], None).get()
+        self.assertEqual(3, r)
+
+    def testUnknown(self):
+        with self.assertRaises(ResourceNotFound):
+            with unpack_exception():
+                tasks.call.delay(FUNCTION_SYMBOL, [1, 2], None).get()
+
+    def testSerializer(self):
+        r = tasks.filter.delay('simple', serializer_cls='ids').get()
+        self.assertEqual([{'id': m.pk} for m in self.models], r)
+
+    def testUnknownSerializer(self):
+        """ Serializer names are not imported in strict mode too
+        """
+        RpcTask.resources.load()
+        with mock.patch('celery_rpc.resources.symbol_by_name') as import_, \
+                mock.patch('celery_rpc.base.symbol_by_name') as base_import:
+            with self.assertRaises(ResourceNotFound):
+                with unpack_exception():
+                    tasks.filter.delay(
+                        'simple', serializer_cls=SERIALIZER_SYMBOL).get()
+        self.assertFalse(import_.called)
+        self.assertFalse(base_import.called)
@@ -0,0 +1,178 @@
+from __future__ import absolute_import
+
+import mock
+from django.core.cache import caches
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from .. import tasks
+from ..base import ModelTask
+from ..client import Client
+from ..result_cache import ResultCache
+from . import factories
+from .models import SimpleModel, ManyToManyModel
+from .utils import SimpleModelTestMixin
+
+
+class ResultCacheTests(TestCase):
+    """ Generations and counters of server-side cache
+    """
+
+    def setUp(self):
+        super(ResultCacheTests, self).setUp()
+        self.cache = ResultCache({'tests.SimpleModel': None})
+        self.fetch = mock.Mock(side_effect=lambda: [{'id': 1}])
+
+    def testReadThrough(self):
+        kwargs = {'filters': {'pk': 1}}
+        self.assertEqual([{'id': 1}], self.cache.get_or_fetch(
+            SimpleModel, kwargs, self.fetch))
+        self.assertEqual([{'id': 1}], self.cache.get_or_fetch(
+            SimpleModel, kwargs, self.fetch))
+        self.assertEqual(1, self.fetch.call_count)
+        self.assertEqual(
+            {'hits': 1, 'misses': 1, 'hit_rate': 0.5, 'size': 1,
+             'models': {'tests.SimpleModel': {'hits': 1, 'misses': 1}}},
+            self.cache.stats)
+
+    def testInvalidate(self):
+        self.cache.get_or_fetch(SimpleModel, {}, self.fetch)
+        self.cache.invalidate(SimpleModel)
+        self.cache.get_or_fetch(SimpleModel, {}, self.fetch)
+        self.assertEqual(2, self.fetch.call_count)
+
+    def testNamespace(self):
+        self.cache.get_or_fetch(SimpleModel, {}, self.fetch, 'filter')
+        self.cache.get_or_fetch(SimpleModel, {}, self.fetch, 'count')
+        self.assertEqual(2, self.fetch.call_count)
+
+    def testEnabledFor(self):
+        self.assertTrue(self.cache.enabled_for(SimpleModel))
+        self.assertFalse(self.cache.enabled_for(ManyToManyModel))
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'result-cache-tests'}})
+    def testBackend(self):
+        """ Results and generations are stored in Django cache backend
+        """
+        self.cache = ResultCache({'tests.SimpleModel': None},
+                                 backend='default')
+        self.addCleanup(caches['default'].clear)
+        self.cache.get_or_fetch(SimpleModel, {}, self.fetch)
+        other = ResultCache({'tests.SimpleModel': None}, backend='default')
+        other.get_or_fetch(SimpleModel, {}, self.fetch)
+        self.assertEqual(1, self.fetch.call_count)
+        other.invalidate(SimpleModel)
+        self.cache.get_or_fetch(SimpleModel, {}, self.fetch)
+        self.assertEqual(2, self.fetch.call_count)
+
+
+class FilterResultCacheTests(SimpleModelTestMixin, TestCase):
+    """ Filter results are cached by server until model changes
+    """
+
+    def setUp(self):
+        super(FilterResultCacheTests, self).setUp()
+        cache = ModelTask.result_cache
+        patcher = mock.patch.object(cache, 'models', {
+            'tests.SimpleModel': None, 'tests.ManyToManyModel': None})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.connect()
+        self.addCleanup(cache.disconnect)
+        self.addCleanup(cache.clear)
+
+    def assertCached(self, cached, model=None, **kwargs):
+        with self.assertNumQueries(0 if cached else 1):
+            return tasks.filter.delay(model or self.MODEL_SYMBOL,
+                                      **kwargs).get()
+
+    def testCached(self):
+        r = self.assertCached(False, filters={'pk__gt': 0}, order_by='char')
+        self.assertEqual(r, self.assertCached(
+            True, filters={'pk__gt': 0}, order_by=['char']))
+        self.assertCached(False, filters={'pk__gt': 0})
+
+    def testNotCachedModel(self):
+        self.assertCached(False, 'celery_rpc.tests.models:PartialUpdateModel')
+        self.assertCached(False, 'celery_rpc.tests.models:PartialUpdateModel')
+
+    def testSignals(self):
+        self.assertCached(False)
+        self.models[0].save()
+        self.assertCached(False)
+        self.models[0].delete()
+        r = self.assertCached(False)
+        self.assertEqual(4, len(r))
+
+    def testManyToManySignal(self):
+        symbol = 'celery_rpc.tests.models:ManyToManyModel'
+        m = factories.ManyToManyModelFactory()
+        with self.assertNumQueries(2):
+            tasks.filter.delay(symbol).get()
+        m.m2m.add(self.models[0])
+        with self.assertNumQueries(2):
+            r = tasks.filter.delay(symbol).get()
+        self.assertEqual([self.models[0].pk], r[0]['m2m'])
+
+    def testChangeTasks(self):
+        """ Bulk changes without signals invalidate cache
+        """
+        self.assertCached(False)
+        data = [{'id': m.pk, 'char': 'bulk'} for m in self.models]
+        tasks.update.delay(self.MODEL_SYMBOL, data, bulk=True).get()
+        r = self.assertCached(False)
+        self.assertEqual(['bulk'] * 5, [i['char'] for i in r])
+
+    def testPipeWithChanges(self):
+        """ Results seen inside transaction of pipe are not cached
+        """
+        kwargs = dict(filters={'pk': self.models[0].pk})
+        self.assertCached(False, **kwargs)
+        p = Client().pipe().update(self.MODEL_SYMBOL,
+                                   {'id': self.models[0].pk, 'char': 'x'})
+        p.filter(self.MODEL_SYMBOL, kwargs=kwargs).run()
+        self.assertEqual('x', self.assertCached(False, **kwargs)[0]['char'])
+        self.assertCached(True, **kwargs)
+
+
+class ReplicaResultCacheTests(SimpleModelTestMixin, TransactionTestCase):
+    """ Cached results are not left stale by replication lag
+    """
+    databases = {'default', 'replica'}
+    # Django < 2.2
+    multi_db = True
+
+    def setUp(self):
+        super(ReplicaResultCacheTests, self).setUp()
+        cache = ModelTask.result_cache
+        patcher = mock.patch.object(cache, 'models',
+                                    {'tests.SimpleModel': None})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(cache.clear)
+
+    def testReplicaReads(self):
+        """ Results read from replica are cached only with finite ttl
+        """
+        conf = tasks.rpc.conf
+        conf.read_database = 'replica'
+        self.addCleanup(setattr, conf, 'read_database', None)
+        cache = ModelTask.result_cache
+        with mock.patch.object(cache, '_set') as store:
+            tasks.filter.delay(self.MODEL_SYMBOL).get()
+        self.assertFalse(store.called)
+        with mock.patch.dict(cache.models, {'tests.SimpleModel': 60}), \
+                mock.patch.object(cache, '_set') as store:
+            tasks.filter.delay(self.MODEL_SYMBOL).get()
+        self.assertTrue(store.called)
+
+    def testChangedDatabase(self):
+        """ Cache is invalidated with database changes were written to
+        """
+        cache = ModelTask.result_cache
+        data = {'id': self.models[0].pk, 'char': 'x'}
+        with mock.patch.object(cache, 'invalidate') as invalidate:
+            tasks.update.delay(self.MODEL_SYMBOL, data,
+                               database='replica').get()
+        invalidate.assert_called_with(SimpleModel, 'replica')
@@ -1,19 +1,27 @@
 from __future__ import absolute_import
+import time
+from datetime import datetime, timedelta
 from random import randint
 from uuid import uuid4
 
+import mock
+from celery import states
+
 from django.core.exceptions import ObjectDoesNotExist
 
 from celery_rpc.tests import factories
 from celery_rpc.tests.utils import (get_model_dict, SimpleModelTestMixin,
                                     get_model_dict_from_list, unpack_exception)
 from django.test import TestCase
-from django.db.models import Q
+from django.db.models import Q, QuerySet
 from rest_framework import serializers
-from .. import tasks
-from ..exceptions import ModelTaskError, remote_exception_registry
+from .. import tasks, utils
+from ..exceptions import (ModelTaskError, remote_exception_registry,
+                          DeadlineExceeded, InvalidCursor)
+from ..base import ModelTask
 from ..tests.tasks import CustomModelTask
-from .models import SimpleModel, NonAutoPrimaryKeyModel, PartialUpdateModel
+from .models import (SimpleModel, NonAutoPrimaryKeyModel, PartialUpdateModel,
+                     FkSimpleModel)
 
 
 class BaseTaskTests(SimpleModelTestMixin, TestCase):
@@ -125,6 +133,191 @@ class FilterTaskTests(BaseTaskTests):
         self.assertEquals(['b', 'a'], [item['char'] for item in r.get()])
 
 
+class CursorPaginationTests(BaseTaskTests):
+    """ Filter pages are selected by cursor instead of offset
+    """
+
+    def paginate(self, model=None, **kwargs):
+        kwargs.setdefault('limit', 2)
+        cursor, result = '', []
+        while cursor is not None:
+            self.assertLess(len(result), 100, "Pages are repeated")
+            r = tasks.filter.delay(model or self.MODEL_SYMBOL, cursor=cursor,
+                                   **kwargs).get()
+            self.assertLessEqual(len(r['results']), kwargs['limit'])
+            result.extend(r['results'])
+            cursor = r['cursor']
+        return result
+
+    def testPages(self):
+        r = self.paginate()
+        self.assertEqual(get_model_dict_from_list(self.models), r)
+
+    def testOrdering(self):
+        """ Rows with equal ordering values are ordered by primary key
+        """
+        for i, m in enumerate(self.models):
+            m.char = 'ab'[i % 2]
+            m.save()
+        r = self.paginate(order_by=['-char'])
+        expected = sorted(self.models, key=lambda m: (m.char != 'b', m.pk))
+        self.assertEqual([m.pk for m in expected], [i['id'] for i in r])
+
+    def testConcurrentInsert(self):
+        """ Rows inserted before cursor do not shift next pages
+        """
+        r = tasks.filter.delay(self.MODEL_SYMBOL, cursor='', limit=2,
+                               order_by='char').get()
+        self.MODEL_FACTORY(char='')
+        r = tasks.filter.delay(self.MODEL_SYMBOL, cursor=r['cursor'],
+                               limit=2, order_by='char').get()
+        expected = sorted(self.models, key=lambda m: m.char)[2:4]
+        self.assertEqual([m.pk for m in expected],
+                         [i['id'] for i in r['results']])
+
+    def testDeepPage(self):
+        """ Deep pages are selected by keys instead of offset
+        """
+        r = tasks.filter.delay(self.MODEL_SYMBOL, cursor='', limit=4).get()
+        with self.assertNumQueries(2) as ctx:
+            r = tasks.filter.delay(self.MODEL_SYMBOL, cursor=r['cursor'],
+                                   limit=4).get()
+        self.assertEqual([self.models[4].pk], [i['id'] for i in r['results']])
+        self.assertIsNone(r['cursor'])
+        self.assertNotIn('OFFSET', ctx.captured_queries[0]['sql'])
+
+    def testNullableOrdering(self):
+        """ NULLs of nullable ordering fields follow other values
+        """
+        fk = self.models[0]
+        objs = [factories.FkSimpleModelFactory(fk=fk, char=char)
+                for char in (None, 'a', None, 'b', 'a')]
+        values = sorted(set(o.char for o in objs if o.char is not None))
+        nulls = [o.pk for o in objs if o.char is None]
+        for order_by, values in (('char', values), ('-char', values[::-1])):
+            r = self.paginate(order_by=order_by,
+                              model='celery_rpc.tests.models:FkSimpleModel')
+            expected = [o.pk for v in values for o in objs if o.char == v]
+            self.assertEqual(expected + nulls, [i['id'] for i in r])
+
+        chunks = tasks.filter.delay(
+            'celery_rpc.tests.models:FkSimpleModel', chunk_size=2,
+            order_by='char').get()
+        self.assertEqual(3, chunks)
+
+    def testMicroseconds(self):
+        """ Datetime values are not truncated by cursor
+        """
+        base = self.models[0].datetime.replace(microsecond=0)
+        for i, m in enumerate(self.models):
+            m.datetime = base + timedelta(microseconds=10 * i + 1)
+            m.save()
+        r = self.paginate(order_by=['datetime'])
+        self.assertEqual([m.pk for m in self.models], [i['id'] for i in r])
+
+    def testInvalidCursor(self):
+        r = tasks.filter.delay(self.MODEL_SYMBOL, cursor='', limit=1).get()
+        for cursor in ('garbage', r['cursor']):
+            with self.assertRaises(Exception) as ctx:
+                with unpack_exception():
+                    tasks.filter.delay(self.MODEL_SYMBOL, cursor=cursor,
+                                       order_by='char').get()
+            self.assertIsInstance(ctx.exception, InvalidCursor)
+
+
+class ChunkedFilterTests(BaseTaskTests):
+    """ Filter result is stored into result backend by chunks
+    """
+
+    def testChunks(self):
+        # keys and rows of each chunk
+        with self.assertNumQueries(6):
+            r = tasks.filter.delay(self.MODEL_SYMBOL, chunk_size=2)
+            self.assertEqual(3, r.get())
+        chunks = [tasks.rpc.AsyncResult(utils.chunk_id(r.id, i)).get()
+                  for i in range(3)]
+        self.assertEqual([True, True, False], [c['more'] for c in chunks])
+        self.assertEqual(get_model_dict_from_list(self.models),
+                         [row for c in chunks for row in c['rows']])
+
+    def testUnsupportedBackend(self):
+        with mock.patch('celery_rpc.base.can_store_chunks',
+                        return_value=False):
+            with self.assertRaises(Exception) as ctx:
+                with unpack_exception():
+                    tasks.filter.delay(self.MODEL_SYMBOL, chunk_size=2).get()
+        self.assertIsInstance(ctx.exception, ModelTaskError)
+
+    def testCancelled(self):
+        """ Storing of chunks stops when client abandons result
+        """
+        task_id = str(uuid4())
+        tasks.rpc.backend.store_result(utils.chunks_cancel_id(task_id), True,
+                                       states.SUCCESS)
+        r = tasks.filter.apply_async((self.MODEL_SYMBOL, ),
+                                     {'chunk_size': 2}, task_id=task_id)
+        self.assertEqual(1, r.get())
+        for key in (utils.chunk_id(task_id, 0),
+                    utils.chunks_cancel_id(task_id)):
+            self.assertEqual(states.PENDING,
+                             tasks.rpc.AsyncResult(key).state)
+
+
+class AggregateTaskTests(BaseTaskTests):
+    """ Counting and aggregation are performed by database
+    """
+    AGGREGATE_SYMBOL = 'celery_rpc.tests.models:PartialUpdateModel'
+
+    def setUp(self):
+        super(AggregateTaskTests, self).setUp()
+        for f1, f2 in ((1, 10), (1, 20), (2, 30)):
+            PartialUpdateModel.objects.create(f1=f1, f2=f2)
+
+    def testCount(self):
+        r = tasks.count.delay(self.MODEL_SYMBOL,
+                              exclude={'pk': self.models[0].pk})
+        self.assertEqual(4, r.get())
+        r = tasks.count.delay(self.MODEL_SYMBOL,
+                              filters_Q=Q(pk__lte=self.models[1].pk))
+        self.assertEqual(2, r.get())
+
+    def testExists(self):
+        r = tasks.exists.delay(self.MODEL_SYMBOL,
+                               filters={'pk': self.models[0].pk})
+        self.assertIs(True, r.get())
+        r = tasks.exists.delay(self.MODEL_SYMBOL, filters={'pk': -1})
+        self.assertIs(False, r.get())
+
+    def testAggregate(self):
+        with self.assertNumQueries(1):
+            r = tasks.aggregate.delay(
+                self.AGGREGATE_SYMBOL,
+                {'total': ['Sum', 'f2'], 'low': ['Min', 'f2'],
+                 'kinds': ['Count', 'f1', {'distinct': True}]},
+                filters={'f2__gt': 10}).get()
+        self.assertEqual({'total': 50, 'low': 20, 'kinds': 2}, r)
+
+    def testGroupBy(self):
+        r = tasks.aggregate.delay(self.AGGREGATE_SYMBOL,
+                                  {'total': ['Sum', 'f2'], 'n': ['Count', 'pk']},
+                                  group_by='f1').get()
+        self.assertEqual([{'f1': 1, 'total': 30, 'n': 2},
+                          {'f1': 2, 'total': 30, 'n': 1}], r)
+        r = tasks.aggregate.delay(self.AGGREGATE_SYMBOL,
+                                  {'total': ['Max', 'f2']}, group_by=['f1'],
+                                  order_by='-total', limit=1).get()
+        self.assertEqual([{'f1': 2, 'total': 30}], r)
+
+    def testInvalidAggregate(self):
+        for aggregates in ({}, {'a': ['eval', 'f1']}, {'a': 'Sum'},
+                           {'a': ['Sum', 'f1', {'filter': 1}]}):
+            with self.assertRaises(Exception) as ctx:
+                with unpack_exception():
+                    tasks.aggregate.delay(self.AGGREGATE_SYMBOL,
+                                          aggregates).get()
+            self.assertIsInstance(ctx.exception, ModelTaskError)
+
+
 class SimpleTaskSerializer(serializers.ModelSerializer):
     """ Test serializer
     """
@@ -133,6 +326,68 @@ class SimpleTaskSerializer(serializers.ModelSerializer):
         fields = ('id', )
 
 
+class UpperCreateSerializer(serializers.ModelSerializer):
+    """ Test serializer with custom create()
+    """
+    class Meta:
+        model = SimpleModel
+        fields = ('id', 'char')
+
+    def create(self, validated_data):
+        validated_data['char'] = validated_data['char'].upper()
+        return super(UpperCreateSerializer, self).create(validated_data)
+
+
+class SerializerClassCacheTests(BaseTaskTests):
+    """ Generated serializer classes are reused by requests
+    """
+
+    def setUp(self):
+        super(SerializerClassCacheTests, self).setUp()
+        self.cache = tasks.filter.serializer_classes
+        self.cache.clear()
+        self.addCleanup(self.cache.clear)
+
+    def filter(self, **kwargs):
+        with mock.patch.object(ModelTask, '_build_serializer_class',
+                               wraps=ModelTask._build_serializer_class
+                               ) as build:
+            r = tasks.filter.delay(self.MODEL_SYMBOL, **kwargs).get()
+        return r, build.call_count
+
+    def testCached(self):
+        _, built = self.filter()
+        self.assertEqual(1, built)
+        r, built = self.filter()
+        self.assertEqual(0, built)
+        self.assertEqual(5, len(r))
+        self.assertEqual(1, self.cache.stats['hits'])
+        self.assertEqual(1, self.cache.stats['misses'])
+
+    def testFields(self):
+        """ Requests with different fields use different classes
+        """
+        r, built = self.filter(fields=['char'])
+        self.assertEqual(1, built)
+        self.assertEqual(['char'], list(r[0]))
+        r, built = self.filter(fields=('id',))
+        self.assertEqual(1, built)
+        self.assertEqual(['id'], list(r[0]))
+        r, built = self.filter()
+        self.assertEqual(1, built)
+        self.assertEqual(['id', 'char', 'datetime'], list(r[0]))
+
+    def testBaseSerializerNotChanged(self):
+        """ Fields of request do not affect custom serializer
+        """
+        serializer_cls = "{}:{}".format(SimpleTaskSerializer.__module__,
+                                        SimpleTaskSerializer.__name__)
+        self.filter(serializer_cls=serializer_cls, fields=['char'])
+        self.assertEqual(('id', ), SimpleTaskSerializer.Meta.fields)
+        r, _ = self.filter(serializer_cls=serializer_cls)
+        self.assertEqual(['id'], list(r[0]))
+
+
 class SingleObjectsDoesNotExistMixin(object):
     """ Checks behavior of tasks, which modify existing objects.
     """
@@ -244,6 +499,82 @@ class UpdateTaskTests(SingleObjectsDoesNotExistMixin, BaseTaskTests):
         return self.testNoValidSerializer()
 
 
+class BulkUpdateTaskTests(BaseTaskTests):
+    """ Updating of several objects matched by identity
+    """
+
+    task = tasks.update
+
+    def changes(self, models=None):
+        return [{'id': m.pk, 'char': str(uuid4())}
+                for m in reversed(models or self.models)]
+
+    def assertUpdated(self, expected, result):
+        self.assertEquals([e['id'] for e in expected], [r['id'] for r in result])
+        self.assertEquals([e['char'] for e in expected],
+                          [r['char'] for r in result])
+        for e in expected:
+            self.assertEquals(e['char'], SimpleModel.objects.get(pk=e['id']).char)
+
+    def testMatchByIdentity(self):
+        """ Objects are matched by identity and returned in order of data
+        """
+        expected = self.changes()
+        with self.assertNumQueries(1 + len(expected)):
+            r = self.task.delay(self.MODEL_SYMBOL, expected).get()
+        self.assertUpdated(expected, r)
+
+    def testBulkUpdate(self):
+        expected = self.changes()
+        with self.assertNumQueries(2):
+            r = self.task.delay(self.MODEL_SYMBOL, expected, bulk=True).get()
+        self.assertUpdated(expected, r)
+
+    @mock.patch('celery_rpc.base.HAS_BULK_UPDATE', False)
+    def testBulkUpdateNotSupported(self):
+        """ Objects are saved one by one without QuerySet.bulk_update()
+        """
+        expected = self.changes()
+        with self.assertNumQueries(1 + len(expected)):
+            r = self.task.delay(self.MODEL_SYMBOL, expected, bulk=True).get()
+        self.assertUpdated(expected, r)
+
+    def testBatchSize(self):
+        expected = self.changes()
+        with self.assertNumQueries(4):
+            r = self.task.delay(self.MODEL_SYMBOL, expected, bulk=True,
+                                batch_size=2).get()
+        self.assertUpdated(expected, r)
+
+    def testIdentity(self):
+        """ Objects are matched by custom identity field
+        """
+        expected = [{'char': m.char, 'datetime': '2020-01-01T00:00:00'}
+                    for m in self.models[:2]]
+        r = self.task.delay(self.MODEL_SYMBOL, expected, bulk=True,
+                            identity='char').get()
+        self.assertEquals([m.pk for m in self.models[:2]],
+                          [i['id'] for i in r])
+        self.assertEquals(2, SimpleModel.objects.filter(
+            datetime=datetime(2020, 1, 1)).count())
+
+    def testMissing(self):
+        expected = self.changes(self.models[:2])
+        expected[0]['id'] += 1000
+        with self.assertRaises(RuntimeError):
+            with unpack_exception():
+                self.task.delay(self.MODEL_SYMBOL, expected, bulk=True).get()
+
+    def testCustomSave(self):
+        """ Objects of model with custom save() are saved one by one
+        """
+        model = 'celery_rpc.tests.models:CustomSaveModel'
+        objs = tasks.create.delay(model, [{'char': 'a'}, {'char': 'b'}]).get()
+        r = self.task.delay(model, [{'id': o['id'], 'char': 'c'} for o in objs],
+                            bulk=True).get()
+        self.assertEquals(['C', 'C'], [i['char'] for i in r])
+
+
 class GetSetTaskTests(SingleObjectsDoesNotExistMixin, BaseTaskTests):
 
     task = tasks.getset
@@ -347,6 +678,60 @@ class CreateTaskTests(BaseTaskTests):
         return self.testSingleObjectAlreadyExist()
 
 
+class BulkCreateTaskTests(BaseTaskTests):
+    """ Creating of several objects with bulk INSERT queries
+    """
+
+    task = tasks.create
+
+    def create(self, data, model=None, **kwargs):
+        return self.task.delay(model or self.MODEL_SYMBOL, data, bulk=True,
+                               **kwargs).get()
+
+    def testBulkCreate(self):
+        data = [{'char': str(i)} for i in range(10)]
+        with self.assertNumQueries(1):
+            r = self.create(data)
+        self.assertEquals([d['char'] for d in data], [i['char'] for i in r])
+        for item in r:
+            self.assertEquals(item['char'],
+                              SimpleModel.objects.get(pk=item['id']).char)
+
+    def testBatchSize(self):
+        data = [{'char': str(i)} for i in range(10)]
+        with self.assertNumQueries(4):
+            self.create(data, batch_size=3)
+        self.assertEquals(10, SimpleModel.objects.filter(
+            char__in=[d['char'] for d in data]).count())
+
+    def testCustomCreate(self):
+        """ Objects are created one by one by serializer with custom create()
+        """
+        r = self.create([{'char': 'a'}, {'char': 'b'}],
+                        serializer_cls='celery_rpc.tests.test_tasks:'
+                                       'UpperCreateSerializer')
+        self.assertEquals(['A', 'B'], [i['char'] for i in r])
+        self.assertEquals(2, SimpleModel.objects.filter(
+            char__in=['A', 'B']).count())
+
+    def testValidationError(self):
+        """ Nothing is created if some object is invalid
+        """
+        data = [{'char': 'a'}, {'char': 'x' * 100}]
+        with self.assertRaises(ModelTaskError):
+            with unpack_exception():
+                self.create(data)
+        self.assertEquals(0, SimpleModel.objects.filter(char='a').count())
+
+    def testCustomSave(self):
+        """ Objects of model with custom save() are saved one by one
+        """
+        r = self.create([{'char': 'a'}, {'char': 'b'}],
+                        model='celery_rpc.tests.models:CustomSaveModel')
+        self.assertEquals(['A', 'B'], [i['char'] for i in r])
+        self.assertTrue(all(i['id'] for i in r))
+
+
 class UpdateOrCreateTaskTests(CreateTaskTests, UpdateTaskTests):
 
     task = tasks.update_or_create
@@ -379,6 +764,162 @@ class DeleteTaskTests(SingleObjectsDoesNotExistMixin, BaseTaskTests):
         self.assertEquals(0, SimpleModel.objects.filter(id__in=ids).count())
 
 
+class UpsertTaskTests(BaseTaskTests):
+    """ Bulk update of existing and creation of missing objects
+    """
+
+    task = tasks.update_or_create
+
+    def upsert(self, data, model=None, **kwargs):
+        return self.task.delay(model or self.MODEL_SYMBOL, data, bulk=True,
+                               **kwargs).get()
+
+    def testUpsert(self):
+        """ Existing objects are updated and missing are created in order of
+        data
+        """
+        data = [{'id': self.models[1].pk, 'char': 'b'},
+                {'char': 'new'},
+                {'id': self.models[0].pk, 'char': 'a'}]
+        # savepoint, select, update, insert, release savepoint
+        with self.assertNumQueries(5):
+            r = self.upsert(data)
+        self.assertEquals(['b', 'new', 'a'], [i['char'] for i in r])
+        self.assertEquals(self.models[1].pk, r[0]['id'])
+        self.assertEquals(self.models[0].pk, r[2]['id'])
+        self.assertEquals('new', SimpleModel.objects.get(pk=r[1]['id']).char)
+        self.assertEquals('a', SimpleModel.objects.get(
+            pk=self.models[0].pk).char)
+        self.assertEquals(6, SimpleModel.objects.count())
+
+    def testCustomCreate(self):
+        """ Missing objects are created by serializer with custom create()
+        """
+        data = [{'id': self.models[0].pk, 'char': 'a'}, {'char': 'new'}]
+        r = self.upsert(data, serializer_cls='celery_rpc.tests.test_tasks:'
+                                             'UpperCreateSerializer')
+        self.assertEquals(['a', 'NEW'], [i['char'] for i in r])
+        self.assertEquals('NEW', SimpleModel.objects.get(pk=r[1]['id']).char)
+
+    def testIdentity(self):
+        """ Objects are matched by custom identity field
+        """
+        model = 'celery_rpc.tests.models:PartialUpdateModel'
+        m = factories.PartialUpdateModelFactory(f1=1, f2=1)
+        r = self.upsert([{'f1': 1, 'f2': 10}, {'f1': 2, 'f2': 20}],
+                        model=model, identity='f1')
+        self.assertEquals(m.pk, r[0]['id'])
+        self.assertEquals(10, PartialUpdateModel.objects.get(pk=m.pk).f2)
+        self.assertEquals(20, PartialUpdateModel.objects.get(f1=2).f2)
+
+    def testCustomSave(self):
+        """ Objects of model with custom save() are saved one by one
+        """
+        model = 'celery_rpc.tests.models:CustomSaveModel'
+        obj = tasks.create.delay(model, {'char': 'a'}).get()
+        r = self.upsert([{'id': obj['id'], 'char': 'b'}, {'char': 'c'}],
+                        model=model)
+        self.assertEquals(obj['id'], r[0]['id'])
+        self.assertEquals(['B', 'C'], [i['char'] for i in r])
+
+    @mock.patch('celery_rpc.base.HAS_BULK_UPDATE', False)
+    def testBulkUpdateNotSupported(self):
+        """ Objects are saved one by one without QuerySet.bulk_update()
+        """
+        data = [{'id': self.models[0].pk, 'char': 'a'}, {'char': 'new'}]
+        # savepoint, select, update, insert, release savepoint
+        with self.assertNumQueries(5):
+            r = self.upsert(data)
+        self.assertEquals(['a', 'new'], [i['char'] for i in r])
+        self.assertEquals(self.models[0].pk, r[0]['id'])
+        self.assertEquals('a', SimpleModel.objects.get(
+            pk=self.models[0].pk).char)
+
+    def testNativeUpsert(self):
+        """ Native upsert is used only if data has all required fields
+        """
+        from django.db import connection
+        model = 'celery_rpc.tests.models:PartialUpdateModel'
+        m = factories.PartialUpdateModelFactory(f1=1, f2=1)
+        with mock.patch.object(connection.features,
+                               'supports_update_conflicts_with_target',
+                               True, create=True), \
+                mock.patch.object(QuerySet, 'bulk_create') as bulk_create:
+            r = self.upsert([{'id': m.pk, 'f2': 2}], model=model)
+            self.assertFalse(bulk_create.called)
+            self.assertEquals(2, r[0]['f2'])
+
+            self.upsert([{'id': m.pk, 'f1': 3, 'f2': 3}], model=model)
+        bulk_create.assert_called_once_with(
+            mock.ANY, batch_size=mock.ANY, update_conflicts=True,
+            ignore_conflicts=False, unique_fields=['id'],
+            update_fields=['f1', 'f2'])
+
+    def testNativeUpsertNotSupported(self):
+        """ Fallback is used if database does not support upsert
+        """
+        from django.db import connection
+        with mock.patch.object(connection.features,
+                               'supports_update_conflicts_with_target',
+                               False, create=True):
+            r = self.upsert([{'id': self.models[0].pk, 'char': 'x'}])
+        self.assertEquals('x', r[0]['char'])
+
+
+class BulkDeleteTaskTests(BaseTaskTests):
+    """ Set-based deleting of several objects
+    """
+
+    task = tasks.delete
+    PARTIAL_SYMBOL = 'celery_rpc.tests.models:PartialUpdateModel'
+
+    def delete(self, models, model=None, **kwargs):
+        data = [{'id': m.pk} for m in models]
+        return self.task.delay(model or self.MODEL_SYMBOL, data, bulk=True,
+                               **kwargs).get()
+
+    def testBulkDelete(self):
+        r = self.delete(self.models[:3])
+        self.assertEquals(3, r)
+        self.assertEquals(2, SimpleModel.objects.count())
+
+    def testBatchSize(self):
+        models = factories.PartialUpdateModelFactory.create_batch(5)
+        # savepoint, 3 deletes, release savepoint
+        with self.assertNumQueries(5):
+            r = self.delete(models, model=self.PARTIAL_SYMBOL, batch_size=2)
+        self.assertEquals(5, r)
+        self.assertEquals(0, PartialUpdateModel.objects.count())
+
+    def testMissing(self):
+        """ Number of actually deleted rows is returned
+        """
+        SimpleModel.objects.filter(pk=self.models[0].pk).delete()
+        self.assertEquals(1, self.delete(self.models[:2]))
+
+    def testRaw(self):
+        """ Delete signals are not sent in raw mode
+        """
+        models = factories.PartialUpdateModelFactory.create_batch(3)
+        with mock.patch('django.db.models.signals.pre_delete.send') as send:
+            with mock.patch('django.db.models.signals.pre_delete.has_listeners',
+                            return_value=True):
+                with self.assertNumQueries(3):
+                    r = self.delete(models[:2], model=self.PARTIAL_SYMBOL,
+                                    raw=True)
+        self.assertEquals(2, r)
+        self.assertFalse(send.called)
+        self.assertEquals(1, PartialUpdateModel.objects.count())
+
+    def testRawCascade(self):
+        """ Raw mode is ignored if other rows depend on deleted ones
+        """
+        fk = factories.FkSimpleModelFactory(fk=self.models[0])
+        r = self.delete(self.models[:1], raw=True)
+        self.assertEquals(2, r)
+        self.assertFalse(FkSimpleModel.objects.filter(pk=fk.pk).exists())
+
+
 def plus(a, b):
     return a + b
 
@@ -394,6 +935,80 @@ class CallTaskTests(TestCase):
         self.assertEquals(expected, r.get())
 
 
+class CallManyTaskTests(TestCase):
+
+    def testCallMany(self):
+        """ Function is called for each pair of args and kwargs
+        """
+        r = tasks.call_many.delay('celery_rpc.tests.test_tasks:plus',
+                                  [[[1, 2], None], [[3], {'b': 4}]])
+        self.assertEquals([[True, 3], [True, 7]], r.get())
+
+    def testCallManyErrors(self):
+        """ Errors are returned per call, other calls are performed
+        """
+        r = tasks.call_many.delay('celery_rpc.tests.test_tasks:plus',
+                                  [[[1], None], [[1, 2], None], ["a", None]])
+        result = r.get()
+        self.assertEquals([False, True, False], [ok for ok, _ in result])
+        self.assertEquals(3, result[1][1])
+        serializer = tasks.rpc.conf['result_serializer']
+        exc = remote_exception_registry.unpack_exception(result[0][1],
+                                                         serializer)
+        self.assertIsInstance(exc, TypeError)
+        exc = remote_exception_registry.unpack_exception(result[2][1],
+                                                         serializer)
+        self.assertRegexpMatches(str(exc), "Invalid type of 'args'")
+
+    def testCallManyResolvesFunctionOnce(self):
+        """ Function is imported once for all calls
+        """
+        with mock.patch('celery_rpc.base.FunctionTask._import_function',
+                        return_value=plus) as import_function:
+            r = tasks.call_many.delay('celery_rpc.tests.test_tasks:plus',
+                                      [[[i, i], None] for i in range(10)])
+            r.get()
+        self.assertEqual(1, import_function.call_count)
+
+
+def remaining_time():
+    from celery import current_task
+    return current_task.remaining_time
+
+
+class DeadlineTests(TestCase):
+    """ Server skips requests which client has stopped waiting for
+    """
+
+    def testExpired(self):
+        r = tasks.call.apply(('celery_rpc.tests.test_tasks:plus', [1, 2], None),
+                             headers={'deadline': time.time() - 1})
+        with self.assertRaises(Exception) as ctx:
+            with unpack_exception():
+                r.get()
+        self.assertIsInstance(ctx.exception, DeadlineExceeded)
+
+    def testRemainingTime(self):
+        """ Remaining time of request is available to tasks
+        """
+        r = tasks.call.apply(
+            ('celery_rpc.tests.test_tasks:remaining_time', [], None),
+            headers={'deadline': time.time() + 5})
+        self.assertTrue(0 < r.get() <= 5)
+
+    def testNoDeadline(self):
+        r = tasks.call.apply(
+            ('celery_rpc.tests.test_tasks:remaining_time', [], None))
+        self.assertIsNone(r.get())
+
+    def testDisabled(self):
+        tasks.rpc.conf.check_deadline = False
+        self.addCleanup(setattr, tasks.rpc.conf, 'check_deadline', True)
+        r = tasks.call.apply(('celery_rpc.tests.test_tasks:plus', [1, 2], None),
+                             headers={'deadline': time.time() - 1})
+        self.assertEqual(3, r.get())
+
+
 class OverrideTaskTests(TestCase):
     """ Check if base task class overriding is worked.
     """
@@ -0,0 +1,149 @@
+from __future__ import absolute_import
+
+from decimal import Decimal
+
+from django.test import TestCase
+from rest_framework import serializers
+
+from .. import tasks
+from ..base import ModelTask
+from ..codecs import x_rpc_json_dumps
+from ..values import ValuesSerializer
+from . import factories
+from .models import FileModel, SimpleModel, FkSimpleModel, ManyToManyModel
+
+
+class ValuesSerializationTests(TestCase):
+    """ Filter results serialized from values() are identical to results of
+    model serializer
+    """
+
+    def setUp(self):
+        super(ValuesSerializationTests, self).setUp()
+        self.models = factories.SimpleModelFactory.create_batch(3)
+        factories.FkSimpleModelFactory(fk=self.models[0], char=None)
+        factories.FkSimpleModelFactory(fk=self.models[1], char='fk')
+        factories.ManyToManyModelFactory(m2m=[self.models[2], self.models[0]])
+        factories.ManyToManyModelFactory(m2m=[])
+        factories.NonAutoPrimaryKeyModelFactory(id=10)
+        ModelTask.values_serializers.clear()
+
+    def filter(self, model, values_serialization, **kwargs):
+        conf = tasks.rpc.conf
+        old = conf.values_serialization
+        conf.values_serialization = values_serialization
+        try:
+            return tasks.filter.delay(model, **kwargs).get()
+        finally:
+            conf.values_serialization = old
+
+    def assertIdentical(self, model, **kwargs):
+        expected = self.filter(model, False, **kwargs)
+        with self.assertNumQueries(1):
+            # rows are requested once (m2m adds one query per field)
+            self.filter(model, True, **dict(kwargs, fields=['id']))
+        result = self.filter(model, True, **kwargs)
+        self.assertTrue(expected)
+        self.assertEqual(x_rpc_json_dumps(expected), x_rpc_json_dumps(result))
+        return result
+
+    def testSimple(self):
+        """ Dates and strings
+        """
+        self.assertIdentical('celery_rpc.tests.models:SimpleModel')
+
+    def testForeignKey(self):
+        """ Foreign keys and null values
+        """
+        self.assertIdentical('celery_rpc.tests.models:FkSimpleModel')
+
+    def testManyToMany(self):
+        with self.assertNumQueries(2):
+            self.filter('celery_rpc.tests.models:ManyToManyModel', True)
+        r = self.assertIdentical('celery_rpc.tests.models:ManyToManyModel')
+        self.assertEqual([self.models[0].pk, self.models[2].pk], r[0]['m2m'])
+        self.assertEqual([], r[1]['m2m'])
+
+    def testNonAutoPrimaryKey(self):
+        self.assertIdentical('celery_rpc.tests.models:NonAutoPrimaryKeyModel')
+
+    def testFields(self):
+        self.assertIdentical('celery_rpc.tests.models:FkSimpleModel',
+                             fields=['fk', 'char'])
+
+    def testOrderAndFilters(self):
+        self.assertIdentical('celery_rpc.tests.models:SimpleModel',
+                             filters={'pk__in': [m.pk for m in self.models]},
+                             order_by='-char', offset=1, limit=1)
+
+    def testCustomSerializerNotUsed(self):
+        """ Custom serializers are always used as is
+        """
+        serializer_cls = 'celery_rpc.tests.test_tasks:SimpleTaskSerializer'
+        self.filter('celery_rpc.tests.models:SimpleModel', True,
+                    serializer_cls=serializer_cls)
+        self.assertEqual(0, len(ModelTask.values_serializers))
+
+    def testUnsupportedFields(self):
+        """ Serializers with computed or nested fields are not supported
+        """
+
+        class MethodSerializer(serializers.ModelSerializer):
+            double = serializers.SerializerMethodField()
+
+            class Meta:
+                model = SimpleModel
+                fields = ('id', 'double')
+
+            def get_double(self, obj):
+                return obj.char * 2
+
+        class NestedSerializer(serializers.ModelSerializer):
+            class Meta:
+                model = FkSimpleModel
+                fields = '__all__'
+                depth = 1
+
+        class DottedSourceSerializer(serializers.ModelSerializer):
+            fk_char = serializers.CharField(source='fk.char')
+
+            class Meta:
+                model = FkSimpleModel
+                fields = ('id', 'fk_char')
+
+        for serializer_class in (MethodSerializer, NestedSerializer,
+                                 DottedSourceSerializer):
+            self.assertIsNone(ValuesSerializer.build(serializer_class))
+
+    def testConvertedFields(self):
+        """ Models with file fields and fields converting database values are
+        serialized from instances
+        """
+        FileModel.objects.create(file='files/a.txt', upper='a')
+        FileModel.objects.create(file='', upper='b')
+        model = 'celery_rpc.tests.models:FileModel'
+        expected = self.filter(model, False)
+        self.assertEqual(expected, self.filter(model, True))
+        self.assertEqual('A', expected[0]['upper'])
+        self.assertTrue(expected[0]['file'].endswith('files/a.txt'))
+        serializer_class = ModelTask.get_serializer_class(
+            FileModel, serializers.ModelSerializer)
+        self.assertIsNone(ValuesSerializer.build(serializer_class))
+
+    def testDecimal(self):
+        """ Values are converted by serializer fields
+        """
+
+        class DecimalSerializer(serializers.ModelSerializer):
+            id = serializers.DecimalField(max_digits=5, decimal_places=2)
+
+            class Meta:
+                model = ManyToManyModel
+                fields = ('id', )
+
+        r = ValuesSerializer.build(DecimalSerializer).serialize(
+            ManyToManyModel.objects.order_by('pk'))
+        self.assertEqual(
+            [str(Decimal(o.pk).quantize(Decimal('0.01')))
+             for o in ManyToManyModel.objects.order_by('pk')],
+            [i['id'] for i in r])
@@ -0,0 +1,111 @@
+from __future__ import absolute_import
+
+import mock
+from celery.signals import worker_process_init, worker_ready
+from django.test import TestCase
+from rest_framework import serializers
+
+from ..app import install_warm_up, rpc
+from ..base import ModelTask, RpcTask
+from ..resources import ResourceMap
+from ..warmup import warm_up
+from .models import SimpleModel
+from .test_tasks import SimpleTaskSerializer
+
+
+class WarmUpTests(TestCase):
+    """ Warm-up of worker process
+    """
+
+    def setUp(self):
+        super(WarmUpTests, self).setUp()
+        self.configure(
+            warmup_models=['celery_rpc.tests.models:SimpleModel'],
+            warmup_serializers=['celery_rpc.tests.test_tasks:'
+                                'SimpleTaskSerializer'],
+            warmup_functions=['celery_rpc.tests.test_tasks:plus'],
+            warmup_databases=['default'])
+        ModelTask.serializer_classes.clear()
+        self.addCleanup(ModelTask.serializer_classes.clear)
+        patcher = mock.patch.object(RpcTask, 'resources', ResourceMap())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def configure(self, **options):
+        for name, value in options.items():
+            self.addCleanup(setattr, rpc.conf, name, rpc.conf[name])
+            setattr(rpc.conf, name, value)
+
+    def testWarmUp(self):
+        """ Configured items are prepared and timed
+        """
+        timings = warm_up(rpc)
+        kinds = [kind for kind, _, _ in timings]
+        self.assertEqual(
+            ['resources', 'model', 'serializer', 'function', 'database'],
+            kinds[:5])
+        self.assertEqual({'codec'}, set(kinds[5:]))
+        # model, serializer and function
+        self.assertEqual(3, RpcTask.resources.stats['size'])
+        cached = ModelTask.serializer_classes
+        self.assertEqual(2, cached.stats['size'])
+        self.assertIsNotNone(cached.get(
+            (SimpleModel, serializers.ModelSerializer, None, 'id')))
+        self.assertIsNotNone(cached.get(
+            (SimpleModel, SimpleTaskSerializer, None, 'id')))
+
+    def testFailedItem(self):
+        """ Failed item does not stop warm-up
+        """
+        self.configure(warmup_models=['celery_rpc.tests.models:Missing'])
+        with mock.patch('celery_rpc.warmup.logger') as logger:
+            timings = warm_up(rpc)
+        self.assertTrue(logger.exception.called)
+        self.assertIn('function', [kind for kind, _, _ in timings])
+
+    def testUnknownDatabase(self):
+        self.configure(warmup_databases=['missing', 'default'])
+        with mock.patch('celery_rpc.warmup.logger') as logger:
+            timings = warm_up(rpc)
+        self.assertTrue(logger.exception.called)
+        self.assertEqual(['default'], [name for kind, name, _ in timings
+                                       if kind == 'database'])
+
+    def install(self, pool_cls):
+        """ Connect warm-up like on start of worker with pool
+        """
+        for signal in (worker_process_init, worker_ready):
+            self.addCleanup(signal.disconnect,
+                            dispatch_uid='celery_rpc.warm_up')
+        install_warm_up(sender=mock.Mock(pool_cls=pool_cls))
+
+    def testSignal(self):
+        """ Warm-up is performed on worker process start after handlers
+        connected before (i.e. closing of database connections by Celery
+        Django fixup)
+        """
+        calls = []
+
+        def close_connections(**kwargs):
+            calls.append('close')
+
+        worker_process_init.connect(close_connections)
+        self.addCleanup(worker_process_init.disconnect, close_connections)
+        self.install('prefork')
+        with mock.patch('celery_rpc.warmup.warm_up',
+                        side_effect=lambda app: calls.append(app)) as warm:
+            worker_ready.send(sender=None)
+            self.assertFalse(warm.called)
+            worker_process_init.send(sender=None)
+        self.assertEqual(['close', rpc], calls)
+
+    def testSoloPool(self):
+        """ Warm-up is performed in worker process if pool does not start
+        child processes
+        """
+        self.install('solo')
+        with mock.patch('celery_rpc.warmup.warm_up') as warm:
+            worker_process_init.send(sender=None)
+            self.assertFalse(warm.called)
+            worker_ready.send(sender=None)
+        warm.assert_called_once_with(rpc)
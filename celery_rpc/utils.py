@@ -2,6 +2,7 @@
 
 import six
 from celery import Celery
+from celery.backends.base import BaseBackend, BaseKeyValueStoreBackend
 from kombu import Queue, utils
 from six.moves import reduce
 
@@ -44,12 +45,16 @@ def symbol_by_name(name):
 
 
 FILTER_TASK_NAME = 'celery_rpc.filter'
+COUNT_TASK_NAME = 'celery_rpc.count'
+EXISTS_TASK_NAME = 'celery_rpc.exists'
+AGGREGATE_TASK_NAME = 'celery_rpc.aggregate'
 UPDATE_TASK_NAME = 'celery_rpc.update'
 GETSET_TASK_NAME = 'celery_rpc.getset'
 UPDATE_OR_CREATE_TASK_NAME = 'celery_rpc.update_or_create'
 CREATE_TASK_NAME = 'celery_rpc.create'
 DELETE_TASK_NAME = 'celery_rpc.delete'
 CALL_TASK_NAME = 'celery_rpc.call'
+CALL_MANY_TASK_NAME = 'celery_rpc.call_many'
 PIPE_TASK_NAME = 'celery_rpc.pipe'
 TRANSLATE_TASK_NAME = 'celery_rpc.translate'
 RESULT_TASK_NAME = 'celery_rpc.result'
@@ -59,6 +64,26 @@ TASK_NAME_MAP = {n: v for n, v in locals().items() if n.endswith('_TASK_NAME')}
 DEFAULT_EXC_SERIALIZER = 'json'
 
 
+def chunk_id(task_id, index):
+    """ Result backend key of chunk of result delivered by chunks.
+    """
+    return '{}.chunk.{}'.format(task_id, index)
+
+
+def can_store_chunks(backend):
+    """ Check if result backend stores results by arbitrary keys, as
+    delivery of result by chunks requires (rpc:// sends results to reply
+    queue of request instead).
+    """
+    return isinstance(backend, (BaseKeyValueStoreBackend, BaseBackend))
+
+
+def chunks_cancel_id(task_id):
+    """ Result backend key of mark of abandoned result delivered by chunks.
+    """
+    return '{}.chunks.cancel'.format(task_id)
+
+
 def unpack_exception(error, wrap_errors, serializer=DEFAULT_EXC_SERIALIZER):
     """ Extracts original error from RemoteException description
     :param error: remote exception stub (or real) instance
@@ -84,6 +109,9 @@ def unpack_exception(error, wrap_errors, serializer=DEFAULT_EXC_SERIALIZER):
 def unproxy(errors):
     """ removes ugettext_lazy proxy from ValidationError structure to allow
     errors to be serialized with JSON encoder."""
+    if isinstance(errors, list):
+        # list serializer errors: dict of errors for each item
+        return [unproxy(e) for e in errors]
     for k, v in errors.items():
         unproxied = []
         for i in v:
@@ -0,0 +1,133 @@
+# coding: utf-8
+""" Fast serialization of querysets by rows fetched with QuerySet.values().
+"""
+from __future__ import absolute_import
+
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import FileField
+from rest_framework.relations import (ManyRelatedField, PKOnlyObject,
+                                      PrimaryKeyRelatedField, RelatedField)
+from rest_framework.serializers import BaseSerializer, SerializerMethodField
+
+
+class ValuesSerializer(object):
+    """ Serializes querysets like model serializer does, but without model
+    instances: rows are fetched with QuerySet.values() and each column is
+    converted by `to_representation()` of matching serializer field.
+
+    Many-to-many values are fetched by one extra query per field.
+    Use `build()` to check if serializer is supported.
+    """
+
+    # kinds of fields
+    VALUE, PK, M2M = 'value', 'pk', 'm2m'
+
+    def __init__(self, model, fields):
+        """
+        :param model: Django model
+        :param fields: list of (kind, serializer field, model field)
+        """
+        self.model = model
+        self.fields = fields
+        self.pk_name = model._meta.pk.name
+        self.columns = [f.source for kind, f, _ in fields if kind != self.M2M]
+        self.m2m = [(f, model_field) for kind, f, model_field in fields
+                    if kind == self.M2M]
+        if self.m2m and self.pk_name not in self.columns:
+            self.columns.append(self.pk_name)
+
+    @classmethod
+    def build(cls, serializer_class):
+        """ Return ValuesSerializer equivalent to model serializer class or
+        None if some of serializer fields are not supported.
+        """
+        model = serializer_class.Meta.model
+        opts = model._meta
+        fields = []
+        for field in serializer_class().fields.values():
+            if field.write_only:
+                continue
+            if (isinstance(field, (BaseSerializer, SerializerMethodField)) or
+                    len(field.source_attrs) != 1):
+                return None
+            try:
+                model_field = opts.get_field(field.source)
+            except FieldDoesNotExist:
+                return None
+            if isinstance(field, ManyRelatedField):
+                # order of related objects is known only without ordering
+                if not (type(field.child_relation) is PrimaryKeyRelatedField and
+                        model_field.many_to_many and model_field.concrete and
+                        not model_field.remote_field.model._meta.ordering):
+                    return None
+                fields.append((cls.M2M, field, model_field))
+            elif isinstance(field, RelatedField):
+                if not (type(field) is PrimaryKeyRelatedField and
+                        model_field.concrete and
+                        (model_field.many_to_one or model_field.one_to_one)):
+                    return None
+                fields.append((cls.PK, field, model_field))
+            elif is_plain_value(model_field):
+                fields.append((cls.VALUE, field, model_field))
+            else:
+                return None
+        return cls(model, fields)
+
+    def serialize(self, queryset):
+        """ Return list of serialized rows of queryset.
+        """
+        rows = list(queryset.values(*self.columns))
+        related = {}
+        if self.m2m and rows:
+            pks = [row[self.pk_name] for row in rows]
+            for field, model_field in self.m2m:
+                related[field.field_name] = self._fetch_m2m(
+                    model_field, pks, queryset.db)
+
+        result = []
+        for row in rows:
+            item = OrderedDict()
+            for kind, field, _ in self.fields:
+                name = field.field_name
+                if kind == self.M2M:
+                    value = related[name].get(row[self.pk_name], ())
+                else:
+                    value = row[field.source]
+                    if value is None:
+                        item[name] = None
+                        continue
+                    if kind == self.PK:
+                        value = PKOnlyObject(value)
+                item[name] = field.to_representation(value)
+            result.append(item)
+        return result
+
+    @staticmethod
+    def _fetch_m2m(model_field, pks, using):
+        """ Return dict {object pk: [PKOnlyObject of related object]}.
+        """
+        through = model_field.remote_field.through
+        source = model_field.m2m_field_name()
+        target = model_field.m2m_reverse_field_name()
+        related = {}
+        # related objects are ordered like in unique index of through table
+        pairs = through._default_manager.using(using).filter(
+            **{source + '__in': pks}).order_by(source, target).values_list(
+            source, target)
+        for pk, related_pk in pairs:
+            related.setdefault(pk, []).append(PKOnlyObject(related_pk))
+        return related
+
+
+def is_plain_value(model_field):
+    """ Check if column value is serialized as is.
+
+    Values of file fields are wrapped by model into File objects and values
+    of fields with `from_db_value` may differ from attributes of instances,
+    so they are serialized from model instances.
+    """
+    return (model_field.concrete and not model_field.is_relation and
+            not isinstance(model_field, FileField) and
+            not hasattr(model_field, 'from_db_value'))
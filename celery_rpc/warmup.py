@@ -0,0 +1,93 @@
+# coding: utf-8
+""" Warm-up of worker process before consuming requests.
+
+Pays in advance for imports of models and functions, building of serializer
+classes and fields, connecting to databases and codecs setup, so first
+requests after worker start are not slower than others.
+"""
+from __future__ import absolute_import
+
+import time
+from logging import getLogger
+
+from django.db import connections
+from django.db.models import Q
+from kombu.serialization import dumps, loads
+from rest_framework import serializers
+
+from .base import ModelTask, FunctionTask, RpcTask
+
+logger = getLogger(__name__)
+
+
+def warm_up(app):
+    """ Perform all warm-up steps configured for rpc app.
+
+    :param app: celery rpc app
+    :return: list of (kind, name, duration in seconds) of succeeded steps
+    """
+    conf = app.conf
+    steps = [('resources', 'map', RpcTask.resources.load)]
+    for name in conf['warmup_models']:
+        steps.append(('model', name, lambda name=name: warm_model(name)))
+    for name in conf['warmup_serializers']:
+        steps.append(('serializer', name,
+                      lambda name=name: warm_serializer(name)))
+    for name in conf['warmup_functions']:
+        steps.append(('function', name,
+                      lambda name=name: FunctionTask._import_function(name)))
+    for alias in conf['warmup_databases']:
+        # unknown alias fails only its own step
+        steps.append(('database', alias,
+                      lambda alias=alias: connect_database(alias)))
+    for serializer in set([conf['task_serializer'],
+                           conf['result_serializer']]):
+        steps.append(('codec', serializer,
+                      lambda serializer=serializer: warm_codec(serializer)))
+
+    timings = []
+    for kind, name, step in steps:
+        start = time.time()
+        try:
+            step()
+        except Exception:
+            logger.exception("Warm-up of %s %s failed", kind, name)
+            continue
+        duration = time.time() - start
+        timings.append((kind, name, duration))
+        logger.info("Warm-up of %s %s took %.1f ms", kind, name,
+                    duration * 1000)
+    return timings
+
+
+def warm_model(model_name):
+    """ Resolve model, build its default serializer class and fields.
+    """
+    model = ModelTask._import_model(model_name)
+    ModelTask.get_serializer_class(model, serializers.ModelSerializer)().fields
+
+
+def warm_serializer(serializer_name):
+    """ Resolve custom serializer, build serializer class and fields for its
+    model.
+    """
+    serializer = ModelTask._import_serializer(serializer_name)
+    model = serializer.Meta.model
+    ModelTask.get_serializer_class(model, serializer)().fields
+
+
+def connect_database(alias):
+    """ Open connection to database.
+    """
+    connections[alias].ensure_connection()
+
+
+def warm_codec(serializer):
+    """ Round-trip of typical request through codec.
+    """
+    payload = {'filters': {'pk__in': [1]}, 'fields': ['id'], 'limit': 1}
+    if serializer == 'x-rpc-json':
+        # also loads jsonpickle handlers
+        payload['filters_Q'] = Q(pk=1)
+    content_type, encoding, data = dumps(payload, serializer=serializer)
+    loads(data, content_type, encoding)
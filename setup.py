@@ -78,6 +78,7 @@ setup(
         'celery >=3.1.5, <5.3.0',
         'jsonpickle >=0.8.0, <2.1.0',
         'six',
+        'futures; python_version < "3.0"',
     ],
     extras_require={
         'server': [